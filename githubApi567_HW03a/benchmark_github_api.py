@@ -0,0 +1,246 @@
+"""
+GitHub API Throughput Benchmark.
+
+This module runs iter_many_users_repos_with_commits against the local fake
+GitHub API with configurable network latency, and reports requests per
+second, per-user latency percentiles and peak memory for every combination
+of account size and concurrency level. Nothing leaves the machine, so the
+numbers can be compared before and after a change.
+
+Run as:
+    python benchmark_github_api.py --repos 10 100 1000 --concurrency 1 8 32
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from fake_github import FakeGitHubServer
+from github_api import (
+    COUNT_METHODS,
+    GitHubClient,
+    iter_many_users_repos_with_commits,
+    percentile,
+)
+
+
+def generate_users(repo_counts, users_per_size, max_commits=60, seed=0):
+    """
+    Build fake accounts of several sizes.
+
+    Args:
+        repo_counts (list): Repositories per account, one size per entry
+        users_per_size (int): Accounts generated for each size
+        max_commits (int): Largest commit count of a repository
+        seed (int): Seed of the commit counts, for repeatable runs
+
+    Returns:
+        dict: FakeGitHubServer users, keyed "bench{size}-{index}"
+    """
+    rng = random.Random(seed)
+    users = {}
+    for size in repo_counts:
+        for index in range(users_per_size):
+            users[f"bench{size}-{index}"] = {
+                # About one repository in twenty is empty
+                f"repo{i:05d}": None if rng.random() < 0.05
+                else rng.randint(1, max_commits)
+                for i in range(size)
+            }
+    return users
+
+
+def _peak_rss_bytes():
+    """Return the peak resident set size of this process, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(base_url, user_ids, workers, count_method="list", paginate=True,
+             stream_json=False):
+    """
+    Analyze users once and measure the run.
+
+    Args:
+        base_url (str): URL of the fake GitHub API
+        user_ids (list): Usernames to analyze
+        workers (int): Concurrent requests
+        count_method (str): Commit counting strategy
+        paginate (bool): List every repository of each user
+        stream_json (bool): Decode listing pages as a stream
+
+    Returns:
+        dict: "seconds", per-user "latencies", "failed" users, and
+        "peak_rss" in bytes (None where unsupported)
+    """
+    client = GitHubClient(base_url=base_url, pool_maxsize=workers,
+                          stream_json=stream_json)
+    latencies = []
+    failed = 0
+    started = time.perf_counter()
+    with client:
+        for entry in iter_many_users_repos_with_commits(
+            user_ids, max_workers=workers, client=client,
+            count_method=count_method, paginate=paginate, records=True,
+        ):
+            latencies.append(entry["elapsed"])
+            if entry["error"] is not None:
+                failed += 1
+    return {
+        "seconds": time.perf_counter() - started,
+        "latencies": latencies,
+        "failed": failed,
+        "peak_rss": _peak_rss_bytes(),
+    }
+
+
+def run_benchmark(repo_counts=(10, 100), concurrency=(1, 8, 32),
+                  users_per_size=8, latency=0.02, jitter=0.005, per_page=30,
+                  count_method="list", paginate=True, stream_json=False,
+                  isolate=True, seed=0):
+    """
+    Benchmark every combination of account size and concurrency level.
+
+    Args:
+        repo_counts (tuple): Repositories per account
+        concurrency (tuple): Worker counts to run with
+        users_per_size (int): Accounts analyzed per run
+        latency (float): Simulated seconds per request
+        jitter (float): Random variation of the latency in seconds
+        per_page (int): Default page size of the fake REST listings
+        count_method (str): Commit counting strategy
+        paginate (bool): List every repository of each user
+        stream_json (bool): Decode listing pages as a stream
+        isolate (bool): Run each case in a fresh process, so its peak RSS
+            is its own
+        seed (int): Seed of the accounts and the jitter
+
+    Returns:
+        list: One result dictionary per case
+    """
+    users = generate_users(repo_counts, users_per_size, seed=seed)
+    results = []
+    with FakeGitHubServer(users, latency=latency, jitter=jitter,
+                          per_page=per_page, seed=seed) as server:
+        for size in repo_counts:
+            user_ids = [f"bench{size}-{index}" for index in range(users_per_size)]
+            for workers in concurrency:
+                args = (server.url, user_ids, workers, count_method, paginate,
+                        stream_json)
+                sent_before = len(server.requests)
+                if isolate:
+                    with ProcessPoolExecutor(
+                        max_workers=1, mp_context=get_context("spawn")
+                    ) as executor:
+                        run = executor.submit(run_case, *args).result()
+                else:
+                    run = run_case(*args)
+                sent = len(server.requests) - sent_before
+
+                latencies = sorted(run["latencies"])
+                results.append({
+                    "repos": size,
+                    "workers": workers,
+                    "users": len(user_ids),
+                    "failed": run["failed"],
+                    "requests": sent,
+                    "seconds": run["seconds"],
+                    "requests_per_second": sent / run["seconds"] if run["seconds"] else 0.0,
+                    "p50": percentile(latencies, 0.5),
+                    "p99": percentile(latencies, 0.99),
+                    "peak_rss": run["peak_rss"],
+                })
+    return results
+
+
+def format_results(results):
+    """Render benchmark results as an aligned text table."""
+    header = (f"{'REPOS':>6} {'WORKERS':>7} {'USERS':>5} {'REQUESTS':>8} "
+              f"{'SECONDS':>8} {'REQ/S':>8} {'P50 MS':>8} {'P99 MS':>8} "
+              f"{'PEAK RSS MIB':>12}")
+    lines = [header]
+    for result in results:
+        rss = result["peak_rss"]
+        rss_text = "n/a" if rss is None else f"{rss / 2 ** 20:.1f}"
+        lines.append(
+            f"{result['repos']:>6} {result['workers']:>7} {result['users']:>5} "
+            f"{result['requests']:>8} {result['seconds']:>8.2f} "
+            f"{result['requests_per_second']:>8.1f} "
+            f"{result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} "
+            f"{rss_text:>12}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """
+    Command-line entry point, run as python benchmark_github_api.py.
+
+    Args:
+        argv (list, optional): Arguments to parse instead of sys.argv
+
+    Returns:
+        int: Exit status, 1 when any user failed
+    """
+    parser = argparse.ArgumentParser(
+        prog="benchmark_github_api",
+        description="Benchmark github_api against a local fake GitHub API.",
+    )
+    parser.add_argument("--repos", type=int, nargs="+", default=[10, 100],
+                        help="repositories per account (default: 10 100)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="worker counts (default: 1 8 32)")
+    parser.add_argument("--users", type=int, default=8,
+                        help="accounts analyzed per case (default: 8)")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="simulated seconds per request (default: 0.02)")
+    parser.add_argument("--jitter", type=float, default=0.005,
+                        help="random latency variation in seconds (default: 0.005)")
+    parser.add_argument("--per-page", type=int, default=30,
+                        help="default page size of listings (default: 30)")
+    parser.add_argument("--count-method", choices=COUNT_METHODS, default="list",
+                        help="commit counting strategy (default: list)")
+    parser.add_argument("--first-page-only", action="store_true",
+                        help="read only the first page of each listing")
+    parser.add_argument("--stream-json", action="store_true",
+                        help="decode listing pages as a stream")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run every case in this process; peak RSS is "
+                             "then cumulative")
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the results as JSON to FILE")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        repo_counts=args.repos,
+        concurrency=args.concurrency,
+        users_per_size=args.users,
+        latency=args.latency,
+        jitter=args.jitter,
+        per_page=args.per_page,
+        count_method=args.count_method,
+        paginate=not args.first_page_only,
+        stream_json=args.stream_json,
+        isolate=not args.in_process,
+    )
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if any(result["failed"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""
+Fixtures shared by the test suites.
+
+fake_github runs the local fake GitHub API. A test module needing other
+accounts overrides fake_github_users with its own fixture of that name.
+"""
+import pytest
+from fake_github import FakeGitHubServer
+
+
+@pytest.fixture
+def fake_github_users():
+    """Accounts served by fake_github"""
+    return {
+        'octocat': {'hello-world': 3, 'spoon-knife': 1, 'empty': None},
+        'norepos': {},
+    }
+
+
+@pytest.fixture
+def fake_github(fake_github_users):
+    """Run a local fake GitHub API for the duration of a test"""
+    with FakeGitHubServer(fake_github_users) as server:
+        yield server
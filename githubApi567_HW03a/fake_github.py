@@ -0,0 +1,383 @@
+"""
+Local Fake GitHub API Server.
+
+This module provides a small in-process HTTP server that answers the
+GitHub API calls made by github_api, so tests can exercise real HTTP
+round-trips without network access or rate limits.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+def _encode_cursor(offset):
+    """Encode a repository offset as an opaque GraphQL cursor."""
+    return base64.b64encode(f"cursor:{offset}".encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Decode a GraphQL cursor back into a repository offset."""
+    if not cursor:
+        return 0
+    return int(base64.b64decode(cursor).decode().split(":")[1])
+
+
+class _FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Request handler dispatching to the owning FakeGitHubServer."""
+
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY each
+    # keep-alive response waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        fake = self.server.fake
+        fake.record_request("GET", self.path)
+        fake.delay()
+        if self._send_fault(fake.next_fault()):
+            return
+
+        status, payload, headers = fake.rest(self.path)
+        body = json.dumps(payload).encode()
+        if status == 200:
+            headers["ETag"] = '"{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+            if headers["ETag"] in self.headers.get("If-None-Match", ""):
+                # Like GitHub, a 304 does not count against the rate limit
+                _, quota = fake.take_quota(consume=False)
+                headers.update(quota)
+                self._send_body(304, b"", headers)
+                return
+
+        if self._send_quota_exceeded(fake, headers):
+            return
+        self._send_body(status, body, headers)
+
+    def do_POST(self):
+        fake = self.server.fake
+        fake.record_request("POST", self.path)
+        fake.delay()
+        if self._send_fault(fake.next_fault()):
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"message": "Problems parsing JSON"})
+            return
+
+        headers = {}
+        if self._send_quota_exceeded(fake, headers):
+            return
+
+        if self.path != "/graphql":
+            self._send_json(404, {"message": "Not Found"}, headers)
+            return
+
+        self._send_json(200, fake.graphql(body.get("variables") or {}), headers)
+
+    def _send_fault(self, fault):
+        """Answer with a queued fault; returns False when there is none."""
+        if fault is None:
+            return False
+        status, headers = fault
+        if status is None:
+            # Simulate a connection reset by closing without answering
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return True
+        self._send_json(status, {"message": "Injected fault"}, headers)
+        return True
+
+    def _send_quota_exceeded(self, fake, headers):
+        """
+        Charge the request to the rate limit, adding its headers.
+
+        Returns True after answering 403 for an exhausted quota.
+        """
+        allowed, quota = fake.take_quota()
+        headers.update(quota)
+        if allowed:
+            return False
+        self._send_json(403, {"message": "API rate limit exceeded"}, headers)
+        return True
+
+    def _send_json(self, status, payload, headers=None):
+        self._send_body(status, json.dumps(payload).encode(), headers)
+
+    def _send_body(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep test output quiet
+        pass
+
+
+class FakeGitHubServer:
+    """
+    In-process stand-in for the GitHub API.
+
+    Successful GET answers carry an ETag, and a request whose If-None-Match
+    matches it is answered 304 Not Modified without a body.
+
+    Args:
+        users (dict): Maps each username to an ordered mapping of repository
+            name to commit count. A count of None marks an empty repository
+            without a default branch.
+        host (str): Interface to bind to
+        port (int): Port to bind to; 0 picks a free port
+        latency (float): Seconds every request waits before it is answered
+        jitter (float): Up to this many seconds are randomly added to or
+            removed from the latency of each request
+        per_page (int, optional): Page size of REST listings requested
+            without per_page, 30 on GitHub. Listings without per_page are
+            answered in a single page when omitted. Paginated answers
+            carry a Link header with first, prev, next and last relations.
+        rate_limit (int, optional): Requests allowed per rate-limit window.
+            Answers then carry X-RateLimit-* headers, and requests beyond
+            the quota get 403 until the window resets.
+        rate_limit_window (float): Seconds until the quota resets
+        seed (int, optional): Seed of the jitter, for repeatable runs
+
+    Example:
+        with FakeGitHubServer({"alice": {"repo1": 3}}) as server:
+            client = GitHubClient(base_url=server.url)
+    """
+
+    def __init__(self, users=None, host="127.0.0.1", port=0, latency=0.0,
+                 jitter=0.0, per_page=None, rate_limit=None,
+                 rate_limit_window=3600, seed=None):
+        self.users = users or {}
+        self.requests = []
+        self.faults = []
+        self.latency = latency
+        self.jitter = jitter
+        self.per_page = per_page
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.rate_limit_remaining = rate_limit
+        self.rate_limit_reset = time.time() + rate_limit_window
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _FakeGitHubHandler)
+        self._httpd.daemon_threads = True
+        # Benchmarks open many connections at once
+        self._httpd.request_queue_size = 128
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL to use as a GitHubClient base_url."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_request(self, method, path):
+        """Remember a request so tests can assert on the traffic."""
+        with self._lock:
+            self.requests.append((method, path))
+
+    def add_fault(self, status, headers=None, count=1):
+        """
+        Queue error answers returned before any normal response.
+
+        Args:
+            status (int): HTTP status to answer with, or None to drop the
+                connection without answering
+            headers (dict, optional): Extra response headers
+            count (int): Number of requests that get this answer
+        """
+        with self._lock:
+            self.faults.extend([(status, headers)] * count)
+
+    def next_fault(self):
+        """Pop the next queued fault, or return None when there is none."""
+        with self._lock:
+            return self.faults.pop(0) if self.faults else None
+
+    def delay(self):
+        """Sleep for the configured latency and jitter of one request."""
+        if not self.latency and not self.jitter:
+            return
+        with self._lock:
+            offset = self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, self.latency + offset))
+
+    def take_quota(self, consume=True):
+        """
+        Charge one request to the rate limit.
+
+        Args:
+            consume (bool): Whether the request counts against the quota
+
+        Returns:
+            tuple: Whether the request is allowed, and the X-RateLimit-*
+            headers to answer with (none without a rate limit)
+        """
+        if self.rate_limit is None:
+            return True, {}
+
+        with self._lock:
+            now = time.time()
+            if now >= self.rate_limit_reset:
+                self.rate_limit_remaining = self.rate_limit
+                self.rate_limit_reset = now + self.rate_limit_window
+            allowed = self.rate_limit_remaining > 0
+            if consume and allowed:
+                self.rate_limit_remaining -= 1
+            remaining = self.rate_limit_remaining
+
+        return allowed, {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Used": str(self.rate_limit - remaining),
+            "X-RateLimit-Reset": str(int(self.rate_limit_reset)),
+            "X-RateLimit-Resource": "core",
+        }
+
+    def _paginate(self, path, query, items):
+        """Return one page of a listing and its Link header."""
+        per_page = query.get("per_page", [None])[0] or self.per_page
+        if per_page is None:
+            return items, {}
+
+        per_page = max(1, min(int(per_page), 100))
+        page = max(1, int(query.get("page", ["1"])[0]))
+        last = max(1, -(-len(items) // per_page))
+
+        def link(number):
+            params = dict((name, values[0]) for name, values in query.items())
+            params.update(per_page=per_page, page=number)
+            return f"<{self.url}{path}?{urlencode(params)}>"
+
+        links = []
+        if page > 1:
+            links += [f'{link(1)}; rel="first"', f'{link(page - 1)}; rel="prev"']
+        if page < last:
+            links += [f'{link(page + 1)}; rel="next"', f'{link(last)}; rel="last"']
+        headers = {"Link": ", ".join(links)} if links else {}
+        start = (page - 1) * per_page
+        return items[start:start + per_page], headers
+
+    def rest(self, path):
+        """
+        Answer a REST repos or commits request.
+
+        Args:
+            path (str): Request path, including any query string
+
+        Returns:
+            tuple: HTTP status, JSON payload and response headers
+        """
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "users" and parts[2] == "repos":
+            login = parts[1]
+            if login not in self.users:
+                return 404, {"message": "Not Found"}, {}
+            names = list(self.users[login])
+            page, headers = self._paginate(url.path, query, names)
+            return 200, [
+                {"name": name, "full_name": f"{login}/{name}"} for name in page
+            ], headers
+
+        if len(parts) == 4 and parts[0] == "repos" and parts[3] == "commits":
+            login, name = parts[1], parts[2]
+            if name not in self.users.get(login, {}):
+                return 404, {"message": "Not Found"}, {}
+            commit_count = self.users[login][name]
+            if commit_count is None:
+                return 409, {"message": "Git Repository is empty."}, {}
+            # Newest commit first, as GitHub lists them
+            shas = range(commit_count - 1, -1, -1)
+            page, headers = self._paginate(url.path, query, shas)
+            return 200, [{"sha": f"{i:040x}"} for i in page], headers
+
+        return 404, {"message": "Not Found"}, {}
+
+    def graphql(self, variables):
+        """
+        Answer the repository commit-count query used by github_api.
+
+        Args:
+            variables (dict): GraphQL variables with login, first and cursor
+
+        Returns:
+            dict: GraphQL response payload
+        """
+        login = variables.get("login")
+        if login not in self.users:
+            return {
+                "data": {"repositoryOwner": None},
+                "errors": [{
+                    "type": "NOT_FOUND",
+                    "path": ["repositoryOwner"],
+                    "message": f"Could not resolve to a RepositoryOwner "
+                               f"with the login of '{login}'.",
+                }],
+            }
+
+        repos = list(self.users[login].items())
+        first = min(int(variables.get("first") or 100), 100)
+        start = _decode_cursor(variables.get("cursor"))
+        page = repos[start:start + first]
+        end = start + len(page)
+
+        nodes = []
+        for name, commit_count in page:
+            if commit_count is None:
+                branch = None
+            else:
+                branch = {"target": {"history": {"totalCount": commit_count}}}
+            nodes.append({"name": name, "defaultBranchRef": branch})
+
+        return {
+            "data": {
+                "repositoryOwner": {
+                    "repositories": {
+                        "pageInfo": {
+                            "hasNextPage": end < len(repos),
+                            "endCursor": _encode_cursor(end) if page else None,
+                        },
+                        "nodes": nodes,
+                    }
+                }
+            }
+        }
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
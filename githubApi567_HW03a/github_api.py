@@ -2,114 +2,2225 @@
 GitHub API Repository Analyzer Module.
 
 This module provides functionality to fetch GitHub user repositories
-and count commits for each repository using GitHub's REST API.
+and count commits for each repository using GitHub's REST API, or in
+batches through GitHub's GraphQL API.
 """
 
+import argparse
+import asyncio
+import codecs
+import csv
+import hashlib
 import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from urllib.parse import parse_qs, urlparse
 
 import requests
+from urllib3.util.retry import Retry
 
+from github_cache import RepoStateStore, SQLiteResponseCache
+from github_cassette import CassetteAdapter
+from github_trace import RequestTrace, TracingHTTPAdapter
 
-def get_user_repos_with_commits(user_id):
+GITHUB_API_URL = "https://api.github.com"
+
+# Commit counting strategies accepted by the count_method arguments:
+# "list" counts the decoded first page of commits, "link" requests one
+# commit per page and reads the total from the Link header.
+COUNT_METHODS = ("list", "link")
+
+# Backends accepted by the backend arguments: "rest" lists repositories and
+# then makes one commits call per repository, "graphql" reads the commit
+# totals of up to 100 repositories per GraphQL query.
+BACKENDS = ("rest", "graphql")
+
+# Transient statuses retried by build_retry: secondary rate limits (429)
+# and server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Fields kept from each repository object of a listing page. GitHub sends
+# about 100 fields per repository; counting only needs these.
+REPO_FIELDS = ("name", "pushed_at")
+
+# Bytes read per chunk when a listing page is decoded as a stream
+JSON_CHUNK_SIZE = 64 * 1024
+
+# Repositories requested per GraphQL query; 100 is GitHub's maximum
+GRAPHQL_PAGE_SIZE = 100
+
+REPO_COMMITS_QUERY = """
+query($login: String!, $first: Int!, $cursor: String) {
+  repositoryOwner(login: $login) {
+    repositories(first: $first, after: $cursor, ownerAffiliations: OWNER,
+                 privacy: PUBLIC, orderBy: {field: NAME, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        defaultBranchRef {
+          target { ... on Commit { history { totalCount } } }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+class RepoCommitCount(namedtuple("RepoCommitCount", ["repo_name", "commit_count"])):
     """
-    Retrieve user repositories and their commit counts.
+    Commit count of one repository.
+
+    A slotted tuple, so it unpacks like a (repo name, commit count) pair
+    and takes a fraction of the memory of the equivalent dictionary.
+    """
+
+    __slots__ = ()
+
+    def as_dict(self):
+        """Return the record as a {"repo_name", "commit_count"} dictionary."""
+        return {"repo_name": self.repo_name, "commit_count": self.commit_count}
+
+
+class GitHubRetry(Retry):
+    """
+    urllib3 retry policy tuned for the GitHub API.
+
+    GitHub answers secondary rate limits with 403 or 429 plus a Retry-After
+    header. A 403 is retried only when it carries Retry-After, so permission
+    errors and an exhausted primary quota fail fast.
+    """
+
+    RETRY_AFTER_STATUS_CODES = frozenset({403, 413, 429, 503})
+
+
+def build_retry(total=5, backoff_factor=0.5, backoff_max=60, backoff_jitter=0.5,
+                status_forcelist=RETRY_STATUS_CODES):
+    """
+    Build the retry policy used by GitHubClient for idempotent requests.
+
+    Connection errors, read errors and the given statuses are retried with
+    capped exponential backoff: backoff_factor * 2 ** (retry - 1) seconds,
+    plus up to backoff_jitter seconds of random jitter, never more than
+    backoff_max. A Retry-After header overrides the backoff.
+
+    Args:
+        total (int): Maximum number of retries per request
+        backoff_factor (float): Base delay, in seconds, of the backoff
+        backoff_max (float): Cap on the delay between attempts
+        backoff_jitter (float): Upper bound of the random jitter added
+        status_forcelist (tuple): HTTP statuses that are always retried
+
+    Returns:
+        GitHubRetry: Retry policy to pass as GitHubClient(retry=...)
+    """
+    return GitHubRetry(
+        total=total,
+        connect=total,
+        read=total,
+        status=total,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        status_forcelist=status_forcelist,
+        backoff_factor=backoff_factor,
+        backoff_max=backoff_max,
+        backoff_jitter=backoff_jitter,
+        respect_retry_after_header=True,
+        # Hand the final response back so callers apply their own status handling
+        raise_on_status=False,
+    )
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """
+    Raised when the GitHub rate limit is exhausted.
+
+    Attributes:
+        reset_at (float): Epoch time at which the quota resets, or None when
+            GitHub did not say
+    """
+
+    def __init__(self, *args, reset_at=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reset_at = reset_at
+
+
+def _header_int(response, name):
+    """Return an integer response header, or None if missing or malformed."""
+    try:
+        return int(response.headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_rate_limited(response):
+    """Return True if the response reports an exhausted rate limit."""
+    return (
+        response.status_code in (403, 429)
+        and _header_int(response, "X-RateLimit-Remaining") == 0
+    )
+
+
+def _raise_if_rate_limited(response):
+    """Raise RateLimitExceeded if the response reports an exhausted quota."""
+    if _is_rate_limited(response):
+        status = "403 Forbidden" if response.status_code == 403 else "429 Too Many Requests"
+        raise RateLimitExceeded(
+            f"API rate limit exceeded: {status}",
+            reset_at=_header_int(response, "X-RateLimit-Reset"),
+            response=response,
+        )
+
+
+class RateLimiter:
+    """
+    Request scheduler that paces calls to stay within the GitHub quota.
+
+    The scheduler tracks X-RateLimit-Remaining and X-RateLimit-Reset from
+    every response and refills a token bucket at the rate that spreads the
+    remaining quota evenly until the reset. Requests therefore slow down
+    before the quota runs out instead of hitting the wall. When the quota
+    is exhausted anyway, callers wait for the reset, or get a
+    RateLimitExceeded error if the reset is more than max_wait seconds away.
+    Because the reset time is rounded to whole seconds and the local clock
+    may be skewed, a rate-limited request is retried after at least
+    min_wait seconds, doubling for each consecutive retry, and at most
+    max_retries times.
+
+    One scheduler can be shared by every client and thread using a token.
+
+    Args:
+        burst (int): Requests allowed back-to-back before pacing kicks in
+        max_wait (float): Longest wait, in seconds, for a quota reset
+        clock (callable): Returns the current epoch time
+        sleep (callable): Blocks for a number of seconds
+        min_wait (float): Shortest wait, in seconds, before retrying a
+            rate-limited request
+        max_retries (int): Consecutive rate-limited answers to one request
+            before RateLimitExceeded is raised
+    """
+
+    def __init__(self, burst=10, max_wait=900, clock=time.time, sleep=time.sleep,
+                 min_wait=1.0, max_retries=5):
+        self.burst = burst
+        self.max_wait = max_wait
+        self.min_wait = min_wait
+        self.max_retries = max_retries
+        self.remaining = None
+        self.limit = None
+        self.reset_at = None
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """Add the tokens earned since the last refill. Caller holds the lock."""
+        if self.remaining is None or self.reset_at is None:
+            # Nothing known about the quota yet; do not pace
+            self._tokens = float(self.burst)
+        else:
+            rate = self.remaining / max(self.reset_at - now, 1.0)
+            self._tokens = min(
+                float(self.burst), self._tokens + (now - self._refilled_at) * rate
+            )
+        self._refilled_at = now
+
+    def _reset_wait(self, now):
+        """Return seconds until the quota resets, raising if that is too long."""
+        if self.reset_at is None or self.reset_at - now > self.max_wait:
+            raise RateLimitExceeded(
+                "API rate limit exceeded: quota exhausted until reset",
+                reset_at=self.reset_at,
+            )
+        return max(self.reset_at - now, 0.0)
+
+    def acquire(self):
+        """
+        Block until a request may be sent.
+
+        Raises:
+            RateLimitExceeded: If the quota is exhausted and resets more
+                than max_wait seconds from now
+        """
+        while True:
+            with self._lock:
+                now = self._clock()
+                if self.reset_at is not None and now >= self.reset_at:
+                    # A new window started; wait for fresh headers
+                    self.remaining = None
+                    self.reset_at = None
+
+                if self.remaining is not None and self.remaining <= 0:
+                    wait = self._reset_wait(now)
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        if self.remaining is not None:
+                            self.remaining -= 1
+                        return
+                    rate = self.remaining / max(self.reset_at - now, 1.0)
+                    wait = (1 - self._tokens) / rate
+
+            self._sleep(wait)
+
+    def update(self, response):
+        """
+        Record the quota reported by a response.
+
+        Args:
+            response (requests.Response): Any GitHub API response
+        """
+        remaining = _header_int(response, "X-RateLimit-Remaining")
+        reset_at = _header_int(response, "X-RateLimit-Reset")
+        if remaining is None or reset_at is None:
+            return
+
+        with self._lock:
+            self.limit = _header_int(response, "X-RateLimit-Limit") or self.limit
+            if reset_at != self.reset_at or self.remaining is None:
+                self.reset_at = reset_at
+                self.remaining = remaining
+            else:
+                # Responses of concurrent requests can arrive out of order
+                self.remaining = min(self.remaining, remaining)
+
+    def wait_for_reset(self, attempt=1):
+        """
+        Block until the exhausted quota resets.
+
+        The wait lasts at least min_wait * 2 ** (attempt - 1) seconds, even
+        when the reported reset time has already passed.
+
+        Args:
+            attempt (int): Consecutive rate-limited answers to the request
+                being retried
+
+        Raises:
+            RateLimitExceeded: If the reset is unknown or more than max_wait
+                seconds away, or the request was rate limited more than
+                max_retries times in a row
+        """
+        with self._lock:
+            self.remaining = 0
+            if attempt > self.max_retries:
+                raise RateLimitExceeded(
+                    f"API rate limit exceeded: still limited after "
+                    f"{self.max_retries} retries",
+                    reset_at=self.reset_at,
+                )
+            wait = self._reset_wait(self._clock())
+            wait = max(wait, self.min_wait * 2 ** (attempt - 1))
+        self._sleep(wait)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function. Callers arriving while it
+    is still running wait for it and receive the same result, or the same
+    exception. Once the call finishes the key is forgotten, so later calls
+    run again.
+
+    Example:
+        flights = SingleFlight()
+        result = flights.do("octocat", get_user_repos_with_commits, "octocat")
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._futures)
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) unless a call for key is already running.
+
+        Args:
+            key (hashable): Identity of the call
+            func (callable): Function to run
+
+        Returns:
+            The function's result, shared by every caller of the flight
+
+        Raises:
+            Exception: Whatever the function raised, in every caller
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._futures[key] = future
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+
+class GitHubClient:
+    """
+    Reusable GitHub API client backed by a pooled keep-alive session.
+
+    A single client can be shared across repositories, users and threads so
+    that TCP and TLS connection setup to the API host is paid once per
+    pooled connection instead of once per request.
+
+    Args:
+        token (str, optional): Personal access token sent as a bearer token
+        pool_connections (int): Number of per-host connection pools to cache
+        pool_maxsize (int): Maximum number of connections kept per host.
+            Should be at least the number of threads sharing the client.
+        timeout (float or tuple): Default (connect, read) timeout in seconds
+        base_url (str): API root, for GitHub Enterprise or a local fake server
+        conditional_cache (github_cache.ConditionalCache, optional): Store of
+            ETag/Last-Modified validators. GET requests are then sent as
+            conditional requests, and 304 answers reuse the cached body.
+        response_cache (github_cache.SQLiteResponseCache, optional): Disk
+            cache whose fresh entries answer GET requests without any
+            network round-trip
+        rate_limiter (RateLimiter, optional): Scheduler that paces every
+            request sent over the network. A request rejected for an
+            exhausted quota is retried after the reset.
+        retry (urllib3.util.retry.Retry, optional): Retry policy mounted on
+            the session's adapter, usually from build_retry(). Each request
+            is attempted once when omitted.
+        stream_json (bool): Download repository listing pages as a stream
+            and decode them one repository at a time, so a full page is
+            never held in memory as Python objects. Streamed pages bypass
+            conditional_cache and response_cache, which would have to keep
+            the whole body.
+        coalesce (bool): Share one request between threads that GET the
+            same URL at the same time. Streamed requests are never shared.
+        metrics (github_metrics.GitHubMetrics, optional): Receives request
+            counts and latencies, retries, cache results and the remaining
+            rate limit
+        adapter (requests.adapters.BaseAdapter, optional): Transport
+            adapter mounted instead of the pooled one, such as a
+            github_cassette.CassetteAdapter. pool_connections, pool_maxsize
+            and retry are then ignored.
+
+    Attributes:
+        trace (github_trace.RequestTrace): Trace recording every request
+            sent over the network while it is started, or None
+    """
+
+    def __init__(self, token=None, pool_connections=10, pool_maxsize=10,
+                 timeout=(5, 30), base_url=GITHUB_API_URL,
+                 conditional_cache=None, response_cache=None,
+                 rate_limiter=None, retry=None, stream_json=False,
+                 coalesce=True, metrics=None, adapter=None):
+        self.timeout = timeout
+        self.metrics = metrics
+        self.trace = None
+        self.stream_json = stream_json
+        self.flights = SingleFlight() if coalesce else None
+        self.base_url = base_url.rstrip("/")
+        self.conditional_cache = conditional_cache
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        # Cached responses are keyed per token, never shared between tokens
+        if token:
+            self.identity = hashlib.sha256(token.encode()).hexdigest()[:16]
+        else:
+            self.identity = "anonymous"
+        self.session = requests.Session()
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+        if adapter is None:
+            adapter = TracingHTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                max_retries=retry if retry is not None else 0,
+            )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def cache_key(self, url, params=None):
+        """Return the cache key of a GET request made by this client."""
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        return f"{self.identity} {full_url}"
+
+    def _timed_send(self, send, url, **kwargs):
+        """Send a request, recording it in the metrics and the active trace."""
+        trace = self.trace
+        if self.metrics is None and trace is None:
+            return send(url, **kwargs)
+
+        record = None
+        if trace is not None:
+            record = trace.begin_request(url)
+            kwargs["hooks"] = {"response": record.on_response}
+        started = time.perf_counter()
+        try:
+            response = send(url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if record is not None:
+                trace.end_request(record, error=e)
+            if self.metrics is not None:
+                self.metrics.observe_error(url)
+            raise
+        if record is not None:
+            trace.end_request(record, stream=kwargs.get("stream", False))
+        if self.metrics is not None:
+            self.metrics.observe_response(url, response, time.perf_counter() - started)
+        return response
+
+    def _send(self, send, url, **kwargs):
+        """Send a request, pacing it through the rate limiter if there is one."""
+        if self.rate_limiter is None:
+            return self._timed_send(send, url, **kwargs)
+
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            response = self._timed_send(send, url, **kwargs)
+            self.rate_limiter.update(response)
+            if not _is_rate_limited(response):
+                return response
+            attempt += 1
+            self.rate_limiter.wait_for_reset(attempt)
+
+    def get(self, url, **kwargs):
+        """Send a GET request through the pooled session."""
+        kwargs.setdefault("timeout", self.timeout)
+        if self.flights is None or kwargs.get("stream"):
+            return self._get(url, **kwargs)
+
+        headers = tuple(sorted((kwargs.get("headers") or {}).items()))
+        key = (self.cache_key(url, kwargs.get("params")), headers)
+        return self.flights.do(key, self._get, url, **kwargs)
+
+    def _get(self, url, **kwargs):
+        """Send a GET request, answering it from the caches if possible."""
+        # Caching a streamed body would load it whole into memory
+        if kwargs.get("stream") or (
+            self.conditional_cache is None and self.response_cache is None
+        ):
+            return self._send(self.session.get, url, **kwargs)
+
+        key = self.cache_key(url, kwargs.get("params"))
+        if self.response_cache is not None:
+            cached = self.response_cache.get(key)
+            if self.metrics is not None:
+                if cached is None:
+                    self.metrics.cache_miss("response")
+                else:
+                    self.metrics.cache_hit("response")
+            if cached is not None:
+                return cached
+
+        if self.conditional_cache is None:
+            response = self._send(self.session.get, url, **kwargs)
+        else:
+            headers = self.conditional_cache.conditional_headers(key)
+            headers.update(kwargs.pop("headers", None) or {})
+            response = self._send(self.session.get, url, headers=headers, **kwargs)
+
+            if response.status_code == 304:
+                response = self.conditional_cache.revalidated(key, response)
+                if self.metrics is not None:
+                    self.metrics.cache_hit("conditional")
+            else:
+                self.conditional_cache.store(key, response)
+                if self.metrics is not None:
+                    self.metrics.cache_miss("conditional")
+
+        if self.response_cache is not None:
+            self.response_cache.set(key, response)
+        return response
+
+    def post(self, url, **kwargs):
+        """Send a POST request through the pooled session."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self._send(self.session.post, url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _http_get(url, client=None, **kwargs):
+    """Send a GET request through the client, or requests.get without one."""
+    if client is None:
+        return requests.get(url, **kwargs)
+    return client.get(url, **kwargs)
+
+
+def _http_post(url, client=None, **kwargs):
+    """Send a POST request through the client, or requests.post without one."""
+    if client is None:
+        return requests.post(url, **kwargs)
+    return client.post(url, **kwargs)
+
+
+def _api_url(client=None):
+    """Return the API root used by the client, or the public GitHub API."""
+    if client is None:
+        return GITHUB_API_URL
+    return client.base_url
+
+
+def _count_commits_from_link(commits_response):
+    """
+    Read the total commit count from a per_page=1 commits response.
+
+    With one commit per page, the page number of the rel="last" link is the
+    number of commits. Repositories with a single commit have no Link header,
+    so the decoded page is counted instead.
+    """
+    last_link = commits_response.links.get("last")
+    if last_link:
+        page = parse_qs(urlparse(last_link["url"]).query).get("page")
+        if page:
+            return int(page[0])
+    return len(commits_response.json())
+
+
+def _commit_head_state(commits):
+    """Return the head SHA and committer date of a newest-first commit list."""
+    if not commits:
+        return {"head_sha": None, "head_date": None}
+    head = commits[0]
+    committer = (head.get("commit") or {}).get("committer") or {}
+    return {"head_sha": head.get("sha"), "head_date": committer.get("date")}
+
+
+def _request_commit_state(user_id, repo_name, client=None, count_method="list"):
+    """
+    Count the commits of a single repository and read its head commit.
+
+    Args:
+        user_id (str): GitHub username owning the repository
+        repo_name (str): Repository name
+        client (GitHubClient, optional): Client used to send the request
+        count_method (str): "list" counts the commits on the first page,
+            "link" reads the exact total from the Link header
+
+    Returns:
+        dict: "commit_count" (0 for an empty repository), "head_sha" and
+        "head_date" of the default branch, or None if the commits are not
+        accessible
+
+    Raises:
+        RateLimitExceeded: If the rate limit is exhausted
+    """
+    commits_url = f"{_api_url(client)}/repos/{user_id}/{repo_name}/commits"
+    try:
+        if count_method == "link":
+            commits_response = _http_get(
+                commits_url, client, params={"per_page": 1}
+            )
+        else:
+            commits_response = _http_get(commits_url, client)
+
+        _raise_if_rate_limited(commits_response)
+
+        if commits_response.status_code == 200:
+            commits = commits_response.json()
+            if count_method == "link":
+                commit_count = _count_commits_from_link(commits_response)
+            else:
+                commit_count = len(commits)
+            state = _commit_head_state(commits)
+            state["commit_count"] = commit_count
+            return state
+        if commits_response.status_code == 409:
+            # GitHub answers 409 Conflict for a repository without commits
+            return {"commit_count": 0, "head_sha": None, "head_date": None}
+        # Handle cases where commits are not accessible (private repos, etc.)
+        return None
+
+    except RateLimitExceeded:
+        raise
+    except requests.exceptions.RequestException:
+        return None
+
+
+def _fetch_commit_count(user_id, repo_name, client=None, count_method="list"):
+    """
+    Count the commits of a single repository.
+
+    Args:
+        user_id (str): GitHub username owning the repository
+        repo_name (str): Repository name
+        client (GitHubClient, optional): Client used to send the request
+        count_method (str): "list" counts the commits on the first page,
+            "link" reads the exact total from the Link header
+
+    Returns:
+        int: Number of commits, or 0 if the commits are not accessible
+
+    Raises:
+        RateLimitExceeded: If the rate limit is exhausted, since counting
+            the repository as 0 would silently give wrong data
+    """
+    state = _request_commit_state(user_id, repo_name, client, count_method)
+    # If commits API fails, default to 0
+    return 0 if state is None else state["commit_count"]
+
+
+def _extends_head(commits, head_sha):
+    """
+    Check that a newest-first commit list is exactly what was added on top
+    of head_sha.
+
+    Every parent must be another listed commit or head_sha itself, head_sha
+    must be a parent of at least one listed commit, and every listed commit
+    must be reachable from the first one. A rewritten history, or new
+    commits dated before the since timestamp, fail the check.
+    """
+    parents = {commit["sha"]: [p["sha"] for p in commit.get("parents", [])]
+               for commit in commits}
+    reaches_head = False
+    for commit_parents in parents.values():
+        for parent_sha in commit_parents:
+            if parent_sha == head_sha:
+                reaches_head = True
+            elif parent_sha not in parents:
+                return False
+
+    reachable = set()
+    stack = [commits[0]["sha"]]
+    while stack:
+        sha = stack.pop()
+        if sha in reachable or sha not in parents:
+            continue
+        reachable.add(sha)
+        stack.extend(parents[sha])
+    return reaches_head and len(reachable) == len(parents)
+
+
+def _request_commit_delta(user_id, repo_name, client=None, state=None):
+    """
+    Update a stored commit count with the commits added since its head.
+
+    Only commits dated from the stored head commit onwards are listed, 100
+    per page, and their number is added to the stored count.
+
+    Args:
+        user_id (str): GitHub username owning the repository
+        repo_name (str): Repository name
+        client (GitHubClient, optional): Client used to send the requests
+        state (dict): Stored state with commit_count, head_sha and head_date
+
+    Returns:
+        dict: The updated commit_count, head_sha and head_date, or None
+        when the new commits do not extend the stored head and the
+        repository has to be recounted
+
+    Raises:
+        RateLimitExceeded: If the rate limit is exhausted
+    """
+    url = f"{_api_url(client)}/repos/{user_id}/{repo_name}/commits"
+    params = {"since": state["head_date"], "per_page": 100}
+    commits = []
+    try:
+        while url:
+            commits_response = _http_get(url, client, params=params)
+            _raise_if_rate_limited(commits_response)
+            if commits_response.status_code != 200:
+                return None
+            commits.extend(commits_response.json())
+            url = commits_response.links.get("next", {}).get("url")
+            # The next link already carries the query string
+            params = None
+    except RateLimitExceeded:
+        raise
+    except requests.exceptions.RequestException:
+        return None
+
+    new_commits = [c for c in commits if c["sha"] != state["head_sha"]]
+    if not new_commits:
+        # Only a push to another branch; the head must still be listed
+        if len(commits) != 1:
+            return None
+        return {key: state[key] for key in ("commit_count", "head_sha", "head_date")}
+    if not _extends_head(new_commits, state["head_sha"]):
+        return None
+
+    new_state = _commit_head_state(new_commits)
+    new_state["commit_count"] = state["commit_count"] + len(new_commits)
+    return new_state
+
+
+def _repo_counter(client=None, count_method="list", repo_state=None):
+    """
+    Build the function counting the commits of one listed repository.
+
+    With a repo_state store, a repository whose pushed_at timestamp matches
+    the stored one keeps its stored count without a commits request, as
+    long as that count was read with the same count_method. With
+    count_method="link", a pushed repository only lists the commits added
+    since its stored head and adds them to the stored count, falling back
+    to a full recount when they do not extend that head or when the stored
+    count was not itself read with "link". Every new count is stored with
+    the new pushed_at and the count method. Failed counts are reported as 0 and
+    not stored.
+
+    Args:
+        client (GitHubClient, optional): Client used to send the requests
+        count_method (str): Commit counting strategy, "list" or "link"
+        repo_state (github_cache.RepoStateStore, optional): Persisted
+            per-repository state
+
+    Returns:
+        callable: Function taking the username and the repository JSON
+        object and returning the commit count
+    """
+    if repo_state is None:
+        def count(user_id, repo):
+            return _fetch_commit_count(user_id, repo["name"], client, count_method)
+        return count
+
+    def count_incremental(user_id, repo):
+        pushed_at = repo.get("pushed_at")
+        commit_count = repo_state.unchanged_count(
+            user_id, repo["name"], pushed_at, count_method
+        )
+        if commit_count is not None:
+            return commit_count
+
+        state = None
+        stored = repo_state.get(user_id, repo["name"])
+        # "list" totals are capped at one page, so deltas only apply to a
+        # count that was itself read with "link"
+        if (count_method == "link" and stored
+                and stored.get("count_method") == "link"
+                and stored.get("head_sha") and stored.get("head_date")):
+            state = _request_commit_delta(user_id, repo["name"], client, stored)
+        if state is None:
+            state = _request_commit_state(
+                user_id, repo["name"], client, count_method
+            )
+        if state is None:
+            return 0
+        state["pushed_at"] = pushed_at
+        state["count_method"] = count_method
+        repo_state.set(user_id, repo["name"], state)
+        return state["commit_count"]
+
+    return count_incremental
+
+
+def _validate_user_id(user_id):
+    """
+    Validate a GitHub username and return it without surrounding whitespace.
+
+    Raises:
+        ValueError: If the username is not a non-empty string
+    """
+    # Input validation - fix the validation logic
+    if not user_id or not isinstance(user_id, str) or user_id.strip() == "":
+        raise ValueError("User ID must be a non-empty string")
+
+    # Strip whitespace from user_id
+    return user_id.strip()
+
+
+def _validate_positive_int(value, name):
+    """Raise ValueError unless value is None or a positive integer."""
+    if value is not None and (not isinstance(value, int) or value < 1):
+        raise ValueError(f"{name} must be a positive integer")
+
+
+def _validate_per_page(per_page):
+    """Raise ValueError unless per_page is a valid GitHub page size."""
+    _validate_positive_int(per_page, "per_page")
+    if per_page is None or per_page > 100:
+        raise ValueError("per_page must be between 1 and 100")
+
+
+def _validate_backend(backend):
+    """Raise ValueError unless backend is a known backend."""
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of: {', '.join(BACKENDS)}")
+
+
+def _validate_count_method(count_method):
+    """Raise ValueError unless count_method is a known counting strategy."""
+    if count_method not in COUNT_METHODS:
+        raise ValueError(
+            f"count_method must be one of: {', '.join(COUNT_METHODS)}"
+        )
+
+
+def _project_repos(repositories, fields):
+    """Keep only the given fields of each decoded repository object."""
+    if not isinstance(repositories, list):
+        return repositories
+    return [{field: repo.get(field) for field in fields} for repo in repositories]
+
+
+def _decode_json_stream(chunks, fields):
+    """
+    Decode a JSON array of repository objects from a stream of byte chunks.
+
+    Elements are decoded one at a time with raw_decode and projected to
+    fields right away, so only one full repository object and the undecoded
+    part of the current chunk are held at once. A document that is not an
+    array is decoded whole and returned unchanged.
+
+    Args:
+        chunks (iterable): UTF-8 encoded byte chunks of the body
+        fields (tuple): Repository fields to keep
+
+    Returns:
+        list: Projected repository objects
+
+    Raises:
+        ValueError: If the body is not valid JSON
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+
+    def read_more():
+        # Append the next chunk, dropping what was already decoded
+        nonlocal buffer, pos
+        chunk = next(chunks, None)
+        decoded = text.decode(chunk or b"", final=chunk is None)
+        if chunk is None and not decoded:
+            return False
+        buffer, pos = buffer[pos:] + decoded, 0
+        return True
+
+    def next_char():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\n\r":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not read_more():
+                return ""
+
+    if next_char() != "[":
+        while read_more():
+            pass
+        return json.loads(buffer[pos:])
+    pos += 1
+
+    repositories = []
+    if next_char() == "]":
+        pos += 1
+    else:
+        while True:
+            next_char()
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element may continue in the next chunk
+                if read_more():
+                    continue
+                raise
+            if end == len(buffer) and read_more():
+                # A number may continue in the next chunk
+                continue
+            repositories.append(_project_repos([value], fields)[0])
+            pos = end
+
+            delimiter = next_char()
+            pos += 1
+            if delimiter == "]":
+                break
+            if delimiter != ",":
+                raise ValueError(
+                    "Expecting ',' delimiter or ']' in repository array"
+                )
+
+    if next_char():
+        raise ValueError("Extra data after repository array")
+    return repositories
+
+
+def _fetch_repos_page(user_id, client=None, url=None, params=None, fields=None):
+    """
+    Fetch and decode one page of a user's repository listing.
+
+    Args:
+        user_id (str): Validated GitHub username
+        client (GitHubClient, optional): Client used to send the request
+        url (str, optional): Page URL, such as a rel="next" link. The first
+            page of the listing is requested when omitted.
+        params (dict, optional): Query parameters sent with the request
+        fields (tuple, optional): Repository fields to keep, such as
+            REPO_FIELDS. Full repository objects are returned when omitted.
+            With a client created with stream_json=True, the page is then
+            decoded as a stream.
+
+    Returns:
+        tuple: Decoded repository objects and the HTTP response
+
+    Raises:
+        requests.exceptions.RequestException: For API request failures
+    """
+    repos_url = url or f"{_api_url(client)}/users/{user_id}/repos"
+    stream = fields is not None and client is not None and client.stream_json
+    kwargs = {}
+    if params is not None:
+        kwargs["params"] = params
+    if stream:
+        kwargs["stream"] = True
+    repos_response = _http_get(repos_url, client, **kwargs)
+    try:
+        repositories = _decode_repos_page(user_id, repos_response, fields, stream)
+    finally:
+        if stream:
+            # Hand the connection back to the pool
+            repos_response.close()
+    return repositories, repos_response
+
+
+def _decode_repos_page(user_id, repos_response, fields, stream):
+    """
+    Check a repository listing response and decode its body.
+
+    Raises:
+        requests.exceptions.RequestException: For API request failures
+    """
+    # Check for HTTP errors
+    _raise_if_rate_limited(repos_response)
+    if repos_response.status_code == 404:
+        raise requests.exceptions.RequestException(
+            f"User '{user_id}' not found: 404 Client Error"
+        )
+    elif repos_response.status_code == 403:
+        raise requests.exceptions.RequestException(
+            f"API rate limit exceeded: 403 Forbidden"
+        )
+
+    repos_response.raise_for_status()
+
+    try:
+        if stream:
+            return _decode_json_stream(
+                repos_response.iter_content(JSON_CHUNK_SIZE), fields
+            )
+        repositories = repos_response.json()
+    except ValueError as e:
+        raise requests.exceptions.RequestException(
+            f"Invalid JSON response: {str(e)}"
+        )
+
+    if fields is not None:
+        repositories = _project_repos(repositories, fields)
+    return repositories
+
+
+def _fetch_repositories(user_id, client=None, fields=None):
+    """
+    Fetch the first page of a user's repository listing.
+
+    Args:
+        user_id (str): Validated GitHub username
+        client (GitHubClient, optional): Client used to send the request
+        fields (tuple, optional): Repository fields to keep
+
+    Returns:
+        list: Repository objects as returned by the GitHub API
+
+    Raises:
+        requests.exceptions.RequestException: For API request failures
+    """
+    repositories, _ = _fetch_repos_page(user_id, client, fields=fields)
+    return repositories
+
+
+def _iter_repositories(user_id, client=None, per_page=100, fields=None):
+    """
+    Yield every repository of a user, following rel="next" links.
+
+    Only the page currently being consumed is held in memory, and the next
+    page is requested only once the previous one has been fully consumed.
+
+    Raises:
+        requests.exceptions.RequestException: For API request failures
+    """
+    repositories, repos_response = _fetch_repos_page(
+        user_id, client, params={"per_page": per_page}, fields=fields
+    )
+    while True:
+        yield from repositories
+
+        next_link = repos_response.links.get("next")
+        if not next_link:
+            return
+        repositories, repos_response = _fetch_repos_page(
+            user_id, client, url=next_link["url"], fields=fields
+        )
+
+
+def iter_user_repositories(user_id, client=None, per_page=100):
+    """
+    Stream every repository of a user across all listing pages.
+
+    Args:
+        user_id (str): GitHub username
+        client (GitHubClient, optional): Shared client used for every page
+        per_page (int, optional): Repositories requested per page, up to
+            GitHub's maximum of 100
+
+    Returns:
+        generator: Repository objects in listing order
+
+    Raises:
+        ValueError: For invalid user input
+        requests.exceptions.RequestException: For API request failures,
+            raised while iterating
+    """
+    user_id = _validate_user_id(user_id)
+    _validate_per_page(per_page)
+
+    def generate():
+        try:
+            yield from _iter_repositories(user_id, client, per_page)
+        except requests.exceptions.RequestException as e:
+            raise _wrap_request_error(user_id, e)
+
+    return generate()
+
+
+def _fetch_graphql_page(user_id, client=None, cursor=None):
+    """
+    Fetch the commit totals of one page of repositories through GraphQL.
 
     Args:
-        user_id (str): GitHub username
+        user_id (str): Validated GitHub username
+        client (GitHubClient, optional): Client used to send the query
+        cursor (str, optional): endCursor of the previous page
 
     Returns:
-        list: List of dictionaries with repo name and commit count
+        tuple: List of (repo name, commit count) pairs and the cursor of
+        the next page, or None on the last page
 
     Raises:
-        ValueError: For invalid user input
         requests.exceptions.RequestException: For API request failures
     """
-    # Input validation - fix the validation logic
-    if not user_id or not isinstance(user_id, str) or user_id.strip() == "":
-        raise ValueError("User ID must be a non-empty string")
+    graphql_response = _http_post(
+        f"{_api_url(client)}/graphql",
+        client,
+        json={
+            "query": REPO_COMMITS_QUERY,
+            "variables": {
+                "login": user_id,
+                "first": GRAPHQL_PAGE_SIZE,
+                "cursor": cursor,
+            },
+        },
+    )
 
-    # Strip whitespace from user_id
-    user_id = user_id.strip()
+    _raise_if_rate_limited(graphql_response)
+    if graphql_response.status_code == 403:
+        raise requests.exceptions.RequestException(
+            f"API rate limit exceeded: 403 Forbidden"
+        )
+
+    graphql_response.raise_for_status()
 
     try:
-        # Get user repositories
-        repos_url = f"https://api.github.com/users/{user_id}/repos"
-        repos_response = requests.get(repos_url)
+        payload = graphql_response.json()
+    except ValueError as e:
+        raise requests.exceptions.RequestException(
+            f"Invalid JSON response: {str(e)}"
+        )
 
-        # Check for HTTP errors
-        if repos_response.status_code == 404:
+    owner = (payload.get("data") or {}).get("repositoryOwner")
+    errors = payload.get("errors") or []
+    if owner is None:
+        if not errors or any(error.get("type") == "NOT_FOUND" for error in errors):
             raise requests.exceptions.RequestException(
                 f"User '{user_id}' not found: 404 Client Error"
             )
-        elif repos_response.status_code == 403:
-            raise requests.exceptions.RequestException(
-                f"API rate limit exceeded: 403 Forbidden"
-            )
+        raise requests.exceptions.RequestException(
+            f"GraphQL query failed: {errors[0].get('message')}"
+        )
+
+    repositories = owner["repositories"]
+    repo_counts = []
+    for node in repositories["nodes"]:
+        branch = node.get("defaultBranchRef")
+        # Empty repositories have no default branch
+        history = ((branch or {}).get("target") or {}).get("history") or {}
+        repo_counts.append(
+            RepoCommitCount(node["name"], history.get("totalCount", 0))
+        )
+
+    page_info = repositories["pageInfo"]
+    next_cursor = page_info["endCursor"] if page_info["hasNextPage"] else None
+    return repo_counts, next_cursor
+
+
+def _iter_graphql_repo_commits(user_id, client=None):
+    """
+    Yield (repo name, commit count) pairs for every repository of a user.
+
+    Each GraphQL query covers up to GRAPHQL_PAGE_SIZE repositories, so a
+    user with 300 repositories costs 3 requests instead of 301.
+
+    Raises:
+        requests.exceptions.RequestException: For API request failures
+    """
+    cursor = None
+    while True:
+        repo_counts, cursor = _fetch_graphql_page(user_id, client, cursor)
+        yield from repo_counts
+        if cursor is None:
+            return
+
+
+def _wrap_request_error(user_id, error):
+    """Return the exception to raise for a failed repository lookup."""
+    # Re-raise with more specific message if not already formatted
+    if "GitHub API request failed" in str(error):
+        return error
+    if isinstance(error, RateLimitExceeded):
+        return RateLimitExceeded(
+            f"Failed to fetch repositories for user {user_id}: {str(error)}",
+            reset_at=error.reset_at,
+        )
+    return requests.exceptions.RequestException(
+        f"Failed to fetch repositories for user {user_id}: {str(error)}"
+    )
+
+
+class NullReporter:
+    """
+    Reporter that discards every event.
+
+    Reporters receive one repo() call per analyzed repository and one
+    summary() call per user, or one error() call for a user that could not
+    be analyzed. close() ends the output. This default costs no I/O, which
+    is what library callers want.
+    """
+
+    def repo(self, user_id, repo_name, commit_count):
+        """Handle the commit count of one repository."""
+
+    def summary(self, user_id, total_repos, total_commits):
+        """Handle the totals of one analyzed user."""
+
+    def error(self, user_id, error):
+        """Handle a user whose analysis failed."""
+
+    def close(self):
+        """Finish the output."""
+
+
+class ConsoleReporter(NullReporter):
+    """
+    Reporter printing the human-readable output of the command line tool.
+
+    Args:
+        stream (file, optional): Text stream to write to. Defaults to
+            sys.stdout at the time of each call.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def repo(self, user_id, repo_name, commit_count):
+        print(f"Repo: {repo_name} | Number of commits: {commit_count}",
+              file=self.stream)
+
+    def summary(self, user_id, total_repos, total_commits):
+        print(f"\nSummary:", file=self.stream)
+        print(f"    Total repositories: {total_repos}", file=self.stream)
+        print(f"    Total commits: {total_commits}", file=self.stream)
+        print(f"    Successfully analyzed all repositories", file=self.stream)
+
+
+class NDJSONReporter(NullReporter):
+    """
+    Reporter writing one JSON object per line, buffered.
+
+    Lines are collected in memory and written with a single write() call
+    once buffer_size lines are pending, at each summary, and on flush().
+    The reporter is safe to share between threads.
+
+    Args:
+        stream (file): Text stream to write to
+        buffer_size (int): Number of lines buffered before writing
+    """
+
+    def __init__(self, stream, buffer_size=1000):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._lines = []
+        self._lock = threading.Lock()
+
+    def _write(self, record, flush):
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._lines.append(line)
+            if flush or len(self._lines) >= self.buffer_size:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._lines:
+            self.stream.write("\n".join(self._lines) + "\n")
+            self._lines = []
+
+    def repo(self, user_id, repo_name, commit_count):
+        self._write(
+            {"user_id": user_id, "repo_name": repo_name,
+             "commit_count": commit_count},
+            flush=False,
+        )
+
+    def summary(self, user_id, total_repos, total_commits):
+        self._write(
+            {"user_id": user_id, "total_repos": total_repos,
+             "total_commits": total_commits},
+            flush=True,
+        )
+
+    def error(self, user_id, error):
+        self._write({"user_id": user_id, "error": str(error)}, flush=False)
+
+    def flush(self):
+        """Write every buffered line."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+
+
+class JSONReporter(NDJSONReporter):
+    """
+    Reporter writing the NDJSON records as elements of one JSON array.
+
+    The array is written incrementally and only complete after close().
+
+    Args:
+        stream (file): Text stream to write to
+        buffer_size (int): Number of records buffered before writing
+    """
+
+    def __init__(self, stream, buffer_size=1000):
+        super().__init__(stream, buffer_size)
+        self._started = False
+
+    def _flush_locked(self):
+        if self._lines:
+            prefix = ",\n" if self._started else "[\n"
+            self.stream.write(prefix + ",\n".join(self._lines))
+            self._started = True
+            self._lines = []
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self.stream.write("\n]\n" if self._started else "[]\n")
 
-        repos_response.raise_for_status()
 
+class CSVReporter(NullReporter):
+    """
+    Reporter writing user_id,repo_name,commit_count,error CSV rows.
+
+    Args:
+        stream (file): Text stream to write to
+    """
+
+    def __init__(self, stream):
+        self._writer = csv.writer(stream, lineterminator="\n")
+        self._writer.writerow(["user_id", "repo_name", "commit_count", "error"])
+
+    def repo(self, user_id, repo_name, commit_count):
+        self._writer.writerow([user_id, repo_name, commit_count, ""])
+
+    def error(self, user_id, error):
+        self._writer.writerow([user_id, "", "", str(error)])
+
+
+class TableReporter(NullReporter):
+    """
+    Reporter writing aligned user, repository and commit count columns.
+
+    Args:
+        stream (file, optional): Text stream to write to. Defaults to
+            sys.stdout at the time of each call.
+    """
+
+    ROW = "{:<24} {:<40} {:>8}"
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._header = False
+
+    def _print(self, line):
+        if not self._header:
+            self._header = True
+            print(self.ROW.format("USER", "REPOSITORY", "COMMITS"), file=self.stream)
+        print(line, file=self.stream)
+
+    def repo(self, user_id, repo_name, commit_count):
+        self._print(self.ROW.format(user_id, repo_name, commit_count))
+
+    def error(self, user_id, error):
+        self._print(f"{user_id:<24} Error: {error}")
+
+
+def _iter_rest_repo_counts(user_id, client=None, max_workers=None,
+                           count_method="list", paginate=False, ordered=True,
+                           repo_state=None):
+    """
+    Yield (repo name, commit count) pairs using the REST endpoints.
+
+    Sequential mode counts each repository as it is listed. Concurrent mode
+    submits each repository to a thread pool as soon as its page is decoded
+    and yields counts as they arrive, either in listing order or, with
+    ordered=False, in completion order.
+
+    Raises:
+        requests.exceptions.RequestException: For API request failures
+    """
+    if paginate:
+        repositories = _iter_repositories(user_id, client, fields=REPO_FIELDS)
+    else:
+        repositories = _fetch_repositories(user_id, client, fields=REPO_FIELDS)
+
+    fetch_count = partial(_repo_counter(client, count_method, repo_state), user_id)
+
+    if max_workers is None:
+        for repo in repositories:
+            yield RepoCommitCount(repo["name"], fetch_count(repo))
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    # Futures in listing order, and in completion order via done callbacks
+    submitted = deque()
+    completed = queue.Queue()
+    names = {}
+
+    def drain(block):
+        if ordered:
+            while submitted and (block or submitted[0].done()):
+                future = submitted.popleft()
+                yield RepoCommitCount(names.pop(future), future.result())
+        else:
+            while names and (block or not completed.empty()):
+                future = completed.get()
+                yield RepoCommitCount(names.pop(future), future.result())
+
+    try:
+        for repo in repositories:
+            future = executor.submit(fetch_count, repo)
+            names[future] = repo["name"]
+            submitted.append(future)
+            if not ordered:
+                future.add_done_callback(completed.put)
+            # Hand out finished counts while later repositories are listed
+            yield from drain(block=False)
+
+        yield from drain(block=True)
+    finally:
+        # Stop queued work if the caller abandons the iterator early
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _iter_repo_counts(user_id, client=None, max_workers=None, count_method="list",
+                      paginate=False, backend="rest", ordered=True,
+                      repo_state=None):
+    """
+    Yield (repo name, commit count) pairs from the selected backend.
+
+    Raises:
+        requests.exceptions.RequestException: For API request failures
+    """
+    if backend == "graphql":
+        return _iter_graphql_repo_commits(user_id, client)
+    return _iter_rest_repo_counts(
+        user_id, client, max_workers, count_method, paginate, ordered,
+        repo_state,
+    )
+
+
+def iter_user_repos_with_commits(user_id, max_workers=None, client=None,
+                                 count_method="list", paginate=False,
+                                 backend="rest", ordered=True, repo_state=None):
+    """
+    Stream (repo name, commit count) pairs as soon as each count arrives.
+
+    Unlike get_user_repos_with_commits, nothing is accumulated or printed.
+    The first pair is available one commits round-trip after the listing
+    instead of after the slowest repository.
+
+    Args:
+        user_id (str): GitHub username
+        max_workers (int, optional): Number of threads used to fetch commit
+            counts concurrently
+        client (GitHubClient, optional): Shared client for every request
+        count_method (str, optional): "list" (default) or "link"
+        paginate (bool, optional): Follow rel="next" links of the listing
+        backend (str, optional): "rest" (default) or "graphql"
+        ordered (bool, optional): Yield pairs in listing order (default).
+            With False and max_workers, pairs are yielded in the order the
+            counts complete.
+        repo_state (github_cache.RepoStateStore, optional): Persisted
+            counts reused for repositories whose pushed_at is unchanged
+
+    Returns:
+        generator: RepoCommitCount records, which unpack as (repo name,
+        commit count) pairs
+
+    Raises:
+        ValueError: For invalid user input
+        requests.exceptions.RequestException: For API request failures,
+            raised while iterating
+    """
+    user_id = _validate_user_id(user_id)
+    _validate_positive_int(max_workers, "max_workers")
+    _validate_count_method(count_method)
+    _validate_backend(backend)
+
+    def generate():
         try:
-            repositories = repos_response.json()
-        except ValueError as e:
-            raise requests.exceptions.RequestException(
-                f"Invalid JSON response: {str(e)}"
+            yield from _iter_repo_counts(
+                user_id, client, max_workers, count_method, paginate, backend,
+                ordered, repo_state,
+            )
+        except requests.exceptions.RequestException as e:
+            raise _wrap_request_error(user_id, e)
+
+    return generate()
+
+
+# Analyses in progress, shared by concurrent get_user_repos_with_commits calls
+_user_flights = SingleFlight()
+
+
+def get_user_repos_with_commits(user_id, max_workers=None, client=None,
+                                count_method="list", paginate=False,
+                                backend="rest", result_cache=None,
+                                reporter=None, repo_state=None, records=False,
+                                coalesce=True):
+    """
+    Retrieve user repositories and their commit counts.
+
+    Args:
+        user_id (str): GitHub username
+        max_workers (int, optional): Number of threads used to fetch commit
+            counts concurrently. Commits are fetched one repository at a
+            time when omitted.
+        client (GitHubClient, optional): Shared client whose pooled
+            connections are reused for every request. A plain
+            requests.get call is made per request when omitted.
+        count_method (str, optional): "list" (default) counts the first
+            page of commits, capped at 30. "link" requests one commit per
+            page and reads the exact total from the Link header.
+        paginate (bool, optional): Follow rel="next" links with 100
+            repositories per page instead of reading only the first page.
+            Commit counting starts on each page while later pages are
+            still being listed.
+        backend (str, optional): "rest" (default) makes one commits call
+            per repository. "graphql" reads exact commit totals for 100
+            repositories per query, with every page included. It ignores
+            max_workers, count_method and paginate. GitHub requires a
+            client with a token for GraphQL.
+        result_cache (github_cache.ResultCache, optional): In-memory cache
+            of earlier results. A fresh entry for the user computed with the
+            same count_method, paginate and backend is returned without any
+            GitHub request, and new results are stored in it.
+        reporter (NullReporter, optional): Receives each repository count
+            and the summary. Nothing is output when omitted; pass
+            ConsoleReporter() for the human-readable console output.
+        repo_state (github_cache.RepoStateStore, optional): Persisted
+            per-repository state for incremental refreshes. Repositories
+            whose pushed_at is unchanged since the stored count are not
+            recounted. Used by the REST backend only.
+        records (bool, optional): Return RepoCommitCount records instead
+            of dictionaries, which uses far less memory for large results
+        coalesce (bool, optional): When another thread is already analyzing
+            the same user with the same client and options, wait for its
+            result, or its error, instead of sending the same requests
+            again. Usernames are compared case-insensitively.
+
+    Returns:
+        list: List of dictionaries with repo name and commit count, or of
+        RepoCommitCount records with records=True
+
+    Raises:
+        ValueError: For invalid user input
+        requests.exceptions.RequestException: For API request failures
+    """
+    user_id = _validate_user_id(user_id)
+    _validate_positive_int(max_workers, "max_workers")
+    _validate_count_method(count_method)
+    _validate_backend(backend)
+    if reporter is None:
+        reporter = NullReporter()
+    metrics = client.metrics if client is not None else None
+
+    cache_options = (count_method, paginate, backend)
+    if result_cache is not None:
+        cached = result_cache.get(user_id, cache_options)
+        if metrics is not None:
+            if cached is None:
+                metrics.cache_miss("result")
+            else:
+                metrics.cache_hit("result")
+        if cached is not None:
+            for repo in cached:
+                reporter.repo(user_id, repo["repo_name"], repo["commit_count"])
+            reporter.summary(
+                user_id, len(cached), sum(repo["commit_count"] for repo in cached)
             )
+            if records:
+                return [RepoCommitCount(**repo) for repo in cached]
+            return cached
+
+    reported = False
 
+    def collect():
+        # Runs in the first caller only, which reports counts as they arrive
+        nonlocal reported
+        reported = True
         result = []
-        total_commits = 0
+        repo_counts = _iter_repo_counts(
+            user_id, client, max_workers, count_method, paginate, backend,
+            repo_state=repo_state,
+        )
+        for record in repo_counts:
+            result.append(record)
+            reporter.repo(user_id, record.repo_name, record.commit_count)
+        return tuple(result)
 
-        for repo in repositories:
-            repo_name = repo["name"]
+    try:
+        if coalesce:
+            key = (user_id.lower(), client, count_method, paginate, backend,
+                   repo_state)
+            result = _user_flights.do(key, collect)
+        else:
+            result = collect()
+    except requests.exceptions.RequestException as e:
+        raise _wrap_request_error(user_id, e)
+
+    if not reported:
+        for record in result:
+            reporter.repo(user_id, record.repo_name, record.commit_count)
+    if metrics is not None:
+        metrics.observe_user(len(result))
+    reporter.summary(
+        user_id, len(result), sum(record.commit_count for record in result)
+    )
+    if records and result_cache is None:
+        return list(result)
+    dicts = [record.as_dict() for record in result]
+    if result_cache is not None:
+        result_cache.set(user_id, dicts, cache_options)
+    return list(result) if records else dicts
+
+
+def iter_many_users_repos_with_commits(user_ids, max_workers=16, client=None,
+                                       count_method="list", paginate=False,
+                                       repo_state=None, records=False):
+    """
+    Stream repositories and commit counts for many users, in input order.
+
+    Repository listings and commit-count calls of all users go through one
+    thread pool, so listing the next users overlaps with counting the
+    commits of earlier ones and the network is never idle. At most
+    max_workers requests are in flight at any time. A failure only affects
+    the user it belongs to. Nothing is printed.
+
+    Each user's entry is yielded as soon as it and every earlier user are
+    finished. Usernames are only read while fewer than 4 * max_workers
+    users are in progress or waiting to be yielded, so memory stays bounded
+    for any number of users.
+
+    Args:
+        user_ids (iterable): GitHub usernames, consumed lazily
+        max_workers (int, optional): Global number of concurrent requests.
+            Defaults to 16.
+        client (GitHubClient, optional): Shared client for every request.
+            Its rate_limiter, if any, is the global rate budget. When
+            omitted, a client with pool_maxsize=max_workers and a
+            RateLimiter is created and closed again.
+        count_method (str, optional): Commit counting strategy, either
+            "list" (default) or "link"
+        paginate (bool, optional): Follow rel="next" links of each listing
+        repo_state (github_cache.RepoStateStore, optional): Persisted
+            counts reused for repositories whose pushed_at is unchanged
+        records (bool, optional): Report each user's repositories as
+            RepoCommitCount records instead of dictionaries
+
+    Returns:
+        generator: One dictionary per input username with keys "user_id",
+        "repos" (the list returned by get_user_repos_with_commits, or None
+        on failure), "error" (the exception, or None) and "elapsed" (seconds
+        from the start of the user's listing to its last count)
+
+    Raises:
+        ValueError: For an invalid max_workers or count_method
+    """
+    _validate_positive_int(max_workers, "max_workers")
+    if max_workers is None:
+        raise ValueError("max_workers must be a positive integer")
+    _validate_count_method(count_method)
 
-            # Get commit count for each repository
-            commits_url = f"https://api.github.com/repos/{user_id}/{repo_name}/commits"
+    def generate():
+        own_client = client is None
+        batch_client = client
+        if own_client:
+            batch_client = GitHubClient(
+                pool_maxsize=max_workers, rate_limiter=RateLimiter()
+            )
+        try:
+            yield from _iter_many_users(
+                iter(user_ids), max_workers, batch_client, count_method,
+                paginate, repo_state, records,
+            )
+        finally:
+            if own_client:
+                batch_client.close()
+
+    return generate()
+
+
+def _iter_many_users(user_iter, max_workers, client, count_method, paginate,
+                     repo_state, records):
+    """Yield per-user entries for iter_many_users_repos_with_commits."""
+    def list_repos(user_id):
+        if paginate:
+            return list(_iter_repositories(user_id, client, fields=REPO_FIELDS))
+        return _fetch_repositories(user_id, client, fields=REPO_FIELDS)
+
+    fetch_count = _repo_counter(client, count_method, repo_state)
+
+    # Finished entries waiting for every earlier user, keyed by input index
+    finished = {}
+    users = {}
+    pending = {}
+    # Bound queued work so users are only listed as capacity frees up
+    max_pending = max_workers * 4
+    started = yielded = 0
+    exhausted = False
+
+    def finish(index, repos=None, error=None):
+        if repos is not None and client.metrics is not None:
+            client.metrics.observe_user(len(repos))
+        state = users.pop(index)
+        finished[index] = {
+            "user_id": state["user_id"],
+            "repos": repos,
+            "error": error,
+            "elapsed": time.monotonic() - state["started_at"],
+        }
+
+    def submit_users(executor):
+        nonlocal started, exhausted
+        while len(pending) < max_pending and started - yielded < max_pending:
             try:
-                commits_response = requests.get(commits_url)
+                user_id = next(user_iter)
+            except StopIteration:
+                exhausted = True
+                return
+            index = started
+            started += 1
+            users[index] = {"user_id": user_id, "started_at": time.monotonic()}
+            try:
+                user_id = _validate_user_id(user_id)
+            except ValueError as e:
+                finish(index, error=e)
+                continue
+            users[index]["user_id"] = user_id
+            future = executor.submit(list_repos, user_id)
+            pending[future] = (index, None)
 
-                if commits_response.status_code == 200:
-                    commits = commits_response.json()
-                    commit_count = len(commits)
-                else:
-                    # Handle cases where commits are not accessible (private repos, etc.)
-                    commit_count = 0
+    def ready():
+        nonlocal yielded
+        while yielded in finished:
+            yield finished.pop(yielded)
+            yielded += 1
 
-            except requests.exceptions.RequestException:
-                # If commits API fails, default to 0
-                commit_count = 0
+    def user_error(user_id, error):
+        if isinstance(error, requests.exceptions.RequestException):
+            return _wrap_request_error(user_id, error)
+        return error
 
-            result.append({"repo_name": repo_name, "commit_count": commit_count})
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            submit_users(executor)
+            yield from ready()
+            if not pending:
+                if exhausted:
+                    return
+                continue
 
-            total_commits += commit_count
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, position = pending.pop(future)
+                state = users.get(index)
+                if state is None:
+                    # The user already failed; drop its remaining counts
+                    continue
+                user_id = state["user_id"]
 
-            # Display output as required
-            print(f"Repo: {repo_name} | Number of commits: {commit_count}")
+                try:
+                    value = future.result()
+                except Exception as e:
+                    finish(index, error=user_error(user_id, e))
+                    continue
 
-        # Print summary
-        print(f"\nSummary:")
-        print(f"    Total repositories: {len(result)}")
-        print(f"    Total commits: {total_commits}")
-        print(f"    Successfully analyzed all repositories")
-        return result
+                if position is None:
+                    # Listing finished; queue one count per repository
+                    state["names"] = [repo["name"] for repo in value]
+                    state["counts"] = [None] * len(value)
+                    state["remaining"] = len(value)
+                    if not value:
+                        finish(index, repos=[])
+                    for position, repo in enumerate(value):
+                        count_future = executor.submit(fetch_count, user_id, repo)
+                        pending[count_future] = (index, position)
+                    continue
 
-    except requests.exceptions.RequestException as e:
-        # Re-raise with more specific message if not already formatted
-        if "GitHub API request failed" not in str(e):
-            raise requests.exceptions.RequestException(
-                f"Failed to fetch repositories for user {user_id}: {str(e)}"
+                state["counts"][position] = value
+                state["remaining"] -= 1
+                if state["remaining"] == 0:
+                    repos = list(map(
+                        RepoCommitCount, state["names"], state["counts"]
+                    ))
+                    if not records:
+                        repos = [record.as_dict() for record in repos]
+                    finish(index, repos=repos)
+    finally:
+        # Stop queued work if the caller abandons the iterator early
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def get_many_users_repos_with_commits(user_ids, max_workers=16, client=None,
+                                      count_method="list", paginate=False,
+                                      repo_state=None, records=False):
+    """
+    Retrieve repositories and commit counts for many users at once.
+
+    Collects iter_many_users_repos_with_commits into a list; see there for
+    how the work is scheduled. Nothing is printed.
+
+    Args:
+        user_ids (iterable): GitHub usernames, consumed lazily
+        max_workers (int, optional): Global number of concurrent requests.
+            Defaults to 16.
+        client (GitHubClient, optional): Shared client for every request.
+            Its rate_limiter, if any, is the global rate budget. When
+            omitted, a client with pool_maxsize=max_workers and a
+            RateLimiter is created and closed again.
+        count_method (str, optional): Commit counting strategy, either
+            "list" (default) or "link"
+        paginate (bool, optional): Follow rel="next" links of each listing
+        repo_state (github_cache.RepoStateStore, optional): Persisted
+            counts reused for repositories whose pushed_at is unchanged
+        records (bool, optional): Report each user's repositories as
+            RepoCommitCount records instead of dictionaries
+
+    Returns:
+        list: One dictionary per input username, in input order, with keys
+        "user_id", "repos" (the list returned by get_user_repos_with_commits,
+        or None on failure), "error" (the exception, or None) and "elapsed"
+
+    Raises:
+        ValueError: For an invalid max_workers or count_method
+    """
+    return list(iter_many_users_repos_with_commits(
+        user_ids, max_workers, client, count_method, paginate, repo_state,
+        records,
+    ))
+
+
+# Threads sending the requests of every async_get_user_repos_with_commits
+# call that is not given its own executor
+ASYNC_MAX_WORKERS = 32
+
+_async_executor = None
+_async_executor_lock = threading.Lock()
+
+
+def _get_async_executor():
+    """Return the pool shared by coroutine calls, creating it on first use."""
+    global _async_executor
+    with _async_executor_lock:
+        if _async_executor is None:
+            _async_executor = ThreadPoolExecutor(
+                max_workers=ASYNC_MAX_WORKERS, thread_name_prefix="github-async"
             )
+        return _async_executor
+
+
+async def async_get_user_repos_with_commits(user_id, max_concurrency=10,
+                                            client=None, count_method="list",
+                                            paginate=False, backend="rest",
+                                            reporter=None, records=False,
+                                            executor=None):
+    """
+    Coroutine equivalent of get_user_repos_with_commits.
+
+    The repository listing and every commit-count call run as separate
+    tasks, with a semaphore capping how many requests are in flight at
+    once. The event loop is never blocked while a request is pending.
+
+    Requests are sent from executor threads. Unless an executor is passed,
+    every call shares one pool of ASYNC_MAX_WORKERS threads, which caps the
+    requests in flight across all concurrent calls; max_concurrency only
+    keeps one call from taking the whole pool. Cancelling the coroutine
+    cancels the requests still waiting for a thread, but a request already
+    sent runs until it completes or times out.
+
+    Args:
+        user_id (str): GitHub username
+        max_concurrency (int, optional): Maximum number of concurrent
+            GitHub requests. Defaults to 10.
+        client (GitHubClient, optional): Shared client whose pooled
+            connections are reused for every request
+        count_method (str, optional): Commit counting strategy, either
+            "list" (default) or "link"
+        paginate (bool, optional): Follow rel="next" links with 100
+            repositories per page. Commit-count tasks for a page start
+            while the next page is being fetched.
+        backend (str, optional): "rest" (default) or "graphql", which
+            queries 100 repositories per request
+        reporter (NullReporter, optional): Receives each repository count
+            and the summary. Nothing is output when omitted.
+        records (bool, optional): Return RepoCommitCount records instead
+            of dictionaries
+        executor (concurrent.futures.Executor, optional): Executor sending
+            the requests instead of the shared pool. It is left running.
+
+    Returns:
+        list: List of dictionaries with repo name and commit count, or of
+        RepoCommitCount records with records=True
+
+    Raises:
+        ValueError: For invalid user input
+        requests.exceptions.RequestException: For API request failures
+    """
+    user_id = _validate_user_id(user_id)
+    _validate_positive_int(max_concurrency, "max_concurrency")
+    _validate_count_method(count_method)
+    _validate_backend(backend)
+    if reporter is None:
+        reporter = NullReporter()
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    loop = asyncio.get_running_loop()
+    if executor is None:
+        executor = _get_async_executor()
+
+    async def run_limited(func, *args):
+        async with semaphore:
+            return await loop.run_in_executor(executor, func, *args)
+
+    fetch_count = partial(
+        _fetch_commit_count, user_id, client=client, count_method=count_method
+    )
+    repo_names = []
+    count_tasks = []
+
+    async def graphql_counts():
+        commit_counts = []
+        cursor = None
+        while True:
+            repo_counts, cursor = await asyncio.create_task(
+                run_limited(_fetch_graphql_page, user_id, client, cursor)
+            )
+            for repo_name, commit_count in repo_counts:
+                repo_names.append(repo_name)
+                commit_counts.append(commit_count)
+            if cursor is None:
+                return commit_counts
+
+    async def rest_counts():
+        page_url = None
+        params = {"per_page": 100} if paginate else None
+        while True:
+            repositories, repos_response = await asyncio.create_task(
+                run_limited(
+                    _fetch_repos_page, user_id, client, page_url, params,
+                    REPO_FIELDS,
+                )
+            )
+
+            for repo in repositories:
+                repo_names.append(repo["name"])
+                count_tasks.append(
+                    asyncio.create_task(run_limited(fetch_count, repo["name"]))
+                )
+
+            next_link = repos_response.links.get("next") if paginate else None
+            if not next_link:
+                return await asyncio.gather(*count_tasks)
+            page_url, params = next_link["url"], None
+
+    try:
+        if backend == "graphql":
+            commit_counts = await graphql_counts()
         else:
-            raise e
+            commit_counts = await rest_counts()
+
+        result = []
+        total_commits = 0
+
+        for record in map(RepoCommitCount, repo_names, commit_counts):
+            result.append(record if records else record.as_dict())
+
+            total_commits += record.commit_count
+            reporter.repo(user_id, record.repo_name, record.commit_count)
+
+        reporter.summary(user_id, len(result), total_commits)
+        return result
+
+    except requests.exceptions.RequestException as e:
+        # A later listing page failed; drop the commit counts already queued
+        for task in count_tasks:
+            task.cancel()
+        raise _wrap_request_error(user_id, e)
+
+
+# Reporters selectable with --format, each taking the output stream
+OUTPUT_FORMATS = {
+    "table": TableReporter,
+    "json": JSONReporter,
+    "ndjson": NDJSONReporter,
+    "csv": CSVReporter,
+}
+
+# Per-user latencies kept for the percentiles of the summary line
+LATENCY_SAMPLE_SIZE = 10000
+
+
+def _build_parser():
+    """Build the command-line argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="github_api",
+        description="Count the commits of every public repository of "
+                    "GitHub users. Usernames are read from the arguments, "
+                    "from --input, or from stdin, one per line.",
+    )
+    parser.add_argument("users", nargs="*", help="GitHub usernames")
+    parser.add_argument(
+        "-i", "--input", metavar="FILE",
+        help="read usernames from FILE, one per line; - reads stdin",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=16,
+        help="concurrent GitHub requests (default: 16)",
+    )
+    parser.add_argument(
+        "-f", "--format", choices=sorted(OUTPUT_FORMATS), default="table",
+        help="output format (default: table)",
+    )
+    parser.add_argument(
+        "--cache", metavar="PATH",
+        help="SQLite response cache shared between runs",
+    )
+    parser.add_argument(
+        "--state", metavar="PATH",
+        help="repository state file for incremental refreshes",
+    )
+    parser.add_argument(
+        "--cassette", metavar="FILE",
+        help="replay responses from FILE, or record them there if it "
+             "does not exist yet",
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="write a Chrome trace of every request to FILE",
+    )
+    parser.add_argument(
+        "--count-method", choices=COUNT_METHODS, default="list",
+        help="commit counting strategy (default: list)",
+    )
+    parser.add_argument(
+        "--paginate", action="store_true",
+        help="list every repository instead of the first page",
+    )
+    parser.add_argument(
+        "--token", default=os.environ.get("GITHUB_TOKEN"),
+        help="personal access token (default: $GITHUB_TOKEN)",
+    )
+    parser.add_argument(
+        "--base-url", default=GITHUB_API_URL, help=argparse.SUPPRESS,
+    )
+    return parser
+
+
+def _iter_usernames(users, input_path, stdin):
+    """Yield usernames from the arguments and the input file or stdin."""
+    yield from users
+    if input_path is None and users:
+        return
+
+    if input_path in (None, "-"):
+        lines = stdin
+    else:
+        lines = open(input_path, "r", encoding="utf-8")
+    try:
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if lines is not stdin:
+            lines.close()
+
+
+def percentile(sorted_values, fraction):
+    """
+    Return the nearest-rank percentile of a sorted list.
+
+    Args:
+        sorted_values (list): Values in ascending order
+        fraction (float): Percentile between 0 and 1, e.g. 0.99 for p99
+
+    Returns:
+        float: The percentile, or 0.0 for an empty list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[rank]
+
+
+def main(argv=None):
+    """
+    Command-line entry point, run as python -m github_api.
+
+    Results are streamed to stdout in the selected format while later users
+    are still being analyzed, and a throughput and latency summary line is
+    written to stderr at the end.
 
+    Args:
+        argv (list, optional): Arguments to parse instead of sys.argv
+
+    Returns:
+        int: Exit status, 0 when every user was analyzed and 1 otherwise
+    """
+    args = _build_parser().parse_args(argv)
 
-def main():
-    """Main function for testing purposes"""
+    response_cache = SQLiteResponseCache(args.cache) if args.cache else None
+    repo_state = RepoStateStore(args.state) if args.state else None
+    retry = build_retry()
+    rate_limiter = RateLimiter()
+    adapter = None
+    if args.cassette:
+        adapter = CassetteAdapter(
+            args.cassette,
+            adapter=TracingHTTPAdapter(pool_maxsize=args.workers, max_retries=retry),
+        )
+        if adapter.mode == "replay":
+            # Replayed responses cost nothing, so nothing needs pacing
+            rate_limiter = None
+    client = GitHubClient(
+        token=args.token,
+        pool_maxsize=args.workers,
+        base_url=args.base_url,
+        response_cache=response_cache,
+        rate_limiter=rate_limiter,
+        retry=retry,
+        adapter=adapter,
+    )
+    reporter = OUTPUT_FORMATS[args.format](sys.stdout)
+    trace = RequestTrace(client).start() if args.trace else None
+
+    users = failed = total_repos = total_commits = 0
+    latencies = []
+    sampler = random.Random(0)
+    started = time.monotonic()
     try:
-        user = "vanshajtyagi"
-        user_repos = get_user_repos_with_commits(user)
-        print(f'Fetched Repositories from Github for user: {user}')
-        print(f"Successfully retrieved {len(user_repos)} repositories")
+        entries = iter_many_users_repos_with_commits(
+            _iter_usernames(args.users, args.input, sys.stdin),
+            max_workers=args.workers,
+            client=client,
+            count_method=args.count_method,
+            paginate=args.paginate,
+            repo_state=repo_state,
+            records=True,
+        )
+        for entry in entries:
+            users += 1
+            # Reservoir sample, so memory stays bounded for any batch size
+            if len(latencies) < LATENCY_SAMPLE_SIZE:
+                latencies.append(entry["elapsed"])
+            else:
+                slot = sampler.randrange(users)
+                if slot < LATENCY_SAMPLE_SIZE:
+                    latencies[slot] = entry["elapsed"]
+
+            if entry["error"] is not None:
+                failed += 1
+                reporter.error(entry["user_id"], entry["error"])
+                continue
+            user_commits = 0
+            for repo_name, commit_count in entry["repos"]:
+                reporter.repo(entry["user_id"], repo_name, commit_count)
+                user_commits += commit_count
+            reporter.summary(entry["user_id"], len(entry["repos"]), user_commits)
+            total_repos += len(entry["repos"])
+            total_commits += user_commits
     except Exception as e:
-        print(f"Error: {str(e)}")
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        reporter.close()
+        if trace is not None:
+            trace.stop()
+            trace.dump(args.trace)
+        client.close()
+        if response_cache is not None:
+            response_cache.close()
+        if repo_state is not None:
+            repo_state.save()
+
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    print(
+        f"Analyzed {users} users ({failed} failed), {total_repos} repositories, "
+        f"{total_commits} commits in {elapsed:.2f}s | "
+        f"{users / elapsed if elapsed else 0.0:.1f} users/s | "
+        f"latency p50 {percentile(latencies, 0.5):.3f}s "
+        f"p99 {percentile(latencies, 0.99):.3f}s",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,677 @@
+"""
+GitHub API Response Caching Module.
+
+This module provides caches that sit underneath GitHubClient so repeated
+analyses of the same users can reuse earlier GitHub responses instead of
+downloading them again.
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Response headers kept alongside cached bodies. Link is needed for
+# pagination and Link-header commit counting.
+CACHED_HEADERS = ("Content-Type", "Link", "ETag", "Last-Modified")
+
+# Default freshness lifetimes, in seconds, per endpoint kind
+DEFAULT_TTLS = {"repos": 300, "commits": 600, "default": 60}
+
+
+def endpoint_for_url(url):
+    """
+    Classify a GitHub API URL by endpoint kind.
+
+    Returns:
+        str: "repos" for repository listings, "commits" for commit
+        listings, "default" for anything else
+    """
+    path = urlparse(url).path.rstrip("/")
+    if path.endswith("/commits"):
+        return "commits"
+    if path.endswith("/repos"):
+        return "repos"
+    return "default"
+
+
+def build_response(url, status_code, headers, body, request=None):
+    """
+    Build a requests.Response from stored parts.
+
+    Args:
+        url (str): URL the response belongs to
+        status_code (int): HTTP status code
+        headers (dict): Response headers
+        body (bytes): Raw response body
+        request (requests.PreparedRequest, optional): Originating request
+
+    Returns:
+        requests.Response: Response usable like one read from the network
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    # The body is already read, so iter_content serves it from memory
+    response._content_consumed = True
+    response.encoding = "utf-8"
+    response.request = request
+    return response
+
+
+class ConditionalCache:
+    """
+    Persistent store of validators and bodies for conditional GET requests.
+
+    Every cacheable 200 response is stored with its ETag and Last-Modified
+    validators. The next request for the same key sends If-None-Match and
+    If-Modified-Since, and a 304 Not Modified answer is served from the
+    stored body. GitHub does not count 304 answers against the rate limit.
+
+    Args:
+        path (str, optional): JSON file the cache is loaded from and saved
+            to. The cache lives only in memory when omitted.
+
+    Example:
+        with ConditionalCache("github-etags.json") as cache:
+            client = GitHubClient(conditional_cache=cache)
+            get_user_repos_with_commits("octocat", client=client)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def conditional_headers(self, key):
+        """
+        Return the validator headers to send for a cached key.
+
+        Args:
+            key (str): Cache key of the request
+
+        Returns:
+            dict: If-None-Match and If-Modified-Since headers, or an empty
+            dict when nothing is cached for the key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry["headers"].get("ETag"):
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    def store(self, key, response):
+        """
+        Remember a 200 response that carries a validator.
+
+        Args:
+            key (str): Cache key of the request
+            response (requests.Response): Response read from the network
+        """
+        with self._lock:
+            self.misses += 1
+        if response.status_code != 200:
+            return
+        if not (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+            return
+
+        headers = {
+            name: response.headers[name]
+            for name in CACHED_HEADERS
+            if name in response.headers
+        }
+        entry = {
+            "headers": headers,
+            "body": base64.b64encode(response.content).decode("ascii"),
+        }
+        with self._lock:
+            self._entries[key] = entry
+
+    def revalidated(self, key, response):
+        """
+        Turn a 304 Not Modified answer into the cached 200 response.
+
+        Headers from the 304 answer, such as fresh rate-limit headers,
+        override the cached ones.
+
+        Args:
+            key (str): Cache key of the request
+            response (requests.Response): The 304 response
+
+        Returns:
+            requests.Response: The cached response, or the 304 response
+            itself when the key is no longer cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return response
+            self.hits += 1
+
+        headers = dict(entry["headers"])
+        headers.update(response.headers)
+        return build_response(
+            response.url,
+            200,
+            headers,
+            base64.b64decode(entry["body"]),
+            response.request,
+        )
+
+    def clear(self):
+        """Forget every cached response."""
+        with self._lock:
+            self._entries.clear()
+
+    def load(self):
+        """Replace the cached entries with the contents of the cache file."""
+        with open(self.path, "r", encoding="utf-8") as cache_file:
+            entries = json.load(cache_file)
+        with self._lock:
+            self._entries = entries
+
+    def save(self):
+        """Write the cached entries to the cache file atomically."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = dict(self._entries)
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(entries, cache_file)
+        os.replace(temp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save()
+
+
+class SQLiteResponseCache:
+    """
+    Disk cache of GitHub responses shared by every process on a host.
+
+    Responses are stored zlib-compressed in a single SQLite database in WAL
+    mode, so concurrent readers never block the writer and several worker
+    processes can share one file. Entries expire after a per-endpoint TTL,
+    and once the stored bodies exceed max_bytes the least recently used
+    entries are evicted. The stored byte total is kept up to date by
+    triggers, so a write never has to scan the table. A hit only writes
+    its access time when the stored one is older than access_interval,
+    so most hits are pure reads that never wait for SQLite's single writer.
+
+    Args:
+        path (str): SQLite database file
+        ttls (dict, optional): Seconds an entry stays fresh, keyed by the
+            endpoint kinds returned by endpoint_for_url. Missing kinds fall
+            back to DEFAULT_TTLS.
+        max_bytes (int): Budget for the compressed bodies stored in the file
+        access_interval (float): Resolution, in seconds, of the access
+            times that decide which entries are least recently used
+
+    Example:
+        cache = SQLiteResponseCache("github-cache.sqlite3", ttls={"repos": 900})
+        client = GitHubClient(response_cache=cache)
+    """
+
+    def __init__(self, path, ttls=None, max_bytes=256 * 1024 * 1024,
+                 access_interval=60):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.access_interval = access_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+        self._generation = 0
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Another process may be creating the schema at the same time
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " url TEXT NOT NULL,"
+                " status INTEGER NOT NULL,"
+                " headers TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+                " ON responses (accessed_at)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_totals ("
+                " name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            # Files written before the totals existed are summed up once
+            connection.execute(
+                "INSERT OR IGNORE INTO cache_totals (name, value)"
+                " SELECT 'bytes', COALESCE(SUM(size), 0) FROM responses"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_insert"
+                " AFTER INSERT ON responses BEGIN"
+                " UPDATE cache_totals SET value = value + NEW.size"
+                " WHERE name = 'bytes'; END"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_update"
+                " AFTER UPDATE OF size ON responses BEGIN"
+                " UPDATE cache_totals SET value = value + NEW.size - OLD.size"
+                " WHERE name = 'bytes'; END"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_delete"
+                " AFTER DELETE ON responses BEGIN"
+                " UPDATE cache_totals SET value = value - OLD.size"
+                " WHERE name = 'bytes'; END"
+            )
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.generation != self._generation:
+            # A generous busy timeout lets writers from other processes finish.
+            # Each connection is only used by its own thread, but close()
+            # may close it from another one.
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                self._connections.append(connection)
+                self._local.generation = self._generation
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        """
+        Return the fresh cached response for a key.
+
+        Args:
+            key (str): Cache key, see GitHubClient.cache_key
+
+        Returns:
+            requests.Response: The cached response, or None on a miss
+        """
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            "SELECT url, status, headers, body, accessed_at FROM responses"
+            " WHERE key = ? AND expires_at > ?",
+            (key, now),
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+
+        url, status, headers, body, accessed_at = row
+        if now - accessed_at >= self.access_interval:
+            with connection:
+                connection.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+        self._count("hits")
+        return build_response(url, status, json.loads(headers), zlib.decompress(body))
+
+    def set(self, key, response):
+        """
+        Store a 200 response and evict old entries beyond the byte budget.
+
+        Args:
+            key (str): Cache key, see GitHubClient.cache_key
+            response (requests.Response): Response read from the network
+        """
+        if response.status_code != 200:
+            return
+
+        headers = {
+            name: response.headers[name]
+            for name in CACHED_HEADERS
+            if name in response.headers
+        }
+        body = zlib.compress(response.content)
+        now = time.time()
+        ttl = self.ttls.get(endpoint_for_url(response.url), self.ttls["default"])
+
+        connection = self._connection()
+        with connection:
+            # An upsert, unlike INSERT OR REPLACE, fires the size triggers
+            connection.execute(
+                "INSERT INTO responses"
+                " (key, url, status, headers, body, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET"
+                " url = excluded.url, status = excluded.status,"
+                " headers = excluded.headers, body = excluded.body,"
+                " size = excluded.size, expires_at = excluded.expires_at,"
+                " accessed_at = excluded.accessed_at",
+                (key, response.url, response.status_code, json.dumps(headers),
+                 body, len(body), now + ttl, now),
+            )
+            self._evict(connection)
+
+    def _total_bytes(self, connection):
+        """Return the compressed bytes stored in the file."""
+        return connection.execute(
+            "SELECT value FROM cache_totals WHERE name = 'bytes'"
+        ).fetchone()[0]
+
+    def _evict(self, connection):
+        """Delete least recently used entries until the budget is met."""
+        total = self._total_bytes(connection)
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        rows = connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        )
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+
+        connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        with self._lock:
+            self.evictions += len(evicted)
+
+    def stats(self):
+        """
+        Return the cache counters and current size.
+
+        Returns:
+            dict: hits, misses and evictions seen by this process, plus the
+            number of entries and compressed bytes stored in the file
+        """
+        connection = self._connection()
+        entries = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        size = self._total_bytes(connection)
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+            }
+
+    def clear(self):
+        """Delete every cached response."""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM responses")
+
+    def close(self):
+        """
+        Close the database connections of every thread.
+
+        Threads that use the cache again afterwards open a new connection.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for connection in connections:
+            connection.close()
+
+
+class ResultCache:
+    """
+    Thread-safe in-memory cache of per-user analysis results.
+
+    Entries are keyed by the username with surrounding whitespace removed,
+    compared case-insensitively, together with the analysis options that
+    produced the result. They expire ttl seconds after they were stored,
+    and the least recently used entry is dropped once maxsize entries are
+    held.
+
+    Args:
+        maxsize (int): Maximum number of users kept
+        ttl (float): Seconds a result stays valid
+
+    Example:
+        results = ResultCache(maxsize=10000, ttl=60)
+        get_user_repos_with_commits("octocat", result_cache=results)
+        results.invalidate("octocat")
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _user(user_id):
+        return user_id.strip().lower()
+
+    def _key(self, user_id, options):
+        return (self._user(user_id), tuple(options))
+
+    def get(self, user_id, options=()):
+        """
+        Return a copy of the cached result for a user.
+
+        Args:
+            user_id (str): GitHub username
+            options (tuple): Hashable analysis options the result must have
+                been computed with, such as count_method and paginate
+
+        Returns:
+            list: Copy of the cached result, or None when nothing fresh is
+            cached for the user
+        """
+        key = self._key(user_id, options)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry[1]
+        return [dict(repo) for repo in result]
+
+    def set(self, user_id, result, options=()):
+        """
+        Cache the result of a user analysis.
+
+        Args:
+            user_id (str): GitHub username
+            result (list): Result returned by get_user_repos_with_commits
+            options (tuple): Hashable analysis options of the result
+        """
+        key = self._key(user_id, options)
+        entry = (time.monotonic() + self.ttl, [dict(repo) for repo in result])
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        """
+        Drop the cached results of one user, or of every user.
+
+        Args:
+            user_id (str, optional): GitHub username. The user's results for
+                every set of options are dropped. Every entry is dropped
+                when omitted.
+        """
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                return
+            user = self._user(user_id)
+            for key in [key for key in self._entries if key[0] == user]:
+                del self._entries[key]
+
+
+class RepoStateStore:
+    """
+    Persistent per-repository state for incremental refreshes.
+
+    For each repository the pushed_at timestamp of the listing and the
+    commit count read at that time are stored. As long as GitHub reports
+    the same pushed_at, no commit was pushed and the stored count is still
+    correct, so the commits endpoint does not need to be queried again.
+
+    Args:
+        path (str, optional): JSON file the state is loaded from and saved
+            to. The state lives only in memory when omitted.
+
+    Example:
+        with RepoStateStore("github-repo-state.json") as state:
+            get_user_repos_with_commits("octocat", repo_state=state)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(user_id, repo_name):
+        # GitHub names are case-insensitive
+        return f"{user_id}/{repo_name}".lower()
+
+    def get(self, user_id, repo_name):
+        """
+        Return a copy of the stored state of a repository.
+
+        Args:
+            user_id (str): GitHub username owning the repository
+            repo_name (str): Repository name
+
+        Returns:
+            dict: The stored state, or None when nothing is stored
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(user_id, repo_name))
+        return None if entry is None else dict(entry)
+
+    def unchanged_count(self, user_id, repo_name, pushed_at, count_method=None):
+        """
+        Return the stored commit count if the repository was not pushed to.
+
+        Args:
+            user_id (str): GitHub username owning the repository
+            repo_name (str): Repository name
+            pushed_at (str): pushed_at timestamp of the current listing
+            count_method (str, optional): Commit counting strategy of the
+                caller. A count stored by another strategy, or without one,
+                is not reused, since "list" counts are capped at one page.
+
+        Returns:
+            int: The stored commit count, or None when the repository has
+            to be recounted
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(user_id, repo_name))
+            if (pushed_at and entry and entry.get("pushed_at") == pushed_at
+                    and (count_method is None
+                         or entry.get("count_method") == count_method)):
+                self.hits += 1
+                return entry["commit_count"]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, repo_name, state):
+        """
+        Store the state of a repository.
+
+        Args:
+            user_id (str): GitHub username owning the repository
+            repo_name (str): Repository name
+            state (dict): JSON-serializable state with at least pushed_at
+                and commit_count
+        """
+        with self._lock:
+            self._entries[self._key(user_id, repo_name)] = dict(state)
+
+    def clear(self):
+        """Forget every stored repository."""
+        with self._lock:
+            self._entries.clear()
+
+    def load(self):
+        """Replace the stored state with the contents of the state file."""
+        with open(self.path, "r", encoding="utf-8") as state_file:
+            entries = json.load(state_file)
+        with self._lock:
+            self._entries = entries
+
+    def save(self):
+        """Write the stored state to the state file atomically."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = dict(self._entries)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as state_file:
+            json.dump(entries, state_file)
+        os.replace(temp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save()
@@ -0,0 +1,238 @@
+"""
+GitHub API Record/Replay Module.
+
+This module provides a requests transport adapter that records the
+responses of real GitHub API calls into a compact cassette file, and
+replays them later without touching the network. A GitHubClient created
+with the adapter runs get_user_repos_with_commits unchanged, so regression
+runs over many recorded accounts finish in seconds and never hit the
+rate limit.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from http.client import responses as REASONS
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from github_cache import CACHED_HEADERS, build_response
+
+# Modes accepted by CassetteAdapter: "record" always calls the network,
+# "replay" never does, and "once" replays an existing cassette or records
+# a new one.
+CASSETTE_MODES = ("once", "record", "replay")
+
+# Response headers kept in the cassette, besides the cached ones
+RECORDED_HEADERS = CACHED_HEADERS + (
+    "Retry-After",
+    "X-RateLimit-Limit",
+    "X-RateLimit-Remaining",
+    "X-RateLimit-Reset",
+    "X-RateLimit-Used",
+    "X-RateLimit-Resource",
+)
+
+# File layout: MAGIC, the zlib-compressed bodies, the zlib-compressed JSON
+# index, then TRAILER with the offset and length of the index
+MAGIC = b"GHCASSETTE1\n"
+TRAILER = struct.Struct(">QQ")
+
+
+class CassetteMiss(requests.exceptions.RequestException):
+    """Raised when a replayed request was never recorded."""
+
+
+def request_key(request):
+    """
+    Return the cassette key of a prepared request.
+
+    Requests match on method and full URL, including the query string.
+    POST bodies, such as GraphQL queries, are matched by their hash.
+    Request headers, including the token, are not part of the key.
+
+    Args:
+        request (requests.PreparedRequest): Request being sent
+
+    Returns:
+        str: Cassette key
+    """
+    key = f"{request.method} {request.url}"
+    body = request.body
+    if body:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        key += " " + hashlib.sha256(body).hexdigest()[:16]
+    return key
+
+
+class CassetteAdapter(BaseAdapter):
+    """
+    Transport adapter recording responses to, or replaying them from, a file.
+
+    In record mode every request is sent through the wrapped adapter and
+    its final response (status, a subset of headers, body and elapsed
+    time) is appended to the cassette. The file is written when the
+    adapter is closed, usually by closing the client. Identical bodies are
+    stored once.
+
+    In replay mode responses are served from the cassette, read through a
+    memory map by default so only the bodies actually replayed are paged
+    in. A request recorded several times replays its responses in order
+    and then keeps repeating the last one. An unrecorded request raises
+    CassetteMiss.
+
+    Args:
+        path (str): Cassette file
+        mode (str): "once" (default), "record" or "replay"
+        latency (float or str): Seconds each replayed response is delayed,
+            or "recorded" to wait as long as the recorded request took
+        jitter (float): Up to this many seconds are randomly added to or
+            removed from each replay delay
+        use_mmap (bool): Replay from a memory map instead of reading the
+            whole file into memory
+        adapter (requests.adapters.BaseAdapter, optional): Adapter that
+            sends recorded requests, for example one with a retry policy.
+            A plain HTTPAdapter is used when omitted.
+
+    Example:
+        cassette = CassetteAdapter("nightly.cassette")
+        with GitHubClient(adapter=cassette) as client:
+            get_user_repos_with_commits("octocat", client=client)
+    """
+
+    def __init__(self, path, mode="once", latency=0.0, jitter=0.0,
+                 use_mmap=True, adapter=None):
+        super().__init__()
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(CASSETTE_MODES)}")
+        if mode == "once":
+            mode = "replay" if os.path.exists(path) else "record"
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._entries = {}
+        self._closed = False
+
+        if mode == "record":
+            self.adapter = adapter if adapter is not None else HTTPAdapter()
+            self._bodies = {}
+            self._file = open(f"{path}.tmp", "wb")
+            self._file.write(MAGIC)
+        else:
+            self.adapter = None
+            self._cursors = {}
+            self._load(use_mmap)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _load(self, use_mmap):
+        """Open the cassette and read its index."""
+        with open(self.path, "rb") as f:
+            if use_mmap and os.fstat(f.fileno()).st_size:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._data = f.read()
+
+        if self._data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a cassette file")
+        offset, length = TRAILER.unpack_from(self._data, len(self._data) - TRAILER.size)
+        self._entries = json.loads(zlib.decompress(self._data[offset:offset + length]))
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None,
+             proxies=None):
+        """Record the response of a request, or replay a recorded one."""
+        if self.mode == "record":
+            return self._record(request, stream, timeout, verify, cert, proxies)
+        return self._replay(request)
+
+    def _record(self, request, stream, timeout, verify, cert, proxies):
+        started = time.perf_counter()
+        response = self.adapter.send(
+            request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+            proxies=proxies,
+        )
+        # Reading the body here still lets streamed callers iterate it
+        body = response.content
+        elapsed = time.perf_counter() - started
+
+        headers = {
+            name: response.headers[name]
+            for name in RECORDED_HEADERS
+            if name in response.headers
+        }
+        digest = hashlib.sha256(body).digest()
+        with self._lock:
+            location = self._bodies.get(digest)
+            if location is None:
+                compressed = zlib.compress(body)
+                location = (self._file.tell(), len(compressed))
+                self._file.write(compressed)
+                self._bodies[digest] = location
+            self._entries.setdefault(request_key(request), []).append(
+                [response.status_code, headers, location[0], location[1],
+                 round(elapsed, 6)]
+            )
+        return response
+
+    def _replay(self, request):
+        key = request_key(request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                position = self._cursors.get(key, 0)
+                self._cursors[key] = position + 1
+                entry = entries[min(position, len(entries) - 1)]
+            delay = self._delay(entry[4] if entries is not None else 0.0)
+        if entries is None:
+            raise CassetteMiss(f"No recorded response for {key}", request=request)
+
+        status, headers, offset, length, _ = entry
+        if delay > 0:
+            time.sleep(delay)
+        body = zlib.decompress(self._data[offset:offset + length])
+        response = build_response(request.url, status, headers, body, request)
+        response.reason = REASONS.get(status, "")
+        response.connection = self
+        return response
+
+    def _delay(self, recorded):
+        """Return the replay delay of one response, holding the lock."""
+        delay = recorded if self.latency == "recorded" else self.latency
+        if self.jitter:
+            delay += self._random.uniform(-self.jitter, self.jitter)
+        return delay
+
+    def close(self):
+        """Write the recorded cassette, or release the replayed one."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        if self.mode == "record":
+            index = zlib.compress(json.dumps(self._entries, separators=(",", ":")).encode())
+            offset = self._file.tell()
+            self._file.write(index)
+            self._file.write(TRAILER.pack(offset, len(index)))
+            self._file.close()
+            os.replace(f"{self.path}.tmp", self.path)
+            self.adapter.close()
+        elif isinstance(self._data, mmap.mmap):
+            self._data.close()
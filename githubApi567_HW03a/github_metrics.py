@@ -0,0 +1,297 @@
+"""
+GitHub API Metrics Module.
+
+This module provides a small thread-safe metrics registry rendered in the
+Prometheus text exposition format, and the set of GitHub client metrics
+recorded by GitHubClient when it is given a GitHubMetrics instance.
+"""
+
+import bisect
+import threading
+
+from github_cache import endpoint_for_url
+
+# Content-Type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from cached answers to slow commit listings
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Repositories-per-user buckets
+REPO_BUCKETS = (0, 1, 5, 10, 30, 100, 300, 1000, 3000)
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects it."""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values, extra=()):
+    """Render a {name="value",...} label set, or "" without labels."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    rendered = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + rendered + "}"
+
+
+class _Metric:
+    """Base class holding one value per label combination."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(
+                f"{self.name} expects labels {self.labels}, got {labels}"
+            )
+        return tuple(str(value) for value in labels)
+
+    def render(self):
+        """Return the metric in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return "\n".join(lines)
+
+    def _samples(self, labels, value):
+        return [f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        """Add amount to the counter of the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels):
+        """Return the current count of the given label values."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        """Set the gauge of the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, *labels):
+        """Return the current value, or None when it was never set."""
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        """Record one observation for the given label values."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *labels):
+        """Return the number of observations of the given label values."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return 0 if state is None else state[2]
+
+    def _samples(self, labels, state):
+        counts, total, count = state
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            label_text = _format_labels(
+                self.labels, labels, [("le", _format_value(float(bound)))]
+            )
+            samples.append(f"{self.name}_bucket{label_text} {cumulative}")
+        label_text = _format_labels(self.labels, labels)
+        samples.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+        samples.append(f"{self.name}_count{label_text} {count}")
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together for a Prometheus scrape.
+
+    Example:
+        registry = MetricsRegistry()
+        requests_total = registry.counter("requests_total", "Requests", ["status"])
+        requests_total.inc("200")
+        body = registry.render()
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        """Create and register a Counter."""
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        """Create and register a Gauge."""
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        """Create and register a Histogram."""
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: Scrape body to serve with CONTENT_TYPE
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() + "\n" for metric in metrics)
+
+
+class GitHubMetrics:
+    """
+    Metrics recorded by a GitHubClient.
+
+    Args:
+        registry (MetricsRegistry, optional): Registry to add the metrics
+            to, for example one shared with the rest of an application.
+            A new registry is created when omitted.
+
+    Example:
+        metrics = GitHubMetrics()
+        client = GitHubClient(metrics=metrics)
+        get_user_repos_with_commits("octocat", client=client)
+        print(metrics.registry.render())
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        self.requests = self.registry.counter(
+            "github_requests_total",
+            "GitHub API requests sent over the network.",
+            ["endpoint", "status"],
+        )
+        self.latency = self.registry.histogram(
+            "github_request_duration_seconds",
+            "Time GitHub API requests took, including retry backoff and "
+            "reading the body of responses that are not streamed.",
+            ["endpoint", "status"],
+        )
+        self.retries = self.registry.counter(
+            "github_retries_total",
+            "Requests retried by the urllib3 retry policy.",
+            ["endpoint"],
+        )
+        self.cache = self.registry.counter(
+            "github_cache_requests_total",
+            "Cache lookups by cache and result.",
+            ["cache", "result"],
+        )
+        self.rate_limit_remaining = self.registry.gauge(
+            "github_rate_limit_remaining",
+            "Last X-RateLimit-Remaining value reported by GitHub.",
+        )
+        self.repos_per_user = self.registry.histogram(
+            "github_repos_per_user",
+            "Repositories per analyzed user.",
+            buckets=REPO_BUCKETS,
+        )
+
+    def observe_response(self, url, response, seconds):
+        """
+        Record one network response.
+
+        Args:
+            url (str): Requested URL
+            response (requests.Response): Response received
+            seconds (float): Time from sending the request until it
+                returned, including retries and, unless streamed, the body
+        """
+        endpoint = endpoint_for_url(url)
+        status = response.status_code
+        self.requests.inc(endpoint, status)
+        self.latency.observe(seconds, endpoint, status)
+
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        history = getattr(retries, "history", None)
+        if isinstance(history, tuple) and history:
+            self.retries.inc(endpoint, amount=len(history))
+
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        if remaining is not None:
+            try:
+                self.rate_limit_remaining.set(int(remaining))
+            except ValueError:
+                pass
+
+    def observe_error(self, url):
+        """Record a request that failed without any response."""
+        self.requests.inc(endpoint_for_url(url), "error")
+
+    def cache_hit(self, cache):
+        """Record a lookup answered by the named cache."""
+        self.cache.inc(cache, "hit")
+
+    def cache_miss(self, cache):
+        """Record a lookup the named cache could not answer."""
+        self.cache.inc(cache, "miss")
+
+    def observe_user(self, total_repos):
+        """Record the number of repositories of an analyzed user."""
+        self.repos_per_user.observe(total_repos)
@@ -0,0 +1,235 @@
+"""
+GitHub Repository Analyzer HTTP Service.
+
+This module exposes get_user_repos_with_commits as a small JSON HTTP
+service. Concurrent requests for the same user share one upstream
+analysis, so a burst of traffic for a popular user costs one set of
+GitHub requests instead of one per caller.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import requests
+
+from github_api import (
+    GitHubClient,
+    RateLimitExceeded,
+    RateLimiter,
+    build_retry,
+    get_user_repos_with_commits,
+)
+from github_metrics import CONTENT_TYPE, GitHubMetrics
+
+USER_REPOS_PATH = re.compile(r"^/users/([^/]+)/repos-commits/?$")
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """Request handler dispatching to the owning GitHubService."""
+
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        metrics = self.server.service.client.metrics
+        if path == "/metrics" and metrics is not None:
+            self._send_body(200, metrics.registry.render().encode(), CONTENT_TYPE)
+            return
+
+        match = USER_REPOS_PATH.match(path)
+        if match is None:
+            self._send_json(404, {"message": "Not Found"})
+            return
+
+        status, payload, headers = self.server.service.user_repos(
+            unquote(match.group(1))
+        )
+        self._send_json(status, payload, headers)
+
+    def _send_json(self, status, payload, headers=None):
+        self._send_body(
+            status, json.dumps(payload).encode(),
+            "application/json; charset=utf-8", headers,
+        )
+
+    def _send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.service.log_requests:
+            super().log_message(format, *args)
+
+
+class GitHubService:
+    """
+    HTTP service answering GET /users/{id}/repos-commits.
+
+    Every request is handled on its own thread over keep-alive HTTP/1.1
+    connections. Requests for a user whose analysis is already running
+    wait for it and share its result. When the client has metrics,
+    GET /metrics serves them in the Prometheus text format.
+
+    Args:
+        host (str): Interface to bind to
+        port (int): Port to bind to; 0 picks a free port
+        client (GitHubClient, optional): Client shared by every analysis.
+            A client with a retry policy and a RateLimiter is created and
+            closed with the service when omitted.
+        log_requests (bool): Log each request to stderr
+        **analysis_options: Extra keyword arguments for
+            get_user_repos_with_commits, such as max_workers or
+            result_cache
+
+    Example:
+        with GitHubService(port=8080, max_workers=8) as service:
+            service.serve_forever()
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, client=None,
+                 log_requests=False, **analysis_options):
+        self.own_client = client is None
+        if self.own_client:
+            client = GitHubClient(rate_limiter=RateLimiter(), retry=build_retry())
+        self.client = client
+        self.log_requests = log_requests
+        self.analysis_options = analysis_options
+        self._httpd = ThreadingHTTPServer((host, port), _ServiceHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.service = self
+
+    @property
+    def url(self):
+        """Base URL the service is reachable at."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def analyze(self, user_id):
+        """
+        Analyze a user, sharing the work with concurrent requests for it.
+
+        Concurrent requests are coalesced by get_user_repos_with_commits
+        itself, since every analysis uses the same client and options.
+
+        Args:
+            user_id (str): GitHub username
+
+        Returns:
+            list: The result of get_user_repos_with_commits
+        """
+        return get_user_repos_with_commits(
+            user_id, client=self.client, **self.analysis_options
+        )
+
+    def user_repos(self, user_id):
+        """
+        Build the HTTP answer for one user.
+
+        Args:
+            user_id (str): GitHub username taken from the request path
+
+        Returns:
+            tuple: HTTP status, JSON payload and extra response headers
+        """
+        try:
+            repos = self.analyze(user_id)
+        except ValueError as e:
+            return 400, {"message": str(e)}, {}
+        except RateLimitExceeded as e:
+            headers = {}
+            if e.reset_at is not None:
+                retry_after = max(0, math.ceil(e.reset_at - time.time()))
+                headers["Retry-After"] = str(retry_after)
+            return 503, {"message": str(e)}, headers
+        except requests.exceptions.RequestException as e:
+            if "404 Client Error" in str(e):
+                return 404, {"message": str(e)}, {}
+            return 502, {"message": str(e)}, {}
+        except Exception as e:
+            # Answer instead of dropping the keep-alive connection, for
+            # example when a shared disk cache is locked
+            return 500, {"message": f"Internal Server Error: {type(e).__name__}"}, {}
+
+        return 200, {
+            "user_id": user_id.strip(),
+            "repos": repos,
+            "total_repos": len(repos),
+            "total_commits": sum(repo["commit_count"] for repo in repos),
+        }, {}
+
+    def serve_forever(self, poll_interval=0.5):
+        """Handle requests until shutdown() is called."""
+        self._httpd.serve_forever(poll_interval=poll_interval)
+
+    def shutdown(self):
+        """Stop serve_forever() running on another thread."""
+        self._httpd.shutdown()
+
+    def close(self):
+        """Release the port and the owned client."""
+        self._httpd.server_close()
+        if self.own_client:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main(argv=None):
+    """
+    Run the service until interrupted, as python -m github_service.
+
+    Args:
+        argv (list, optional): Arguments to parse instead of sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        prog="github_service",
+        description="Serve GET /users/{id}/repos-commits over HTTP.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind to")
+    parser.add_argument("--port", type=int, default=8080, help="port to bind to")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=8,
+        help="concurrent commit-count requests per user (default: 8)",
+    )
+    parser.add_argument(
+        "--token", default=os.environ.get("GITHUB_TOKEN"),
+        help="personal access token (default: $GITHUB_TOKEN)",
+    )
+    args = parser.parse_args(argv)
+
+    client = GitHubClient(
+        token=args.token,
+        pool_maxsize=args.workers,
+        rate_limiter=RateLimiter(),
+        retry=build_retry(),
+        metrics=GitHubMetrics(),
+    )
+    with client, GitHubService(args.host, args.port, client=client,
+                               log_requests=True,
+                               max_workers=args.workers) as service:
+        print(f"Serving on {service.url}")
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+GitHub API Request Tracing Module.
+
+This module records where the time of each HTTP request sent by a
+GitHubClient goes: waiting for a pooled connection, connecting, the TLS
+handshake, waiting for the first byte, downloading the body and decoding
+its JSON. A trace can be exported in the Chrome trace-event format and
+opened in chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Request phases, in the order they happen
+PHASES = ("queue", "connect", "tls", "ttfb", "download", "json")
+
+# Request being sent on each thread, filled in by the urllib3 classes below
+_local = threading.local()
+
+
+def _add_phase(name, started, ended=None):
+    """Record a phase on the request being sent by this thread, if any."""
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record.add(name, started, time.perf_counter() if ended is None else ended)
+
+
+class _TimedConnectionMixin:
+    """Times the TCP connect and the wait for response headers."""
+
+    _trace_connected = None
+    _trace_sent = None
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        self._trace_connected = time.perf_counter()
+        # DNS resolution is part of the TCP connect
+        _add_phase("connect", started, self._trace_connected)
+        return sock
+
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        self._trace_sent = time.perf_counter()
+
+    def getresponse(self):
+        response = super().getresponse()
+        if self._trace_sent is not None:
+            _add_phase("ttfb", self._trace_sent)
+        return response
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    """HTTPConnection reporting its timings to the active trace."""
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """HTTPSConnection also reporting the TLS handshake to the active trace."""
+
+    def connect(self):
+        super().connect()
+        if self._trace_connected is not None:
+            _add_phase("tls", self._trace_connected)
+
+
+class _TimedPoolMixin:
+    """Times the wait for a connection from the pool."""
+
+    def _get_conn(self, timeout=None):
+        started = time.perf_counter()
+        try:
+            return super()._get_conn(timeout)
+        finally:
+            _add_phase("queue", started)
+
+
+class TracingHTTPConnectionPool(_TimedPoolMixin, HTTPConnectionPool):
+    """HTTP connection pool whose requests can be traced."""
+
+    ConnectionCls = TimedHTTPConnection
+
+
+class TracingHTTPSConnectionPool(_TimedPoolMixin, HTTPSConnectionPool):
+    """HTTPS connection pool whose requests can be traced."""
+
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TracingHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools report to the active RequestTrace.
+
+    Outside of a trace the only overhead is one thread-local lookup per
+    connection event.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TracingHTTPConnectionPool,
+            "https": TracingHTTPSConnectionPool,
+        }
+
+
+class TracedRequest:
+    """
+    Timings of one HTTP request.
+
+    Attributes:
+        url (str): Requested URL
+        method (str): HTTP method, once the response has arrived
+        status (int): HTTP status, or None if the request failed
+        error (str): Error message of a failed request
+        started (float): time.perf_counter() when the request was sent
+        ended (float): time.perf_counter() when send() returned
+        phases (list): (name, started, ended) tuples; a retried request
+            has one set of connection phases per attempt
+        thread_id (int): Identifier of the sending thread
+        thread_name (str): Name of the sending thread
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.method = None
+        self.status = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.ended = None
+        self.phases = []
+        self.parent = None
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self._headers_at = None
+        self._lock = threading.Lock()
+
+    def add(self, name, started, ended):
+        """Record a phase of this request."""
+        with self._lock:
+            self.phases.append((name, started, ended))
+
+    def durations(self):
+        """
+        Return the time spent in each phase.
+
+        Returns:
+            dict: Seconds per phase name, plus "total" from sending the
+            request to the end of its last phase
+        """
+        totals = dict.fromkeys(PHASES, 0.0)
+        with self._lock:
+            phases = list(self.phases)
+        for name, started, ended in phases:
+            totals[name] = totals.get(name, 0.0) + ended - started
+        totals["total"] = self.finished() - self.started
+        return totals
+
+    def finished(self):
+        """Return the end of the request, including later JSON decoding."""
+        with self._lock:
+            ends = [ended for _, _, ended in self.phases]
+        if self.ended is not None:
+            ends.append(self.ended)
+        return max(ends, default=self.started)
+
+    def on_response(self, response, *args, **kwargs):
+        """
+        requests response hook, called once the response headers are in.
+
+        The body is downloaded after the hook returns, unless the request
+        was streamed, and response.json() is wrapped to time the decoding.
+        """
+        self._headers_at = time.perf_counter()
+        self.method = response.request.method
+        self.status = response.status_code
+        response.trace = self
+
+        decode = response.json
+
+        def timed_json(**json_kwargs):
+            started = time.perf_counter()
+            try:
+                return decode(**json_kwargs)
+            finally:
+                self.add("json", started, time.perf_counter())
+
+        response.json = timed_json
+        return response
+
+    def finish(self, stream=False, error=None):
+        """Mark the end of send(), recording the body download."""
+        self.ended = time.perf_counter()
+        if error is not None:
+            self.error = str(error)
+        elif self._headers_at is not None and not stream:
+            self.add("download", self._headers_at, self.ended)
+
+
+class RequestTrace:
+    """
+    Per-request timing trace of a GitHubClient.
+
+    While the trace is entered, every request the client sends over the
+    network is recorded, from any thread. Answers served from the response
+    cache, and requests shared with another thread, send nothing and are
+    not recorded. Streamed listing pages are read while they are decoded,
+    so their download and decoding are not recorded separately.
+
+    Args:
+        client (GitHubClient): Client to trace
+
+    Example:
+        with RequestTrace(client) as trace:
+            get_user_repos_with_commits("octocat", client=client)
+        print(trace.totals())
+        trace.dump("trace.json")
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = []
+        self.started = time.perf_counter()
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def begin_request(self, url):
+        """
+        Start recording a request sent by the current thread.
+
+        Returns:
+            TracedRequest: Record to pass to end_request()
+        """
+        record = TracedRequest(url)
+        with self._lock:
+            self.requests.append(record)
+        record.parent = getattr(_local, "record", None)
+        _local.record = record
+        return record
+
+    def end_request(self, record, stream=False, error=None):
+        """Stop recording a request started by begin_request() on this thread."""
+        record.finish(stream, error)
+        _local.record = record.parent
+
+    def totals(self):
+        """
+        Return the time spent in each phase over every recorded request.
+
+        Returns:
+            dict: Seconds per phase name, plus "total" and the number of
+            "requests"
+        """
+        totals = dict.fromkeys(PHASES + ("total",), 0.0)
+        with self._lock:
+            records = list(self.requests)
+        for record in records:
+            for name, seconds in record.durations().items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        totals["requests"] = len(records)
+        return totals
+
+    def to_chrome_trace(self):
+        """
+        Export the trace in the Chrome trace-event format.
+
+        Each request is a complete event on the row of its thread, with
+        one nested event per phase.
+
+        Returns:
+            dict: Trace object, ready for json.dump
+        """
+        def micros(seconds):
+            return round((seconds - self.started) * 1e6, 3)
+
+        pid = os.getpid()
+        events = []
+        threads = {}
+        with self._lock:
+            records = list(self.requests)
+        for record in records:
+            threads[record.thread_id] = record.thread_name
+            path = urlparse(record.url).path or record.url
+            events.append({
+                "name": f"{record.method or 'GET'} {path}",
+                "cat": "request",
+                "ph": "X",
+                "ts": micros(record.started),
+                "dur": round((record.finished() - record.started) * 1e6, 3),
+                "pid": pid,
+                "tid": record.thread_id,
+                "args": {
+                    "url": record.url,
+                    "status": record.status,
+                    "error": record.error,
+                },
+            })
+            with record._lock:
+                phases = list(record.phases)
+            for name, started, ended in phases:
+                events.append({
+                    "name": name,
+                    "cat": "phase",
+                    "ph": "X",
+                    "ts": micros(started),
+                    "dur": round((ended - started) * 1e6, 3),
+                    "pid": pid,
+                    "tid": record.thread_id,
+                })
+
+        for thread_id, thread_name in threads.items():
+            events.append({
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": thread_id,
+                "args": {"name": thread_name},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        """
+        Write the Chrome trace-event JSON to a file.
+
+        Args:
+            path (str): Output file path
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def start(self):
+        """Start recording the requests of the client."""
+        self._previous = self.client.trace
+        self.client.trace = self
+        return self
+
+    def stop(self):
+        """Stop recording, restoring any trace active before start()."""
+        self.client.trace = self._previous
+        self._previous = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
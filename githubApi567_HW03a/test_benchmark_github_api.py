@@ -0,0 +1,58 @@
+"""
+Test suite for the throughput benchmark.
+
+Tiny benchmark runs check the measurements, not the performance.
+"""
+import json
+
+import pytest
+from benchmark_github_api import format_results, generate_users, main, run_benchmark
+
+
+class TestBenchmark:
+    """Tests for the benchmark runner"""
+
+    def test_generate_users_is_repeatable(self):
+        """Accounts of each size are generated from the seed"""
+        users = generate_users([3, 5], users_per_size=2, seed=7)
+
+        assert sorted(users) == ['bench3-0', 'bench3-1', 'bench5-0', 'bench5-1']
+        assert len(users['bench5-1']) == 5
+        assert users == generate_users([3, 5], users_per_size=2, seed=7)
+
+    def test_run_in_process(self):
+        """Each case reports its requests, throughput and latencies"""
+        results = run_benchmark(repo_counts=(3,), concurrency=(1, 4),
+                                users_per_size=2, latency=0, jitter=0,
+                                isolate=False)
+
+        assert [(r['repos'], r['workers']) for r in results] == [(3, 1), (3, 4)]
+        for result in results:
+            # One listing and three commit counts per user
+            assert result['requests'] == 8
+            assert result['failed'] == 0
+            assert result['requests_per_second'] > 0
+            assert 0 < result['p50'] <= result['p99']
+
+    def test_isolated_run_reports_peak_rss(self):
+        """A case run in its own process reports that process's memory"""
+        pytest.importorskip("resource")
+        results = run_benchmark(repo_counts=(2,), concurrency=(2,),
+                                users_per_size=1, latency=0, jitter=0)
+
+        assert results[0]['peak_rss'] > 0
+        assert "PEAK RSS MIB" in format_results(results)
+
+    def test_main_writes_json(self, tmp_path, capsys):
+        """--json saves the results for later comparison"""
+        path = tmp_path / "results.json"
+        assert main(["--repos", "2", "--concurrency", "2", "--users", "1",
+                     "--latency", "0", "--jitter", "0", "--in-process",
+                     "--json", str(path)]) == 0
+
+        assert json.loads(path.read_text())[0]['requests'] == 3
+        assert capsys.readouterr().out.splitlines()[0].split()[0] == "REPOS"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
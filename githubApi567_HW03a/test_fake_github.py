@@ -0,0 +1,149 @@
+"""
+Test suite for the local fake GitHub API server.
+
+The server is exercised with plain requests calls and through GitHubClient.
+"""
+import time
+
+import pytest
+import requests
+from fake_github import FakeGitHubServer
+from github_api import (
+    GitHubClient,
+    RateLimitExceeded,
+    get_user_repos_with_commits,
+)
+from github_cache import ConditionalCache
+
+
+@pytest.fixture
+def users():
+    """Accounts shared by the tests"""
+    return {'octocat': {f'repo{i}': i + 1 for i in range(7)}}
+
+
+class TestPagination:
+    """Tests for paginated listings and Link headers"""
+
+    def test_link_header(self, users):
+        """Pages carry first, prev, next and last relations"""
+        with FakeGitHubServer(users) as server:
+            response = requests.get(f"{server.url}/users/octocat/repos",
+                                    params={"per_page": 3, "page": 2})
+
+        assert [repo['name'] for repo in response.json()] == ['repo3', 'repo4', 'repo5']
+        assert {rel: link['url'].split('?')[1] for rel, link in response.links.items()} == {
+            'first': 'per_page=3&page=1',
+            'prev': 'per_page=3&page=1',
+            'next': 'per_page=3&page=3',
+            'last': 'per_page=3&page=3',
+        }
+
+    def test_default_page_size(self, users):
+        """Without per_page, listings use the configured default"""
+        with FakeGitHubServer(users, per_page=5) as server:
+            first = requests.get(f"{server.url}/users/octocat/repos")
+            unpaged = requests.get(f"{server.url}/repos/octocat/repo6/commits",
+                                   params={"per_page": 100})
+
+        assert len(first.json()) == 5
+        assert 'next' in first.links
+        assert len(unpaged.json()) == 7
+        assert 'Link' not in unpaged.headers
+
+    def test_client_follows_links_and_counts(self, users):
+        """Pagination and link counting work against the fake"""
+        with FakeGitHubServer(users, per_page=2) as server:
+            with GitHubClient(base_url=server.url) as client:
+                listed = get_user_repos_with_commits("octocat", client=client)
+                linked = get_user_repos_with_commits(
+                    "octocat", client=client, paginate=True, count_method="link"
+                )
+
+        # Without paginate only the first page is read, and "list" counts
+        # are capped at the page size
+        assert [r['commit_count'] for r in listed] == [1, 2]
+        assert [r['commit_count'] for r in linked] == list(range(1, 8))
+
+
+class TestETags:
+    """Tests for conditional requests"""
+
+    def test_if_none_match(self, users):
+        """A matching ETag is answered 304 without a body"""
+        with FakeGitHubServer(users) as server:
+            url = f"{server.url}/users/octocat/repos"
+            first = requests.get(url)
+            second = requests.get(url, headers={"If-None-Match": first.headers['ETag']})
+            stale = requests.get(url, headers={"If-None-Match": '"stale"'})
+
+        assert second.status_code == 304
+        assert second.content == b""
+        assert stale.status_code == 200
+
+    def test_conditional_cache(self, users):
+        """GitHubClient revalidates its cached answers"""
+        with FakeGitHubServer(users) as server:
+            with GitHubClient(base_url=server.url,
+                              conditional_cache=ConditionalCache()) as client:
+                first = get_user_repos_with_commits("octocat", client=client)
+                second = get_user_repos_with_commits("octocat", client=client)
+
+        assert first == second
+
+
+class TestRateLimit:
+    """Tests for the simulated rate limit"""
+
+    def test_headers_and_exhaustion(self, users):
+        """Each request uses the quota until GitHub-style 403s start"""
+        with FakeGitHubServer(users, rate_limit=2) as server:
+            url = f"{server.url}/users/octocat/repos"
+            first = requests.get(url)
+            second = requests.get(url, headers={"If-None-Match": first.headers['ETag']})
+            third = requests.get(url)
+            fourth = requests.get(url)
+
+        assert first.headers['X-RateLimit-Limit'] == "2"
+        assert first.headers['X-RateLimit-Remaining'] == "1"
+        # 304 answers do not count against the quota
+        assert second.headers['X-RateLimit-Remaining'] == "1"
+        assert third.headers['X-RateLimit-Remaining'] == "0"
+        assert fourth.status_code == 403
+        assert int(fourth.headers['X-RateLimit-Reset']) > time.time()
+
+    def test_client_sees_exhausted_quota(self, users):
+        """GitHubClient raises RateLimitExceeded with the reset time"""
+        with FakeGitHubServer(users, rate_limit=0) as server:
+            with GitHubClient(base_url=server.url) as client:
+                with pytest.raises(RateLimitExceeded) as excinfo:
+                    get_user_repos_with_commits("octocat", client=client)
+
+        assert excinfo.value.reset_at > time.time()
+
+    def test_window_resets(self, users):
+        """The quota is restored once the window has passed"""
+        with FakeGitHubServer(users, rate_limit=1, rate_limit_window=0.1) as server:
+            url = f"{server.url}/users/octocat/repos"
+            requests.get(url)
+            time.sleep(0.15)
+            response = requests.get(url)
+
+        assert response.status_code == 200
+
+
+class TestLatency:
+    """Tests for simulated latency"""
+
+    def test_latency_and_jitter(self, users):
+        """Requests take at least latency minus jitter"""
+        with FakeGitHubServer(users, latency=0.05, jitter=0.01, seed=1) as server:
+            started = time.perf_counter()
+            requests.get(f"{server.url}/users/octocat/repos")
+            elapsed = time.perf_counter() - started
+
+        assert elapsed >= 0.04
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
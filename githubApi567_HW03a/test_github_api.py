@@ -4,10 +4,78 @@ Comprehensive test suite for GitHub API Repository Analyzer.
 This module contains unit tests for the github_api module using mocking
 to ensure tests are independent of external GitHub API calls.
 """
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
 import pytest
 import requests
 from unittest.mock import Mock, patch
-from github_api import get_user_repos_with_commits
+from urllib3.response import HTTPResponse
+import github_api
+from github_cache import (
+    ConditionalCache,
+    RepoStateStore,
+    ResultCache,
+    SQLiteResponseCache,
+)
+from github_api import (
+    ConsoleReporter,
+    GitHubClient,
+    NDJSONReporter,
+    REPO_FIELDS,
+    RepoCommitCount,
+    SingleFlight,
+    RateLimiter,
+    RateLimitExceeded,
+    async_get_user_repos_with_commits,
+    build_retry,
+    get_many_users_repos_with_commits,
+    get_user_repos_with_commits,
+    iter_many_users_repos_with_commits,
+    iter_user_repos_with_commits,
+    iter_user_repositories,
+    main,
+    percentile,
+)
+
+
+def _mock_response(status_code=200, json_data=None, links=None, headers=None):
+    """Build a mock HTTP response with the given status, JSON body and links"""
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = json_data
+    response.links = links or {}
+    response.headers = headers or {}
+    response.raise_for_status.return_value = None
+    return response
+
+
+def _mock_github(repos, commits):
+    """Return a requests.get side effect that answers by URL
+
+    Args:
+        repos: JSON list returned by the repos endpoint
+        commits: mapping of repo name to a commits list, a status code,
+            or an exception instance to raise
+    """
+    def fake_get(url, *args, **kwargs):
+        if url.endswith("/repos"):
+            return _mock_response(json_data=repos)
+        repo_name = url.rstrip("/").split("/")[-2]
+        outcome = commits[repo_name]
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, int):
+            return _mock_response(status_code=outcome)
+        return _mock_response(json_data=outcome)
+    return fake_get
+
 
 class TestGitHubAPI:
     """Test class for GitHub API functionality"""
@@ -374,28 +442,1462 @@ class TestGitHubAPI:
         # Should re-raise the same exception
         assert str(excinfo.value) == "GitHub API request failed: test error"
 
-    def test_main_function_success(self):
+    def test_main_function_success(self, capsys):
         """Test the main function with successful execution"""
-        with patch('github_api.get_user_repos_with_commits') as mock_func:
-            mock_func.return_value = [{'repo_name': 'test', 'commit_count': 1}]
-            
-            with patch('builtins.print') as mock_print:
-                from github_api import main
-                main()
-                
-                mock_func.assert_called_once_with("vanshajtyagi")
-                mock_print.assert_any_call("Successfully retrieved 1 repositories")
+        with patch('github_api.iter_many_users_repos_with_commits') as mock_func:
+            mock_func.return_value = [{
+                'user_id': 'vanshajtyagi',
+                'repos': [RepoCommitCount('test', 1)],
+                'error': None,
+                'elapsed': 0.25,
+            }]
+
+            from github_api import main
+            assert main(["vanshajtyagi"]) == 0
 
-    def test_main_function_error(self):
+            assert list(mock_func.call_args[0][0]) == ["vanshajtyagi"]
+            captured = capsys.readouterr()
+            assert "vanshajtyagi" in captured.out
+            assert "Analyzed 1 users (0 failed), 1 repositories, 1 commits" in captured.err
+
+    def test_main_function_error(self, capsys):
         """Test the main function with error handling"""
-        with patch('github_api.get_user_repos_with_commits') as mock_func:
+        with patch('github_api.iter_many_users_repos_with_commits') as mock_func:
             mock_func.side_effect = ValueError("Test error")
-            
-            with patch('builtins.print') as mock_print:
-                from github_api import main
-                main()
-                
-                mock_print.assert_called_with("Error: Test error")
+
+            from github_api import main
+            assert main(["vanshajtyagi"]) == 1
+
+            assert "Error: Test error" in capsys.readouterr().err
+
+
+class TestConcurrentCommitFetching:
+    """Tests for fetching commit counts with a thread pool"""
+
+    def test_concurrent_results_keep_listing_order(self):
+        """Results come back in listing order regardless of completion order"""
+        repos = [{'name': f'repo{i}'} for i in range(20)]
+        commits = {f'repo{i}': [{'sha': 'c'}] * i for i in range(20)}
+        with patch('requests.get', side_effect=_mock_github(repos, commits)):
+            result = get_user_repos_with_commits("testuser", max_workers=8)
+
+        assert [r['repo_name'] for r in result] == [f'repo{i}' for i in range(20)]
+        assert [r['commit_count'] for r in result] == list(range(20))
+
+    def test_concurrent_matches_sequential(self):
+        """Concurrent and sequential modes return identical results"""
+        repos = [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]
+        commits = {'a': [{'sha': '1'}, {'sha': '2'}], 'b': [], 'c': [{'sha': '3'}]}
+        with patch('requests.get', side_effect=_mock_github(repos, commits)):
+            sequential = get_user_repos_with_commits("testuser")
+            concurrent = get_user_repos_with_commits("testuser", max_workers=3)
+
+        assert concurrent == sequential
+
+    def test_concurrent_failed_commit_calls_count_as_zero(self):
+        """Failed commit calls still count as 0 in concurrent mode"""
+        repos = [{'name': 'ok'}, {'name': 'forbidden'}, {'name': 'broken'}]
+        commits = {
+            'ok': [{'sha': '1'}],
+            'forbidden': 403,
+            'broken': requests.exceptions.ConnectionError("reset"),
+        }
+        with patch('requests.get', side_effect=_mock_github(repos, commits)):
+            result = get_user_repos_with_commits("testuser", max_workers=2)
+
+        assert [r['commit_count'] for r in result] == [1, 0, 0]
+
+    @pytest.mark.parametrize("max_workers", [0, -1, 1.5, "4"])
+    def test_invalid_max_workers(self, max_workers):
+        """Test error handling for invalid max_workers values"""
+        with pytest.raises(ValueError) as excinfo:
+            get_user_repos_with_commits("testuser", max_workers=max_workers)
+        assert "max_workers must be a positive integer" in str(excinfo.value)
+
+
+class TestAsyncGitHubAPI:
+    """Tests for the asyncio coroutine API"""
+
+    def test_async_returns_ordered_results(self):
+        """The coroutine returns the same ordered list as the sync API"""
+        repos = [{'name': f'repo{i}'} for i in range(12)]
+        commits = {f'repo{i}': [{'sha': 'c'}] * i for i in range(12)}
+        with patch('requests.get', side_effect=_mock_github(repos, commits)):
+            result = asyncio.run(async_get_user_repos_with_commits("testuser"))
+            expected = get_user_repos_with_commits("testuser")
+
+        assert result == expected
+
+    def test_async_limits_concurrency(self):
+        """No more than max_concurrency requests are in flight at once"""
+        repos = [{'name': f'repo{i}'} for i in range(10)]
+        commits = {f'repo{i}': [] for i in range(10)}
+        fake_get = _mock_github(repos, commits)
+        lock = threading.Lock()
+        in_flight = [0]
+        peak = [0]
+
+        def tracking_get(url, *args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                threading.Event().wait(0.01)
+                return fake_get(url, *args, **kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        with patch('requests.get', side_effect=tracking_get):
+            result = asyncio.run(
+                async_get_user_repos_with_commits("testuser", max_concurrency=3)
+            )
+
+        assert len(result) == 10
+        assert peak[0] <= 3
+
+    def test_async_calls_share_a_bounded_pool(self):
+        """Many concurrent lookups never use more than ASYNC_MAX_WORKERS threads"""
+        repos = [{'name': f'repo{i}'} for i in range(5)]
+        fake_get = _mock_github(repos, {f'repo{i}': [] for i in range(5)})
+        lock = threading.Lock()
+        threads = set()
+        in_flight = [0]
+        peak = [0]
+
+        def tracking_get(url, *args, **kwargs):
+            with lock:
+                threads.add(threading.get_ident())
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                threading.Event().wait(0.005)
+                return fake_get(url, *args, **kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        async def lookups():
+            return await asyncio.gather(*(
+                async_get_user_repos_with_commits("testuser", max_concurrency=10)
+                for _ in range(100)
+            ))
+
+        with patch('requests.get', side_effect=tracking_get):
+            results = asyncio.run(lookups())
+
+        assert all(len(result) == 5 for result in results)
+        assert len(threads) <= github_api.ASYNC_MAX_WORKERS
+        assert peak[0] <= github_api.ASYNC_MAX_WORKERS
+
+    def test_async_uses_given_executor(self):
+        """Requests are sent from the executor passed in, which stays open"""
+        repos = [{'name': 'a'}, {'name': 'b'}]
+        fake_get = _mock_github(repos, {'a': [], 'b': []})
+        threads = set()
+
+        def recording_get(url, *args, **kwargs):
+            threads.add(threading.current_thread().name)
+            return fake_get(url, *args, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="shared") as executor:
+            with patch('requests.get', side_effect=recording_get):
+                asyncio.run(async_get_user_repos_with_commits(
+                    "testuser", executor=executor
+                ))
+            assert executor.submit(len, "ok").result() == 2
+
+        assert threads and all(name.startswith("shared") for name in threads)
+
+    def test_async_failed_commit_calls_count_as_zero(self):
+        """Failed commit calls count as 0 in the coroutine too"""
+        repos = [{'name': 'ok'}, {'name': 'broken'}]
+        commits = {'ok': [{'sha': '1'}], 'broken': requests.exceptions.Timeout("slow")}
+        with patch('requests.get', side_effect=_mock_github(repos, commits)):
+            result = asyncio.run(async_get_user_repos_with_commits("testuser"))
+
+        assert [r['commit_count'] for r in result] == [1, 0]
+
+    def test_async_invalid_input(self):
+        """The coroutine raises ValueError for invalid user input"""
+        with pytest.raises(ValueError) as excinfo:
+            asyncio.run(async_get_user_repos_with_commits("   "))
+        assert "User ID must be a non-empty string" in str(excinfo.value)
+
+    def test_async_user_not_found_404(self):
+        """The coroutine raises RequestException for unknown users"""
+        with patch('requests.get') as mock_get:
+            mock_get.return_value = _mock_response(status_code=404)
+
+            with pytest.raises(requests.exceptions.RequestException) as excinfo:
+                asyncio.run(async_get_user_repos_with_commits("ghost"))
+        assert "User 'ghost' not found: 404 Client Error" in str(excinfo.value)
+        assert "Failed to fetch repositories for user ghost" in str(excinfo.value)
+
+
+class TestGitHubClient:
+    """Tests for the pooled keep-alive GitHub client"""
+
+    def test_client_configures_pooled_adapter(self):
+        """The session mounts an adapter sized by the pool arguments"""
+        client = GitHubClient(pool_connections=4, pool_maxsize=32)
+        adapter = client.session.get_adapter("https://api.github.com/users/x/repos")
+
+        assert adapter._pool_connections == 4
+        assert adapter._pool_maxsize == 32
+        client.close()
+
+    def test_client_applies_default_timeout_and_token(self):
+        """Requests use the configured timeout and authorization header"""
+        client = GitHubClient(token="secret", timeout=7)
+        with patch.object(client.session, 'get') as mock_get:
+            client.get("https://api.github.com/users/x/repos")
+            client.get("https://api.github.com/users/x/repos", timeout=1)
+
+        assert mock_get.call_args_list[0].kwargs['timeout'] == 7
+        assert mock_get.call_args_list[1].kwargs['timeout'] == 1
+        assert client.session.headers['Authorization'] == "Bearer secret"
+
+    def test_functions_send_every_request_through_the_client(self):
+        """All repo and commit requests reuse the client's session"""
+        repos = [{'name': 'repo1'}, {'name': 'repo2'}]
+        commits = {'repo1': [{'sha': '1'}], 'repo2': [{'sha': '1'}, {'sha': '2'}]}
+        with GitHubClient() as client:
+            with patch.object(client.session, 'get',
+                              side_effect=_mock_github(repos, commits)) as mock_get, \
+                    patch('requests.get') as module_get:
+                sequential = get_user_repos_with_commits("testuser", client=client)
+                concurrent = get_user_repos_with_commits(
+                    "testuser", max_workers=2, client=client
+                )
+                coroutine = asyncio.run(
+                    async_get_user_repos_with_commits("testuser", client=client)
+                )
+
+        assert sequential == concurrent == coroutine
+        assert [r['commit_count'] for r in sequential] == [1, 2]
+        assert mock_get.call_count == 9
+        module_get.assert_not_called()
+
+
+class TestLinkHeaderCommitCounting:
+    """Tests for counting commits from the Link header"""
+
+    @staticmethod
+    def _link_github(totals):
+        """Answer per_page=1 commit requests with a rel="last" link"""
+        def fake_get(url, *args, **kwargs):
+            if url.endswith("/repos"):
+                return _mock_response(json_data=[{'name': name} for name in totals])
+            assert kwargs.get('params') == {'per_page': 1}
+            repo_name = url.split("/")[-2]
+            total = totals[repo_name]
+            if total is None:
+                return _mock_response(status_code=409)
+            links = {}
+            if total > 1:
+                last_url = f"{url}?per_page=1&page={total}"
+                links = {'next': {'url': f"{url}?per_page=1&page=2"},
+                         'last': {'url': last_url}}
+            return _mock_response(json_data=[{'sha': 'head'}], links=links)
+        return fake_get
+
+    def test_link_method_reads_exact_totals(self):
+        """Totals beyond the first page come from the last page number"""
+        totals = {'huge': 12345, 'small': 31, 'single': 1, 'empty': None}
+        with patch('requests.get', side_effect=self._link_github(totals)):
+            result = get_user_repos_with_commits("testuser", count_method="link")
+
+        assert [r['commit_count'] for r in result] == [12345, 31, 1, 0]
+
+    def test_link_method_with_async_and_threads(self):
+        """The link method works in concurrent and coroutine modes"""
+        totals = {'a': 500, 'b': 2}
+        with patch('requests.get', side_effect=self._link_github(totals)):
+            concurrent = get_user_repos_with_commits(
+                "testuser", max_workers=2, count_method="link"
+            )
+            coroutine = asyncio.run(
+                async_get_user_repos_with_commits("testuser", count_method="link")
+            )
+
+        assert concurrent == coroutine
+        assert [r['commit_count'] for r in concurrent] == [500, 2]
+
+    def test_list_method_remains_default(self):
+        """The list-length method is still used without count_method"""
+        with patch('requests.get') as mock_get:
+            mock_get.side_effect = [
+                _mock_response(json_data=[{'name': 'repo1'}]),
+                _mock_response(json_data=[{'sha': '1'}, {'sha': '2'}]),
+            ]
+            result = get_user_repos_with_commits("testuser")
+
+        assert result[0]['commit_count'] == 2
+        assert mock_get.call_args_list[1].kwargs == {}
+
+    def test_invalid_count_method(self):
+        """Test error handling for unknown counting strategies"""
+        with pytest.raises(ValueError) as excinfo:
+            get_user_repos_with_commits("testuser", count_method="graph")
+        assert "count_method must be one of: list, link" in str(excinfo.value)
+
+
+def _paginated_github(pages, fail_page=None):
+    """Return a requests.get side effect serving repos over several pages
+
+    Each repository has one commit. Pages are linked with rel="next" and
+    fail_page, if given, answers with a 500 error.
+    """
+    base = "https://api.github.com/users/testuser/repos"
+
+    def fake_get(url, *args, **kwargs):
+        if "/repos/" in url:
+            return _mock_response(json_data=[{'sha': '1'}])
+        page = int(url.split("&page=")[1]) if "&page=" in url else 1
+        if page == 1:
+            assert kwargs.get('params') == {'per_page': 100}
+        if page == fail_page:
+            response = _mock_response(status_code=500)
+            response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+                "500 Server Error"
+            )
+            return response
+        links = {}
+        if page < len(pages):
+            links['next'] = {'url': f"{base}?per_page=100&page={page + 1}"}
+        return _mock_response(json_data=pages[page - 1], links=links)
+    return fake_get
+
+
+class TestPaginatedListing:
+    """Tests for following rel="next" links across repository pages"""
+
+    PAGES = [
+        [{'name': f'repo{i}'} for i in range(100)],
+        [{'name': f'repo{i}'} for i in range(100, 200)],
+        [{'name': 'repo200'}],
+    ]
+
+    def test_iter_user_repositories_streams_all_pages(self):
+        """The generator yields every repository across pages, lazily"""
+        with patch('requests.get', side_effect=_paginated_github(self.PAGES)) as mock_get:
+            repos = iter_user_repositories(" testuser ")
+            assert mock_get.call_count == 0
+
+            first_page = [next(repos)['name'] for _ in range(100)]
+            assert mock_get.call_count == 1
+
+            rest = [repo['name'] for repo in repos]
+
+        assert first_page + rest == [f'repo{i}' for i in range(201)]
+        assert mock_get.call_count == 3
+
+    @pytest.mark.parametrize("max_workers", [None, 4])
+    def test_paginate_counts_every_repository(self, max_workers):
+        """Paginated analysis covers repositories beyond the first page"""
+        with patch('requests.get', side_effect=_paginated_github(self.PAGES)):
+            result = get_user_repos_with_commits(
+                "testuser", max_workers=max_workers, paginate=True
+            )
+
+        assert len(result) == 201
+        assert result[-1] == {'repo_name': 'repo200', 'commit_count': 1}
+
+    def test_async_paginate_counts_every_repository(self):
+        """The coroutine follows pages too"""
+        with patch('requests.get', side_effect=_paginated_github(self.PAGES)):
+            result = asyncio.run(
+                async_get_user_repos_with_commits("testuser", paginate=True)
+            )
+
+        assert [r['repo_name'] for r in result] == [f'repo{i}' for i in range(201)]
+
+    def test_failed_later_page_raises(self):
+        """A failure on a later page raises instead of truncating results"""
+        fake_get = _paginated_github(self.PAGES, fail_page=2)
+        with patch('requests.get', side_effect=fake_get):
+            with pytest.raises(requests.exceptions.RequestException) as excinfo:
+                get_user_repos_with_commits("testuser", max_workers=4, paginate=True)
+            assert "Failed to fetch repositories for user testuser" in str(excinfo.value)
+
+            with pytest.raises(requests.exceptions.RequestException):
+                list(iter_user_repositories("testuser"))
+
+            with pytest.raises(requests.exceptions.RequestException):
+                asyncio.run(
+                    async_get_user_repos_with_commits("testuser", paginate=True)
+                )
+
+    @pytest.mark.parametrize("per_page", [0, 101, None])
+    def test_invalid_per_page(self, per_page):
+        """Test error handling for page sizes GitHub does not accept"""
+        with pytest.raises(ValueError):
+            iter_user_repositories("testuser", per_page=per_page)
+
+
+@pytest.fixture
+def fake_github_users():
+    """Accounts served by the shared fake_github fixture"""
+    return {
+        'vanshajtyagi': {f'repo{i:03d}': i for i in range(250)},
+        'emptyrepos': {'empty': None, 'one': 1},
+        'norepos': {},
+    }
+
+
+class TestGraphQLBackend:
+    """Tests for the batched GraphQL backend against a local fake endpoint"""
+
+    def test_graphql_batches_100_repos_per_request(self, fake_github):
+        """250 repositories take 3 GraphQL requests and no REST calls"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            result = get_user_repos_with_commits(
+                "vanshajtyagi", client=client, backend="graphql"
+            )
+
+        assert len(result) == 250
+        assert result[0] == {'repo_name': 'repo000', 'commit_count': 0}
+        assert result[249] == {'repo_name': 'repo249', 'commit_count': 249}
+        assert fake_github.requests == [('POST', '/graphql')] * 3
+
+    def test_graphql_matches_rest_result_shape(self, fake_github):
+        """Empty repositories count as 0, like inaccessible REST commit calls"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            result = get_user_repos_with_commits(
+                "emptyrepos", client=client, backend="graphql"
+            )
+            no_repos = get_user_repos_with_commits(
+                "norepos", client=client, backend="graphql"
+            )
+
+        assert result == [
+            {'repo_name': 'empty', 'commit_count': 0},
+            {'repo_name': 'one', 'commit_count': 1},
+        ]
+        assert no_repos == []
+
+    def test_graphql_async(self, fake_github):
+        """The coroutine supports the GraphQL backend"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            result = asyncio.run(async_get_user_repos_with_commits(
+                "vanshajtyagi", client=client, backend="graphql"
+            ))
+
+        assert [r['commit_count'] for r in result] == list(range(250))
+
+    def test_graphql_unknown_user(self, fake_github):
+        """Unknown users raise the same error as the REST backend"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            with pytest.raises(requests.exceptions.RequestException) as excinfo:
+                get_user_repos_with_commits("ghost", client=client, backend="graphql")
+        assert "User 'ghost' not found: 404 Client Error" in str(excinfo.value)
+
+    def test_graphql_rate_limited(self):
+        """A 403 from the GraphQL endpoint is reported as rate limiting"""
+        with patch('requests.post') as mock_post:
+            mock_post.return_value = _mock_response(status_code=403)
+            with pytest.raises(requests.exceptions.RequestException) as excinfo:
+                get_user_repos_with_commits("testuser", backend="graphql")
+        assert "API rate limit exceeded: 403 Forbidden" in str(excinfo.value)
+
+    def test_invalid_backend(self):
+        """Test error handling for unknown backends"""
+        with pytest.raises(ValueError) as excinfo:
+            get_user_repos_with_commits("testuser", backend="soap")
+        assert "backend must be one of: rest, graphql" in str(excinfo.value)
+
+
+class FakeClock:
+    """Deterministic clock whose sleep() advances time instantly"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _quota_headers(remaining, reset_at, limit=60):
+    """Rate-limit headers as sent by GitHub"""
+    return {
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': str(int(reset_at)),
+    }
+
+
+class TestRateLimiter:
+    """Tests for the rate-limit-aware request scheduler"""
+
+    def test_unknown_quota_is_not_paced(self):
+        """Requests are not delayed before any quota is known"""
+        clock = FakeClock()
+        limiter = RateLimiter(burst=1, clock=clock.time, sleep=clock.sleep)
+        for _ in range(5):
+            limiter.acquire()
+
+        assert clock.sleeps == []
+
+    def test_remaining_quota_is_spread_until_reset(self):
+        """Requests are paced so the quota lasts until the reset"""
+        clock = FakeClock()
+        limiter = RateLimiter(burst=1, clock=clock.time, sleep=clock.sleep)
+        limiter.update(_mock_response(headers=_quota_headers(10, clock.now + 100)))
+
+        for _ in range(3):
+            limiter.acquire()
+
+        assert limiter.remaining == 7
+        assert len(clock.sleeps) == 2
+        assert all(9 <= wait <= 12 for wait in clock.sleeps)
+
+    def test_exhausted_quota_waits_for_reset(self):
+        """With no quota left, acquire() sleeps until the reset"""
+        clock = FakeClock()
+        limiter = RateLimiter(clock=clock.time, sleep=clock.sleep)
+        limiter.update(_mock_response(headers=_quota_headers(0, clock.now + 30)))
+
+        limiter.acquire()
+
+        assert clock.sleeps == [30]
+
+    def test_distant_reset_raises_typed_error(self):
+        """A reset beyond max_wait surfaces as RateLimitExceeded"""
+        clock = FakeClock()
+        limiter = RateLimiter(max_wait=60, clock=clock.time, sleep=clock.sleep)
+        reset_at = clock.now + 3600
+        limiter.update(_mock_response(headers=_quota_headers(0, reset_at)))
+
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            limiter.acquire()
+        assert excinfo.value.reset_at == reset_at
+        assert clock.sleeps == []
+
+    def test_out_of_order_responses_keep_lowest_remaining(self):
+        """A stale response does not raise the remaining quota again"""
+        limiter = RateLimiter()
+        limiter.update(_mock_response(headers=_quota_headers(5, 2000)))
+        limiter.update(_mock_response(headers=_quota_headers(9, 2000)))
+        assert limiter.remaining == 5
+
+        limiter.update(_mock_response(headers=_quota_headers(60, 5600)))
+        assert limiter.remaining == 60
+
+    def test_client_waits_out_reset_and_retries(self):
+        """A rate-limited commit call is retried after the reset, not counted as 0"""
+        clock = FakeClock()
+        limiter = RateLimiter(clock=clock.time, sleep=clock.sleep)
+        reset_at = clock.now + 20
+        responses = [
+            _mock_response(json_data=[{'name': 'repo1'}], headers=_quota_headers(1, reset_at)),
+            _mock_response(status_code=403, headers=_quota_headers(0, reset_at)),
+            _mock_response(json_data=[{'sha': '1'}, {'sha': '2'}],
+                           headers=_quota_headers(59, reset_at + 3600)),
+        ]
+        client = GitHubClient(rate_limiter=limiter)
+        with patch.object(client.session, 'get', side_effect=responses):
+            result = get_user_repos_with_commits("testuser", client=client)
+
+        assert result == [{'repo_name': 'repo1', 'commit_count': 2}]
+        assert clock.sleeps == [20]
+
+    def test_past_reset_backs_off_and_gives_up(self):
+        """A reset already passed on the local clock does not retry in a tight loop"""
+        clock = FakeClock()
+        limiter = RateLimiter(clock=clock.time, sleep=clock.sleep, max_retries=3)
+        # Clock skew: GitHub still answers 403 after the reported reset
+        limited = _mock_response(status_code=403, headers=_quota_headers(0, clock.now - 5))
+        client = GitHubClient(rate_limiter=limiter)
+        with patch.object(client.session, 'get', return_value=limited) as mock_get:
+            with pytest.raises(RateLimitExceeded) as excinfo:
+                client.get("https://api.github.com/users/testuser/repos")
+
+        assert "still limited after 3 retries" in str(excinfo.value)
+        assert clock.sleeps == [1.0, 2.0, 4.0]
+        assert mock_get.call_count == 4
+
+    def test_rate_limited_commit_call_raises_without_scheduler(self):
+        """Without a scheduler, an exhausted quota raises instead of returning 0"""
+        headers = _quota_headers(0, 1_700_000_000)
+        with patch('requests.get') as mock_get:
+            mock_get.side_effect = [
+                _mock_response(json_data=[{'name': 'repo1'}]),
+                _mock_response(status_code=403, headers=headers),
+            ]
+            with pytest.raises(RateLimitExceeded) as excinfo:
+                get_user_repos_with_commits("testuser")
+
+        assert excinfo.value.reset_at == 1_700_000_000
+        assert "Failed to fetch repositories for user testuser" in str(excinfo.value)
+
+    def test_rate_limited_repos_call_raises_typed_error(self):
+        """An exhausted quota on the repos call keeps the existing message"""
+        with patch('requests.get') as mock_get:
+            mock_get.return_value = _mock_response(
+                status_code=403, headers=_quota_headers(0, 1_700_000_000)
+            )
+            with pytest.raises(RateLimitExceeded) as excinfo:
+                get_user_repos_with_commits("testuser")
+
+        assert "API rate limit exceeded: 403 Forbidden" in str(excinfo.value)
+
+
+class TestRetryPolicy:
+    """Tests for retrying transient failures with backoff"""
+
+    def test_retryable_statuses(self):
+        """5xx, 429 and 403 with Retry-After are retried; other 403s are not"""
+        retry = build_retry()
+
+        assert retry.is_retry("GET", 502)
+        assert retry.is_retry("GET", 429)
+        assert retry.is_retry("GET", 403, has_retry_after=True)
+        assert not retry.is_retry("GET", 403)
+        assert not retry.is_retry("GET", 404)
+        assert not retry.is_retry("POST", 502)
+
+    def test_backoff_is_capped_with_jitter(self):
+        """Exponential backoff never exceeds backoff_max"""
+        retry = build_retry(total=10, backoff_factor=1, backoff_max=5, backoff_jitter=0)
+        delays = []
+        for _ in range(6):
+            retry = retry.increment(method="GET", url="/", response=HTTPResponse(status=502))
+            delays.append(retry.get_backoff_time())
+        assert delays == [0, 2, 4, 5, 5, 5]
+
+        jittered = build_retry(total=10, backoff_factor=1, backoff_max=60, backoff_jitter=0.5)
+        for _ in range(3):
+            jittered = jittered.increment(method="GET", url="/", response=HTTPResponse(status=502))
+        assert 4 <= jittered.get_backoff_time() <= 4.5
+
+    def test_transient_errors_are_retried(self, fake_github):
+        """5xx answers, dropped connections and secondary limits are retried"""
+        fake_github.add_fault(502, count=2)
+        fake_github.add_fault(None)
+        fake_github.add_fault(403, headers={'Retry-After': '0'})
+
+        retry = build_retry(backoff_factor=0, backoff_jitter=0)
+        with GitHubClient(base_url=fake_github.url, retry=retry) as client:
+            result = get_user_repos_with_commits("emptyrepos", client=client)
+
+        assert result == [
+            {'repo_name': 'empty', 'commit_count': 0},
+            {'repo_name': 'one', 'commit_count': 1},
+        ]
+        assert fake_github.faults == []
+
+    def test_without_retry_each_request_is_attempted_once(self, fake_github):
+        """A transient error fails the call when no policy is configured"""
+        fake_github.add_fault(502)
+
+        with GitHubClient(base_url=fake_github.url) as client:
+            with pytest.raises(requests.exceptions.RequestException):
+                get_user_repos_with_commits("emptyrepos", client=client)
+
+        assert len(fake_github.requests) == 1
+
+    def test_exhausted_retries_return_final_response(self, fake_github):
+        """After the last retry the error response is handled as before"""
+        fake_github.add_fault(503, count=3)
+
+        retry = build_retry(total=2, backoff_factor=0, backoff_jitter=0)
+        with GitHubClient(base_url=fake_github.url, retry=retry) as client:
+            with pytest.raises(requests.exceptions.RequestException) as excinfo:
+                get_user_repos_with_commits("emptyrepos", client=client)
+
+        assert "503" in str(excinfo.value)
+
+
+class TestManyUsersBatch:
+    """Tests for analysing many users through one shared pool"""
+
+    def test_batch_returns_per_user_results_and_errors(self, fake_github):
+        """One bad user does not abort the batch, and order is kept"""
+        with patch.object(GitHubClient, 'close') as mock_close:
+            results = get_many_users_repos_with_commits(
+                ["emptyrepos", "ghost", "  ", " norepos ", "vanshajtyagi"],
+                max_workers=8,
+                client=GitHubClient(base_url=fake_github.url, pool_maxsize=8),
+            )
+        mock_close.assert_not_called()
+
+        assert [r['user_id'] for r in results] == [
+            "emptyrepos", "ghost", "  ", "norepos", "vanshajtyagi"
+        ]
+        assert results[0]['repos'] == [
+            {'repo_name': 'empty', 'commit_count': 0},
+            {'repo_name': 'one', 'commit_count': 1},
+        ]
+        assert results[0]['error'] is None
+        assert isinstance(results[1]['error'], requests.exceptions.RequestException)
+        assert "User 'ghost' not found" in str(results[1]['error'])
+        assert results[1]['repos'] is None
+        assert isinstance(results[2]['error'], ValueError)
+        assert results[3]['repos'] == []
+        assert len(results[4]['repos']) == 250
+        assert results[4]['repos'][30] == {'repo_name': 'repo030', 'commit_count': 30}
+
+    def test_batch_matches_single_user_results(self):
+        """Each user's result equals get_user_repos_with_commits"""
+        repos = [{'name': f'repo{i}'} for i in range(6)]
+        commits = {f'repo{i}': [{'sha': 'c'}] * i for i in range(6)}
+        client = GitHubClient()
+        with patch.object(client.session, 'get', side_effect=_mock_github(repos, commits)):
+            expected = get_user_repos_with_commits("alice", client=client)
+            results = get_many_users_repos_with_commits(
+                (user for user in ["alice", "bob"]), client=client
+            )
+
+        assert [r['repos'] for r in results] == [expected, expected]
+
+    def test_batch_respects_global_concurrency(self):
+        """No more than max_workers requests run at once across all users"""
+        repos = [{'name': f'repo{i}'} for i in range(5)]
+        commits = {f'repo{i}': [] for i in range(5)}
+        fake_get = _mock_github(repos, commits)
+        lock = threading.Lock()
+        in_flight = [0]
+        peak = [0]
+
+        def tracking_get(url, *args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                threading.Event().wait(0.005)
+                return fake_get(url, *args, **kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        client = GitHubClient()
+        with patch.object(client.session, 'get', side_effect=tracking_get):
+            results = get_many_users_repos_with_commits(
+                [f"user{i}" for i in range(20)], max_workers=4, client=client
+            )
+
+        assert all(len(r['repos']) == 5 for r in results)
+        assert peak[0] <= 4
+
+    def test_batch_creates_and_closes_its_own_client(self):
+        """Without a client, one pooled client is shared and closed"""
+        repos = [{'name': 'repo1'}]
+        commits = {'repo1': [{'sha': '1'}]}
+        with patch('requests.Session.get', side_effect=_mock_github(repos, commits)), \
+                patch.object(GitHubClient, 'close') as mock_close:
+            results = get_many_users_repos_with_commits(["alice", "bob"])
+
+        assert [r['repos'][0]['commit_count'] for r in results] == [1, 1]
+        mock_close.assert_called_once()
+
+    def test_batch_invalid_max_workers(self):
+        """Test error handling for invalid max_workers values"""
+        with pytest.raises(ValueError):
+            get_many_users_repos_with_commits(["alice"], max_workers=None)
+
+
+class TestStreamingResults:
+    """Tests for yielding repositories as soon as their counts arrive"""
+
+    REPOS = [{'name': f'repo{i}'} for i in range(6)]
+    COMMITS = {f'repo{i}': [{'sha': 'c'}] * i for i in range(6)}
+
+    def test_sequential_stream_yields_pairs(self):
+        """Pairs are yielded lazily, one commits call at a time"""
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)) as mock_get:
+            stream = iter_user_repos_with_commits("testuser")
+            assert mock_get.call_count == 0
+
+            assert next(stream) == ('repo0', 0)
+            assert mock_get.call_count == 2
+            assert list(stream) == [(f'repo{i}', i) for i in range(1, 6)]
+
+    def test_ordered_stream_keeps_listing_order(self):
+        """Concurrent streaming keeps listing order by default"""
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            pairs = list(iter_user_repos_with_commits("testuser", max_workers=3))
+
+        assert pairs == [(f'repo{i}', i) for i in range(6)]
+
+    def test_completion_order_does_not_wait_for_slowest_repo(self):
+        """With ordered=False, fast repositories are yielded before a slow one"""
+        fake_get = _mock_github(self.REPOS, self.COMMITS)
+        release = threading.Event()
+
+        def slow_first_repo(url, *args, **kwargs):
+            if url.endswith("/repo0/commits"):
+                release.wait(5)
+            return fake_get(url, *args, **kwargs)
+
+        with patch('requests.get', side_effect=slow_first_repo):
+            stream = iter_user_repos_with_commits(
+                "testuser", max_workers=3, ordered=False
+            )
+            first = next(stream)
+            release.set()
+            rest = list(stream)
+
+        assert first != ('repo0', 0)
+        assert sorted([first] + rest) == [(f'repo{i}', i) for i in range(6)]
+
+    def test_stream_raises_request_errors_while_iterating(self):
+        """Lookup failures surface on the first next() call"""
+        with patch('requests.get') as mock_get:
+            mock_get.return_value = _mock_response(status_code=404)
+            stream = iter_user_repos_with_commits("ghost", max_workers=2)
+
+            with pytest.raises(requests.exceptions.RequestException) as excinfo:
+                next(stream)
+        assert "User 'ghost' not found: 404 Client Error" in str(excinfo.value)
+
+    def test_stream_validates_input_eagerly(self):
+        """Invalid input is rejected before iteration starts"""
+        with pytest.raises(ValueError):
+            iter_user_repos_with_commits("")
+
+
+def _commit(sha, parents, date):
+    """Build a commit object as listed by the commits endpoint"""
+    return {
+        'sha': sha,
+        'parents': [{'sha': parent} for parent in parents],
+        'commit': {'committer': {'date': date}},
+    }
+
+
+def _linear_history(prefix, count, start=0, parent=None):
+    """Build a newest-first chain of commits with increasing dates"""
+    commits = []
+    for i in range(start, start + count):
+        sha = f"{prefix}{i}"
+        commits.append(_commit(sha, [parent] if parent else [],
+                               f"2024-01-01T{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z"))
+        parent = sha
+    return commits[::-1]
+
+
+class TestDeltaCommitCounting:
+    """Tests for counting only the commits added since the stored head"""
+
+    @staticmethod
+    def _github(repo):
+        """Serve one repository whose pushed_at and history can change
+
+        repo is a dict with 'pushed_at' and a newest-first 'history'.
+        Every commits request is recorded in repo['requests'].
+        """
+        repo['requests'] = []
+
+        def fake_get(url, *args, params=None, **kwargs):
+            if url.endswith("/repos"):
+                return _mock_response(json_data=[
+                    {'name': 'r', 'pushed_at': repo['pushed_at']}
+                ])
+            query = dict(parse_qsl(url.split("?")[1])) if "?" in url else dict(params or {})
+            repo['requests'].append(query)
+            history = repo['history']
+            if 'since' in query:
+                listed = [c for c in history
+                          if c['commit']['committer']['date'] >= query['since']]
+                page = int(query.get('page', 1))
+                links = {}
+                if len(listed) > page * 100:
+                    links = {'next': {'url': f"{url.split('?')[0]}?since={query['since']}&per_page=100&page={page + 1}"}}
+                return _mock_response(json_data=listed[(page - 1) * 100:page * 100], links=links)
+            links = {'last': {'url': f"{url}?per_page=1&page={len(history)}"}}
+            return _mock_response(json_data=history[:1], links=links)
+        return fake_get
+
+    def _run(self, repo, state, count_method="link"):
+        with patch('requests.get', side_effect=self._github(repo)):
+            result = get_user_repos_with_commits(
+                "testuser", count_method=count_method, repo_state=state
+            )
+        return result[0]['commit_count']
+
+    def test_new_commits_are_added_to_stored_total(self):
+        """A push lists only the new commits and adds them up"""
+        state = RepoStateStore()
+        old = _linear_history("a", 5)
+        repo = {'pushed_at': "t1", 'history': old}
+        assert self._run(repo, state) == 5
+        assert repo['requests'] == [{'per_page': 1}]
+
+        repo.update(pushed_at="t2", history=_linear_history("a", 3, start=5, parent="a4") + old)
+        assert self._run(repo, state) == 8
+        assert [set(query) for query in repo['requests']] == [{'since', 'per_page'}]
+        assert state.get("testuser", "r")['head_sha'] == "a7"
+
+    def test_list_count_is_not_used_as_delta_base(self):
+        """A capped "list" count is recounted, not extended, by a "link" run"""
+        state = RepoStateStore()
+        old = _linear_history("a", 40)
+        repo = {'pushed_at': "t1", 'history': old}
+        assert self._run(repo, state, count_method="list") == 1
+        assert state.get("testuser", "r")['count_method'] == "list"
+
+        repo.update(pushed_at="t2", history=_linear_history("a", 2, start=40, parent="a39") + old)
+        assert self._run(repo, state) == 42
+        assert 'since' not in repo['requests'][-1]
+        assert state.get("testuser", "r")['count_method'] == "link"
+
+    def test_delta_follows_pagination(self):
+        """More than one page of new commits is followed through next links"""
+        state = RepoStateStore()
+        old = _linear_history("a", 2)
+        repo = {'pushed_at': "t1", 'history': old}
+        self._run(repo, state)
+
+        repo.update(pushed_at="t2", history=_linear_history("a", 150, start=2, parent="a1") + old)
+        assert self._run(repo, state) == 152
+        assert len(repo['requests']) == 2
+
+    def test_push_to_other_branch_keeps_count(self):
+        """A new pushed_at without new default-branch commits adds nothing"""
+        state = RepoStateStore()
+        repo = {'pushed_at': "t1", 'history': _linear_history("a", 4)}
+        self._run(repo, state)
+
+        repo['pushed_at'] = "t2"
+        assert self._run(repo, state) == 4
+        assert len(repo['requests']) == 1
+        assert 'since' in repo['requests'][0]
+
+    def test_rewritten_history_is_recounted(self):
+        """A force push that drops the stored head triggers a full recount"""
+        state = RepoStateStore()
+        repo = {'pushed_at': "t1", 'history': _linear_history("a", 6)}
+        self._run(repo, state)
+
+        repo.update(pushed_at="t2", history=_linear_history("b", 3, start=10))
+        assert self._run(repo, state) == 3
+        assert repo['requests'][-1] == {'per_page': 1}
+
+    def test_merge_of_older_commits_is_recounted(self):
+        """Merged commits dated before the stored head are not missed"""
+        state = RepoStateStore()
+        old = _linear_history("a", 5, start=100)
+        repo = {'pushed_at': "t1", 'history': old}
+        self._run(repo, state)
+
+        feature = _commit("f1", ["a100"], "2024-01-01T00:00:01Z")
+        merge = _commit("m", ["a104", "f1"], "2024-01-01T05:00:00Z")
+        repo.update(pushed_at="t2", history=[merge] + old[:4] + [feature] + old[4:])
+        assert self._run(repo, state) == 7
+        assert repo['requests'][-1] == {'per_page': 1}
+
+    def test_list_method_always_recounts(self):
+        """Capped first-page totals are recounted instead of accumulated"""
+        state = RepoStateStore()
+        repo = {'pushed_at': "t1", 'history': _linear_history("a", 3)}
+        self._run(repo, state, count_method="list")
+
+        repo['pushed_at'] = "t2"
+        self._run(repo, state, count_method="list")
+        assert all('since' not in query for query in repo['requests'])
+
+
+class TestCompactRecords:
+    """Tests for RepoCommitCount records and projected listings"""
+
+    REPOS = [
+        {'name': 'repo1', 'pushed_at': 't', 'description': 'x' * 1000, 'owner': {'login': 'u'}},
+        {'name': 'repo2', 'pushed_at': 't', 'description': 'y' * 1000, 'owner': {'login': 'u'}},
+    ]
+    COMMITS = {'repo1': [{'sha': 'a'}], 'repo2': [{'sha': 'b'}, {'sha': 'c'}]}
+
+    def test_records_option(self):
+        """records=True returns slotted tuples with a dictionary view"""
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            result = get_user_repos_with_commits("testuser", records=True)
+
+        assert result == [RepoCommitCount('repo1', 1), RepoCommitCount('repo2', 2)]
+        assert result[1].commit_count == 2
+        assert result[0].as_dict() == {'repo_name': 'repo1', 'commit_count': 1}
+        assert not hasattr(result[0], '__dict__')
+        assert sys.getsizeof(result[0]) < sys.getsizeof(result[0].as_dict())
+
+    def test_dictionaries_remain_the_default(self):
+        """Without records the result keeps its dictionary form"""
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            result = get_user_repos_with_commits("testuser", max_workers=2)
+
+        assert result == [
+            {'repo_name': 'repo1', 'commit_count': 1},
+            {'repo_name': 'repo2', 'commit_count': 2},
+        ]
+
+    def test_stream_yields_records(self):
+        """The streaming iterator yields records that unpack as pairs"""
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            for record in iter_user_repos_with_commits("testuser"):
+                repo_name, commit_count = record
+                assert isinstance(record, RepoCommitCount)
+                assert record.repo_name == repo_name
+
+    def test_counting_keeps_only_projected_fields(self):
+        """Repository objects handed to the counters hold REPO_FIELDS only"""
+        seen = []
+        real_counter = github_api._repo_counter
+
+        def spying_counter(*args, **kwargs):
+            count = real_counter(*args, **kwargs)
+
+            def spy(user_id, repo):
+                seen.append(repo)
+                return count(user_id, repo)
+            return spy
+
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)), \
+                patch('github_api._repo_counter', side_effect=spying_counter):
+            get_user_repos_with_commits("testuser", paginate=True)
+
+        assert [set(repo) for repo in seen] == [set(REPO_FIELDS)] * 2
+
+    def test_public_listing_keeps_full_objects(self):
+        """iter_user_repositories still yields complete repository objects"""
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            assert list(iter_user_repositories("testuser")) == self.REPOS
+
+    def test_batch_and_cache_records(self):
+        """The batch and cached results honour records=True"""
+        client = GitHubClient()
+        with patch.object(client.session, 'get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            results = get_many_users_repos_with_commits(
+                ["testuser"], client=client, records=True
+            )
+        assert results[0]['repos'] == [RepoCommitCount('repo1', 1), RepoCommitCount('repo2', 2)]
+
+        cache = ResultCache()
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)) as mock_get:
+            first = get_user_repos_with_commits("testuser", result_cache=cache, records=True)
+            second = get_user_repos_with_commits("testuser", result_cache=cache, records=True)
+        assert first == second == [('repo1', 1), ('repo2', 2)]
+        assert isinstance(second[0], RepoCommitCount)
+        assert mock_get.call_count == 3
+        assert cache.get("testuser", ("list", False, "rest"))[0] == {'repo_name': 'repo1', 'commit_count': 1}
+
+
+class TestStreamingJSONDecode:
+    """Tests for decoding listing pages one repository at a time"""
+
+    REPOS = [
+        {'name': 'ünïcødé-€', 'pushed_at': '2024-01-01T00:00:00Z', 'size': 12345,
+         'topics': ['a', 'b'], 'owner': {'login': 'testuser'}},
+        {'name': 'repo2', 'pushed_at': None, 'size': 0.5, 'description': 'x, ] }'},
+    ]
+
+    def _client(self, chunks, status_code=200):
+        response = _mock_response(status_code=status_code)
+        response.iter_content.return_value = chunks
+        client = GitHubClient(stream_json=True)
+        client.session.get = Mock(side_effect=lambda url, **kwargs: (
+            response if url.endswith("/repos")
+            else _mock_response(json_data=[{'sha': 'a'}])
+        ))
+        return client, response
+
+    def test_live_listing_is_streamed(self, fake_github):
+        """Counts over a real HTTP stream match the buffered result"""
+        with GitHubClient(base_url=fake_github.url, stream_json=True) as client:
+            streamed = get_user_repos_with_commits("vanshajtyagi", client=client, paginate=True)
+        with GitHubClient(base_url=fake_github.url) as client:
+            buffered = get_user_repos_with_commits("vanshajtyagi", client=client, paginate=True)
+
+        assert streamed == buffered
+        assert len(streamed) == 250
+
+    def test_streamed_listing_bypasses_caches(self, fake_github, tmp_path):
+        """Streamed pages are not loaded whole to be cached"""
+        conditional = ConditionalCache()
+        disk = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"))
+        with GitHubClient(base_url=fake_github.url, stream_json=True,
+                          conditional_cache=conditional,
+                          response_cache=disk) as client:
+            with patch('github_api._decode_json_stream',
+                       wraps=github_api._decode_json_stream) as decode:
+                for _ in range(2):
+                    result = get_user_repos_with_commits("emptyrepos", client=client)
+
+        assert result == [{'repo_name': 'empty', 'commit_count': 0},
+                          {'repo_name': 'one', 'commit_count': 1}]
+        assert decode.call_count == 2
+        listing = client.cache_key(f"{fake_github.url}/users/emptyrepos/repos")
+        assert conditional.conditional_headers(listing) == {}
+        assert disk.get(listing) is None
+        # Commit calls are still cached
+        assert disk.stats()['entries'] == 1
+        disk.close()
+
+    def test_elements_split_across_chunks(self):
+        """One-byte chunks, multi-byte characters and numbers decode correctly"""
+        body = json.dumps(self.REPOS, ensure_ascii=False, indent=1).encode()
+        client, response = self._client([body[i:i + 1] for i in range(len(body))])
+
+        with patch('github_api._repo_counter') as counter:
+            counter.return_value = lambda user_id, repo: repo
+            result = list(iter_user_repos_with_commits("testuser", client=client))
+
+        assert [record.commit_count for record in result] == [
+            {'name': 'ünïcødé-€', 'pushed_at': '2024-01-01T00:00:00Z'},
+            {'name': 'repo2', 'pushed_at': None},
+        ]
+        kwargs = client.session.get.call_args_list[0][1]
+        assert kwargs['stream'] is True
+        response.close.assert_called_once()
+
+    def test_empty_listing(self):
+        """An empty array yields no repositories"""
+        client, _ = self._client([b" [ ", b" ]\n"])
+        assert get_user_repos_with_commits("testuser", client=client) == []
+
+    @pytest.mark.parametrize("body", [b'[{"name": "a"} {"name": "b"}]', b'[{"name": "a"', b'[]]', b''])
+    def test_malformed_json_is_reported(self, body):
+        """Broken bodies raise the usual invalid JSON error"""
+        client, response = self._client([body[:5], body[5:]])
+
+        with pytest.raises(requests.exceptions.RequestException) as excinfo:
+            get_user_repos_with_commits("testuser", client=client)
+        assert "Invalid JSON response" in str(excinfo.value)
+        response.close.assert_called_once()
+
+    def test_error_status_closes_stream(self):
+        """A 404 listing is reported as before and releases the connection"""
+        client, response = self._client([], status_code=404)
+
+        with pytest.raises(requests.exceptions.RequestException) as excinfo:
+            get_user_repos_with_commits("ghost", client=client)
+        assert "User 'ghost' not found: 404 Client Error" in str(excinfo.value)
+        response.close.assert_called_once()
+
+
+class TestCommandLine:
+    """Tests for the python -m github_api entry point"""
+
+    def _main(self, fake_github, *args):
+        return main(["--base-url", fake_github.url, *args])
+
+    def test_percentile(self):
+        """Percentiles use the nearest rank of a sorted list"""
+        values = [0.1 * i for i in range(1, 11)]
+
+        assert percentile(values, 0.5) == values[5]
+        assert percentile(values, 0.99) == values[-1]
+        assert percentile([], 0.5) == 0.0
+
+    def test_usernames_from_stdin(self, fake_github, capsys, monkeypatch):
+        """Without arguments, usernames are read from stdin"""
+        monkeypatch.setattr('sys.stdin', io.StringIO("emptyrepos\n\n# comment\nghost\n"))
+
+        assert self._main(fake_github, "--format", "csv") == 1
+
+        out, err = capsys.readouterr()
+        assert out.splitlines() == [
+            "user_id,repo_name,commit_count,error",
+            "emptyrepos,empty,0,",
+            "emptyrepos,one,1,",
+            "ghost,,,Failed to fetch repositories for user ghost: "
+            "User 'ghost' not found: 404 Client Error",
+        ]
+        assert err.startswith("Analyzed 2 users (1 failed), 2 repositories, 1 commits in ")
+        assert "users/s | latency p50" in err
+
+    def test_usernames_from_file_and_arguments(self, fake_github, capsys, tmp_path):
+        """Argument usernames come first, then the input file"""
+        users_file = tmp_path / "users.txt"
+        users_file.write_text("norepos\nemptyrepos\n")
+
+        assert self._main(fake_github, "emptyrepos", "-i", str(users_file), "-f", "ndjson") == 0
+
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [r['user_id'] for r in records if 'total_repos' in r] == [
+            "emptyrepos", "norepos", "emptyrepos"
+        ]
+
+    def test_json_output_is_one_array(self, fake_github, capsys):
+        """The json format streams a single valid array"""
+        assert self._main(fake_github, "vanshajtyagi", "ghost", "-f", "json", "-w", "4") == 1
+
+        records = json.loads(capsys.readouterr().out)
+        assert len(records) == 250 + 2
+        assert records[-1]['error'].endswith("404 Client Error")
+
+    def test_table_output(self, fake_github, capsys):
+        """The default table has one aligned row per repository"""
+        assert self._main(fake_github, "emptyrepos") == 0
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split() == ["USER", "REPOSITORY", "COMMITS"]
+        assert lines[2].split() == ["emptyrepos", "one", "1"]
+
+    def test_cache_and_state_files(self, fake_github, capsys, tmp_path):
+        """--cache answers a second run from disk and --state is saved"""
+        cache_path = str(tmp_path / "responses.sqlite")
+        state_path = str(tmp_path / "state.json")
+        for _ in range(2):
+            self._main(fake_github, "emptyrepos", "--cache", cache_path, "--state", state_path)
+
+        # Only the 409 answer of the empty repository is not cacheable
+        assert len(fake_github.requests) == 4
+        assert len(RepoStateStore(state_path)) == 2
+
+    def test_stream_bounds_users_in_progress(self):
+        """Usernames are read lazily while results are consumed"""
+        consumed = []
+
+        def users():
+            for i in range(1000):
+                consumed.append(i)
+                yield f"user{i}"
+
+        client = GitHubClient()
+        with patch.object(client.session, 'get', side_effect=_mock_github([], {})):
+            stream = iter_many_users_repos_with_commits(users(), max_workers=2, client=client)
+            first = next(stream)
+            assert first['user_id'] == "user0" and first['repos'] == []
+            assert len(consumed) <= 2 * 4 + 1
+            stream.close()
+
+    def test_invalid_arguments(self, capsys):
+        """argparse rejects unknown formats"""
+        with pytest.raises(SystemExit):
+            main(["--format", "xml", "alice"])
+        assert "invalid choice" in capsys.readouterr().err
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent calls"""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Callers arriving during a call wait for it and get its result"""
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work(value):
+            calls.append(value)
+            release.wait(5)
+            return [value]
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flights.do("k", work, 1)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while flights.shared < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [1]
+        assert results == [[1]] * 5
+        assert len(flights) == 0
+
+    def test_errors_propagate_and_key_is_released(self):
+        """A failing call raises for its caller and does not stick"""
+        flights = SingleFlight()
+
+        with pytest.raises(KeyError):
+            flights.do("k", lambda: {}["missing"])
+        assert flights.do("k", lambda: 42) == 42
+        assert flights.calls == 2
+
+    @staticmethod
+    def _gated_github(release, repos, commits):
+        """requests.get side effect whose listing blocks until released"""
+        fake_get = _mock_github(repos, commits)
+        calls = []
+
+        def gated_get(url, *args, **kwargs):
+            calls.append(url)
+            if url.endswith("/repos"):
+                release.wait(5)
+            return fake_get(url, *args, **kwargs)
+        return gated_get, calls
+
+    @staticmethod
+    def _run_concurrently(funcs, waiting, flights):
+        """Run funcs on threads once the first one holds the flight"""
+        results = [None] * len(funcs)
+
+        def run(index):
+            try:
+                results[index] = funcs[index]()
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(funcs))]
+        shared_before = flights.shared
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while flights.shared - shared_before < waiting and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return threads, results
+
+    def test_concurrent_users_are_analysed_once(self):
+        """Same-user callers share one analysis but keep their own reporters and lists"""
+        release = threading.Event()
+        gated_get, calls = self._gated_github(
+            release, [{'name': 'repo1'}, {'name': 'repo2'}],
+            {'repo1': [{'sha': 'a'}], 'repo2': [{'sha': 'b'}, {'sha': 'c'}]},
+        )
+        reporters = [Mock() for _ in range(3)]
+        users = ["octocat", " OctoCat ", "octocat"]
+
+        with patch('requests.get', side_effect=gated_get):
+            threads, results = self._run_concurrently(
+                [lambda i=i: get_user_repos_with_commits(users[i], reporter=reporters[i])
+                 for i in range(3)],
+                2, github_api._user_flights,
+            )
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        assert len(calls) == 3
+        assert results[0] == results[1] == results[2] == [
+            {'repo_name': 'repo1', 'commit_count': 1},
+            {'repo_name': 'repo2', 'commit_count': 2},
+        ]
+        results[0][0]['commit_count'] = 99
+        assert results[1][0]['commit_count'] == 1
+        for reporter in reporters:
+            assert reporter.repo.call_count == 2
+            assert reporter.summary.call_args[0][1:] == (2, 3)
+
+    def test_shared_errors(self):
+        """Every waiting caller receives the failure of the shared analysis"""
+        release = threading.Event()
+
+        with patch('requests.get', side_effect=lambda url, **kwargs: (
+                release.wait(5), _mock_response(status_code=404))[1]) as mock_get:
+            threads, results = self._run_concurrently(
+                [lambda: get_user_repos_with_commits("ghost")] * 2,
+                1, github_api._user_flights,
+            )
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        assert mock_get.call_count == 1
+        for error in results:
+            assert isinstance(error, requests.exceptions.RequestException)
+            assert "User 'ghost' not found" in str(error)
+
+    def test_coalescing_can_be_disabled(self):
+        """With coalesce=False every caller sends its own requests"""
+        release = threading.Event()
+        release.set()
+        gated_get, calls = self._gated_github(release, [], {})
+
+        with patch('requests.get', side_effect=gated_get):
+            for _ in range(2):
+                get_user_repos_with_commits("octocat", coalesce=False)
+
+        assert len(calls) == 2
+
+    def test_client_coalesces_identical_gets(self):
+        """Threads requesting the same URL share one upstream request"""
+        release = threading.Event()
+        client = GitHubClient()
+        url = "https://api.github.com/repos/octocat/repo1/commits"
+
+        def slow_get(url, **kwargs):
+            release.wait(5)
+            return _mock_response(json_data=[{'sha': 'a'}])
+
+        with patch.object(client.session, 'get', side_effect=slow_get) as mock_get:
+            threads, results = self._run_concurrently(
+                [lambda: client.get(url)] * 4 + [lambda: client.get(url, params={'per_page': 1})],
+                3, client.flights,
+            )
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        assert mock_get.call_count == 2
+        assert results[0] is results[3]
+        assert results[4] is not results[0]
+
+
+class TestReporters:
+    """Tests for the pluggable output sinks"""
+
+    REPOS = [{'name': 'repo1'}, {'name': 'repo2'}]
+    COMMITS = {'repo1': [{'sha': 'a'}], 'repo2': [{'sha': 'b'}, {'sha': 'c'}]}
+
+    def test_library_call_prints_nothing_by_default(self, capsys):
+        """Without a reporter no output is produced"""
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            result = get_user_repos_with_commits("testuser")
+
+        assert len(result) == 2
+        assert capsys.readouterr().out == ""
+
+    def test_console_reporter_output(self):
+        """ConsoleReporter writes the repo lines and the summary block"""
+        stream = io.StringIO()
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            get_user_repos_with_commits(
+                "testuser", reporter=ConsoleReporter(stream)
+            )
+
+        assert stream.getvalue() == (
+            "Repo: repo1 | Number of commits: 1\n"
+            "Repo: repo2 | Number of commits: 2\n"
+            "\nSummary:\n"
+            "    Total repositories: 2\n"
+            "    Total commits: 3\n"
+            "    Successfully analyzed all repositories\n"
+        )
+
+    def test_ndjson_reporter_buffers_until_summary(self):
+        """NDJSON lines are held back and written together at the summary"""
+        stream = io.StringIO()
+        reporter = NDJSONReporter(stream, buffer_size=10)
+
+        reporter.repo("testuser", "repo1", 1)
+        assert stream.getvalue() == ""
+        reporter.summary("testuser", 1, 1)
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert records == [
+            {"user_id": "testuser", "repo_name": "repo1", "commit_count": 1},
+            {"user_id": "testuser", "total_repos": 1, "total_commits": 1},
+        ]
+
+    def test_ndjson_reporter_flushes_full_buffer(self):
+        """A full buffer is written in a single call"""
+        stream = Mock()
+        reporter = NDJSONReporter(stream, buffer_size=2)
+
+        for i in range(5):
+            reporter.repo("testuser", f"repo{i}", i)
+        assert stream.write.call_count == 2
+        reporter.flush()
+        assert stream.write.call_count == 3
+
+    def test_async_uses_reporter(self):
+        """The async variant reports through the same interface"""
+        reporter = Mock()
+        with patch('requests.get', side_effect=_mock_github(self.REPOS, self.COMMITS)):
+            asyncio.run(async_get_user_repos_with_commits(
+                "testuser", reporter=reporter
+            ))
+
+        assert reporter.repo.call_count == 2
+        reporter.summary.assert_called_once_with("testuser", 2, 3)
 
 
 if __name__ == "__main__":
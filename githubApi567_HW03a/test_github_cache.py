@@ -0,0 +1,551 @@
+"""
+Test suite for the GitHub API response caches.
+
+These tests drive the caches directly and through GitHubClient with a
+mocked session, so no real GitHub API calls are made.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from fake_github import FakeGitHubServer
+from github_api import (
+    GitHubClient,
+    get_many_users_repos_with_commits,
+    get_user_repos_with_commits,
+)
+from github_cache import (
+    ConditionalCache,
+    RepoStateStore,
+    ResultCache,
+    SQLiteResponseCache,
+    build_response,
+    endpoint_for_url,
+)
+
+
+def _json_response(url, payload, status_code=200, headers=None):
+    """Build a real requests.Response carrying a JSON payload"""
+    return build_response(
+        url, status_code, headers or {}, json.dumps(payload).encode()
+    )
+
+
+class FakeConditionalGitHub:
+    """Session.get stand-in that honours If-None-Match like GitHub does"""
+
+    def __init__(self, repos, commits):
+        self.repos = repos
+        self.commits = commits
+        self.calls = []
+
+    def __call__(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        if url.endswith("/repos"):
+            payload = self.repos
+        else:
+            payload = self.commits[url.split("/")[-2]]
+        etag = f'"{hash(json.dumps(payload))}"'
+        self.calls.append((url, headers.get("If-None-Match")))
+
+        if headers.get("If-None-Match") == etag:
+            return build_response(url, 304, {"ETag": etag, "X-RateLimit-Remaining": "59"}, b"")
+        return _json_response(url, payload, headers={"ETag": etag})
+
+
+class TestConditionalCache:
+    """Tests for ETag / If-None-Match conditional requests"""
+
+    def test_rebuilt_response_can_be_streamed(self):
+        """Cached bodies are served by iter_content like network bodies"""
+        response = _json_response("https://api.github.com/users/u/repos", [{"name": "a"}])
+
+        assert b"".join(response.iter_content(4)) == b'[{"name": "a"}]'
+
+    def test_store_and_revalidate(self):
+        """A stored response is rebuilt from a 304 answer"""
+        cache = ConditionalCache()
+        url = "https://api.github.com/users/u/repos"
+        cache.store("k", _json_response(
+            url, [{'name': 'r'}],
+            headers={"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+                     "Link": '<https://x?page=2>; rel="next"'},
+        ))
+
+        assert cache.conditional_headers("k") == {
+            "If-None-Match": '"abc"',
+            "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+        }
+        response = cache.revalidated("k", build_response(
+            url, 304, {"X-RateLimit-Remaining": "10"}, b""
+        ))
+
+        assert response.status_code == 200
+        assert response.json() == [{'name': 'r'}]
+        assert response.links['next']['url'] == "https://x?page=2"
+        assert response.headers["X-RateLimit-Remaining"] == "10"
+        assert cache.hits == 1
+
+    def test_responses_without_validators_are_not_stored(self):
+        """Only 200 responses with an ETag or Last-Modified are cached"""
+        cache = ConditionalCache()
+        cache.store("plain", _json_response("u", []))
+        cache.store("error", _json_response("u", {}, status_code=404, headers={"ETag": '"e"'}))
+
+        assert len(cache) == 0
+        assert cache.conditional_headers("plain") == {}
+        assert cache.misses == 2
+
+    def test_cache_persists_between_runs(self, tmp_path):
+        """Entries saved by one run are loaded by the next"""
+        path = str(tmp_path / "etags.json")
+        with ConditionalCache(path) as cache:
+            cache.store("k", _json_response("u", [1, 2], headers={"ETag": '"v1"'}))
+
+        reloaded = ConditionalCache(path)
+        assert len(reloaded) == 1
+        assert reloaded.conditional_headers("k") == {"If-None-Match": '"v1"'}
+
+    def test_client_reuses_bodies_on_304(self, tmp_path):
+        """A second analysis is answered entirely by 304 revalidations"""
+        fake = FakeConditionalGitHub(
+            [{'name': 'repo1'}, {'name': 'repo2'}],
+            {'repo1': [{'sha': '1'}], 'repo2': [{'sha': '1'}, {'sha': '2'}]},
+        )
+        path = str(tmp_path / "etags.json")
+
+        with ConditionalCache(path) as cache:
+            client = GitHubClient(conditional_cache=cache)
+            with patch.object(client.session, 'get', side_effect=fake):
+                first = get_user_repos_with_commits("testuser", client=client)
+
+        with ConditionalCache(path) as cache:
+            client = GitHubClient(conditional_cache=cache)
+            with patch.object(client.session, 'get', side_effect=fake):
+                second = get_user_repos_with_commits("testuser", client=client)
+
+        assert first == second
+        assert [r['commit_count'] for r in second] == [1, 2]
+        assert all(etag is None for _, etag in fake.calls[:3])
+        assert all(etag is not None for _, etag in fake.calls[3:])
+        assert cache.hits == 3
+
+    def test_cache_keys_are_separate_per_token(self):
+        """Responses cached for one token are never revalidated for another"""
+        alice = GitHubClient(token="alice")
+        bob = GitHubClient(token="bob")
+        anonymous = GitHubClient()
+        url = "https://api.github.com/users/u/repos"
+
+        keys = {alice.cache_key(url), bob.cache_key(url), anonymous.cache_key(url)}
+        assert len(keys) == 3
+        assert alice.cache_key(url, {"per_page": 1}).endswith("?per_page=1")
+
+
+class TestSQLiteResponseCache:
+    """Tests for the shared on-disk response cache"""
+
+    REPOS_URL = "https://api.github.com/users/u/repos"
+    COMMITS_URL = "https://api.github.com/repos/u/r/commits"
+
+    def test_hit_and_miss_counters(self, tmp_path):
+        """Fresh entries are served from disk and counted"""
+        cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"))
+        assert cache.get("k") is None
+
+        cache.set("k", _json_response(
+            self.REPOS_URL, [{'name': 'r'}], headers={"Link": '<https://x>; rel="next"'}
+        ))
+        response = cache.get("k")
+
+        assert response.status_code == 200
+        assert response.json() == [{'name': 'r'}]
+        assert response.links['next']['url'] == "https://x"
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+        assert cache.stats()['entries'] == 1
+
+    def test_per_endpoint_ttl(self, tmp_path):
+        """Each endpoint kind expires after its own TTL"""
+        cache = SQLiteResponseCache(
+            str(tmp_path / "cache.sqlite3"), ttls={"repos": 3600, "commits": 0}
+        )
+        cache.set("repos", _json_response(self.REPOS_URL, []))
+        cache.set("commits", _json_response(self.COMMITS_URL, []))
+
+        assert cache.get("repos") is not None
+        assert cache.get("commits") is None
+        assert endpoint_for_url(self.COMMITS_URL + "?per_page=1") == "commits"
+        assert endpoint_for_url("https://api.github.com/users/u") == "default"
+
+    def test_error_responses_are_not_cached(self, tmp_path):
+        """Only 200 responses are stored"""
+        cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"))
+        cache.set("k", _json_response(self.REPOS_URL, {}, status_code=404))
+
+        assert cache.get("k") is None
+
+    def test_lru_eviction_beyond_byte_budget(self, tmp_path):
+        """The least recently used entries are evicted past max_bytes"""
+        cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"),
+                                    max_bytes=10 ** 9, access_interval=0)
+        payload = [os.urandom(64).hex() for _ in range(10)]
+        cache.set("a", _json_response(self.REPOS_URL, payload))
+        entry_size = cache.stats()['bytes']
+        cache.max_bytes = entry_size * 2
+
+        # Sleep between steps so access times differ on coarse clocks
+        time.sleep(0.02)
+        cache.set("b", _json_response(self.REPOS_URL, payload))
+        time.sleep(0.02)
+        cache.get("a")
+        time.sleep(0.02)
+        cache.set("c", _json_response(self.REPOS_URL, payload))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()['evictions'] == 1
+
+    def test_byte_total_follows_writes(self, tmp_path):
+        """The running byte total matches the stored bodies"""
+        cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"))
+        small = _json_response(self.REPOS_URL, [])
+        large = _json_response(self.REPOS_URL, [os.urandom(64).hex() for _ in range(10)])
+
+        def summed():
+            return cache._connection().execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        cache.set("a", small)
+        cache.set("b", large)
+        cache.set("a", large)
+        assert cache.stats()['bytes'] == summed()
+
+        cache.max_bytes = cache.stats()['bytes'] - 1
+        cache.set("b", small)
+        assert cache.stats()['bytes'] == summed()
+        cache.clear()
+        assert cache.stats()['bytes'] == summed() == 0
+
+    def test_hits_only_write_after_access_interval(self, tmp_path):
+        """Repeated hits within access_interval do not write to the file"""
+        cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"))
+        cache.set("a", _json_response(self.REPOS_URL, []))
+        connection = cache._connection()
+        writes = connection.total_changes
+
+        for _ in range(5):
+            assert cache.get("a") is not None
+        assert connection.total_changes == writes
+
+        cache.access_interval = 0
+        cache.get("a")
+        assert connection.total_changes == writes + 1
+
+    def test_close_closes_every_thread(self, tmp_path):
+        """close() closes connections opened by other threads"""
+        cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"))
+        thread = threading.Thread(target=cache.get, args=("a",))
+        thread.start()
+        thread.join()
+        connections = list(cache._connections)
+        assert len(connections) == 2
+
+        cache.close()
+
+        for connection in connections:
+            with pytest.raises(sqlite3.ProgrammingError):
+                connection.execute("SELECT 1")
+        # The cache reopens on the next use
+        assert cache.get("a") is None
+
+    def test_file_is_shared_and_uses_wal(self, tmp_path):
+        """Separate cache instances on one file see each other's entries"""
+        path = str(tmp_path / "cache.sqlite3")
+        writer = SQLiteResponseCache(path)
+        reader = SQLiteResponseCache(path)
+
+        threads = [
+            threading.Thread(target=writer.set, args=(f"k{i}", _json_response(self.REPOS_URL, [i])))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert reader.get("k7").json() == [7]
+        mode = sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_client_serves_repeat_analysis_from_disk(self, tmp_path):
+        """A second analysis in another client makes no network requests"""
+        fake = FakeConditionalGitHub(
+            [{'name': 'repo1'}], {'repo1': [{'sha': '1'}, {'sha': '2'}]}
+        )
+        path = str(tmp_path / "cache.sqlite3")
+
+        first_client = GitHubClient(response_cache=SQLiteResponseCache(path))
+        with patch.object(first_client.session, 'get', side_effect=fake):
+            first = get_user_repos_with_commits("testuser", client=first_client)
+
+        second_client = GitHubClient(response_cache=SQLiteResponseCache(path))
+        with patch.object(second_client.session, 'get', side_effect=fake) as mock_get:
+            second = get_user_repos_with_commits("testuser", client=second_client)
+
+        assert first == second == [{'repo_name': 'repo1', 'commit_count': 2}]
+        mock_get.assert_not_called()
+        assert second_client.response_cache.stats()['hits'] == 2
+
+
+class TestResultCache:
+    """Tests for the in-process per-user result cache"""
+
+    RESULT = [{'repo_name': 'repo1', 'commit_count': 3}]
+
+    def test_keys_are_normalised(self):
+        """Usernames are keyed without surrounding whitespace"""
+        cache = ResultCache()
+        cache.set("  octocat ", self.RESULT)
+
+        assert cache.get("octocat") == self.RESULT
+        assert cache.hits == 1
+
+    def test_options_are_part_of_the_key(self):
+        """Results computed with other options are not shared"""
+        cache = ResultCache()
+        cache.set("OctoCat", self.RESULT, ("list", False, "rest"))
+
+        assert cache.get("octocat", ("list", False, "rest")) == self.RESULT
+        assert cache.get("octocat", ("link", True, "rest")) is None
+
+        cache.invalidate("octocat")
+        assert len(cache) == 0
+
+    def test_analysis_options_do_not_share_entries(self):
+        """A paginated link count is not answered from a capped first page"""
+        users = {'octocat': {f'repo{i:02d}': 35 for i in range(40)}}
+        cache = ResultCache()
+        with FakeGitHubServer(users, per_page=30) as server:
+            with GitHubClient(base_url=server.url) as client:
+                default = get_user_repos_with_commits("octocat", client=client,
+                                                      result_cache=cache)
+                full = get_user_repos_with_commits(
+                    "octocat", client=client, result_cache=cache,
+                    paginate=True, count_method="link",
+                )
+                again = get_user_repos_with_commits("octocat", client=client,
+                                                    result_cache=cache)
+
+        assert len(default) == 30 and default[0]['commit_count'] == 30
+        assert len(full) == 40 and full[0]['commit_count'] == 35
+        assert again == default
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_returned_results_are_copies(self):
+        """Mutating a returned result does not corrupt the cache"""
+        cache = ResultCache()
+        cache.set("octocat", self.RESULT)
+        cache.get("octocat")[0]['commit_count'] = 99
+
+        assert cache.get("octocat") == self.RESULT
+
+    def test_entries_expire_after_ttl(self):
+        """Expired entries are misses and are dropped"""
+        cache = ResultCache(ttl=0)
+        cache.set("octocat", self.RESULT)
+
+        assert cache.get("octocat") is None
+        assert len(cache) == 0
+        assert cache.misses == 1
+
+    def test_least_recently_used_entry_is_dropped(self):
+        """Only maxsize users are kept"""
+        cache = ResultCache(maxsize=2)
+        cache.set("a", self.RESULT)
+        cache.set("b", self.RESULT)
+        cache.get("a")
+        cache.set("c", self.RESULT)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+    def test_invalidate(self):
+        """Entries can be dropped for one user or for everyone"""
+        cache = ResultCache()
+        for user in ("a", "b", "c"):
+            cache.set(user, self.RESULT)
+
+        cache.invalidate(" a ")
+        assert cache.get("a") is None
+        assert len(cache) == 2
+
+        cache.invalidate()
+        assert len(cache) == 0
+
+    def test_concurrent_access(self):
+        """Many threads can read and write the cache at once"""
+        cache = ResultCache(maxsize=50)
+
+        def worker(offset):
+            for i in range(200):
+                cache.set(f"user{(offset + i) % 100}", self.RESULT)
+                cache.get(f"user{i % 100}")
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(cache) == 50
+
+    def test_invalid_maxsize(self):
+        """Test error handling for invalid cache sizes"""
+        with pytest.raises(ValueError):
+            ResultCache(maxsize=0)
+
+    def test_repeat_analysis_skips_github(self):
+        """A cached user is answered without any GitHub request"""
+        cache = ResultCache()
+        repos_response = Mock(status_code=200)
+        repos_response.json.return_value = [{'name': 'repo1'}]
+        commits_response = Mock(status_code=200)
+        commits_response.json.return_value = [{'sha': '1'}, {'sha': '2'}]
+
+        with patch('requests.get', side_effect=[repos_response, commits_response]) as mock_get:
+            first = get_user_repos_with_commits("octocat", result_cache=cache)
+            second = get_user_repos_with_commits(" octocat ", result_cache=cache)
+
+        assert first == second == [{'repo_name': 'repo1', 'commit_count': 2}]
+        assert mock_get.call_count == 2
+
+        cache.invalidate("octocat")
+        with patch('requests.get', side_effect=[repos_response, commits_response]) as mock_get:
+            get_user_repos_with_commits("octocat", result_cache=cache)
+        assert mock_get.call_count == 2
+
+
+class TestRepoStateStore:
+    """Tests for incremental refreshes keyed by pushed_at"""
+
+    def _github(self, pushed, commits):
+        """requests.get stand-in serving a listing with pushed_at values"""
+        calls = []
+
+        def fake_get(url, *args, **kwargs):
+            calls.append(url)
+            if url.endswith("/repos"):
+                return _json_response(url, [
+                    {"name": name, "pushed_at": pushed_at}
+                    for name, pushed_at in pushed.items()
+                ])
+            commits_for_repo = commits[url.split("/")[-2]]
+            if isinstance(commits_for_repo, int):
+                return _json_response(url, {"message": "x"}, commits_for_repo)
+            return _json_response(url, commits_for_repo)
+
+        return fake_get, calls
+
+    def test_unchanged_repositories_are_not_recounted(self):
+        """Only repositories with a new pushed_at query the commits endpoint"""
+        state = RepoStateStore()
+        commits = {"a": [{"sha": "1"}], "b": [{"sha": "1"}, {"sha": "2"}]}
+        fake_get, calls = self._github({"a": "2024-01-01T00:00:00Z", "b": "2024-01-01T00:00:00Z"}, commits)
+        with patch('requests.get', side_effect=fake_get):
+            get_user_repos_with_commits("octocat", repo_state=state)
+        assert len(calls) == 3
+
+        commits["b"] = [{"sha": "1"}, {"sha": "2"}, {"sha": "3"}]
+        fake_get, calls = self._github({"a": "2024-01-01T00:00:00Z", "b": "2024-02-01T00:00:00Z"}, commits)
+        with patch('requests.get', side_effect=fake_get):
+            result = get_user_repos_with_commits("octocat", repo_state=state, max_workers=2)
+
+        assert result == [
+            {"repo_name": "a", "commit_count": 1},
+            {"repo_name": "b", "commit_count": 3},
+        ]
+        assert calls == [
+            "https://api.github.com/users/octocat/repos",
+            "https://api.github.com/repos/octocat/b/commits",
+        ]
+        assert state.hits == 1
+        stored = state.get("octocat", "b")
+        assert stored["pushed_at"] == "2024-02-01T00:00:00Z"
+        assert stored["commit_count"] == 3
+
+    def test_failed_counts_are_not_stored(self):
+        """An inaccessible repository is reported as 0 and retried next time"""
+        state = RepoStateStore()
+        fake_get, calls = self._github({"a": "2024-01-01T00:00:00Z", "empty": "2024-01-01T00:00:00Z"}, {"a": 500, "empty": 409})
+        with patch('requests.get', side_effect=fake_get):
+            result = get_user_repos_with_commits("octocat", repo_state=state)
+
+        assert [repo["commit_count"] for repo in result] == [0, 0]
+        assert state.get("octocat", "a") is None
+        assert state.get("octocat", "empty")["commit_count"] == 0
+
+    def test_missing_pushed_at_always_recounts(self):
+        """Without pushed_at in the listing the stored count is not trusted"""
+        state = RepoStateStore()
+        state.set("octocat", "a", {"pushed_at": None, "commit_count": 5})
+
+        assert state.unchanged_count("octocat", "a", None) is None
+        assert state.misses == 1
+
+    def test_batch_uses_state(self):
+        """The multi-user batch reuses stored counts too"""
+        state = RepoStateStore()
+        state.set("octocat", "a", {"pushed_at": "2024-01-01T00:00:00Z",
+                                   "commit_count": 7, "count_method": "list"})
+        fake_get, calls = self._github({"a": "2024-01-01T00:00:00Z"}, {})
+        client = GitHubClient()
+
+        with patch.object(client.session, 'get', side_effect=fake_get):
+            results = get_many_users_repos_with_commits(
+                ["octocat"], client=client, repo_state=state
+            )
+
+        assert results[0]["repos"] == [{"repo_name": "a", "commit_count": 7}]
+        assert len(calls) == 1
+
+    def test_count_method_must_match(self):
+        """A count stored by one counting strategy is not served to another"""
+        state = RepoStateStore()
+        pushed = "2024-01-01T00:00:00Z"
+        state.set("octocat", "a", {"pushed_at": pushed, "commit_count": 30,
+                                   "count_method": "list"})
+
+        assert state.unchanged_count("octocat", "a", pushed, "link") is None
+        assert state.unchanged_count("octocat", "a", pushed, "list") == 30
+        state.set("octocat", "b", {"pushed_at": pushed, "commit_count": 3})
+        assert state.unchanged_count("octocat", "b", pushed, "list") is None
+
+    def test_keys_ignore_case(self):
+        """Usernames and repository names match case-insensitively"""
+        state = RepoStateStore()
+        state.set("OctoCat", "Hello-World", {"pushed_at": "t1", "commit_count": 2})
+
+        assert state.get("octocat", "hello-world")["commit_count"] == 2
+        assert state.unchanged_count("OCTOCAT", "hello-world", "t1") == 2
+
+    def test_state_persists_between_runs(self, tmp_path):
+        """The state file is written atomically on exit and read back"""
+        path = str(tmp_path / "state.json")
+        with RepoStateStore(path) as state:
+            state.set("octocat", "a", {"pushed_at": "2024-01-01T00:00:00Z", "commit_count": 4})
+
+        reloaded = RepoStateStore(path)
+        assert len(reloaded) == 1
+        assert reloaded.unchanged_count("octocat", "a", "2024-01-01T00:00:00Z") == 4
+        assert not os.path.exists(path + ".tmp")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
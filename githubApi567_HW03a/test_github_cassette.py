@@ -0,0 +1,171 @@
+"""
+Test suite for the record/replay transport adapter.
+
+Responses are recorded from the local fake GitHub API, which is stopped
+before they are replayed.
+"""
+import time
+
+import pytest
+import requests
+from fake_github import FakeGitHubServer
+from github_api import GitHubClient, get_user_repos_with_commits, main
+from github_cassette import CassetteAdapter, CassetteMiss
+
+USERS = {
+    'octocat': {'hello-world': 3, 'spoon-knife': 1, 'empty': None},
+    'norepos': {},
+}
+
+
+def _record(path, *user_ids, **analysis_options):
+    """Record the analysis of users, returning the server and the results"""
+    with FakeGitHubServer(USERS, per_page=2) as server:
+        with GitHubClient(base_url=server.url,
+                          adapter=CassetteAdapter(path, mode="record")) as client:
+            results = [
+                get_user_repos_with_commits(user_id, client=client, **analysis_options)
+                for user_id in user_ids
+            ]
+    return server, results
+
+
+class TestCassetteAdapter:
+    """Tests for recording and replaying responses"""
+
+    @pytest.mark.parametrize("use_mmap", [True, False])
+    def test_replay_without_network(self, tmp_path, use_mmap):
+        """Replayed runs return the recorded results with the server gone"""
+        path = str(tmp_path / "github.cassette")
+        server, recorded = _record(path, "octocat", "norepos", paginate=True,
+                                   count_method="link")
+
+        cassette = CassetteAdapter(path, mode="replay", use_mmap=use_mmap)
+        with GitHubClient(base_url=server.url, adapter=cassette) as client:
+            replayed = [
+                get_user_repos_with_commits(user_id, client=client, paginate=True,
+                                            count_method="link")
+                for user_id in ("octocat", "norepos")
+            ]
+
+        assert replayed == recorded
+        assert recorded[0][0] == {'repo_name': 'hello-world', 'commit_count': 3}
+        assert cassette.hits == len(cassette) == len(server.requests)
+        assert cassette.misses == 0
+
+    def test_statuses_and_headers_survive(self, tmp_path):
+        """Status, reason, Link and ETag headers are replayed"""
+        path = str(tmp_path / "github.cassette")
+        server, _ = _record(path, "octocat", paginate=True)
+
+        with GitHubClient(base_url=server.url,
+                          adapter=CassetteAdapter(path, mode="replay")) as client:
+            commits = client.get(f"{server.url}/repos/octocat/hello-world/commits")
+            empty = client.get(f"{server.url}/repos/octocat/empty/commits")
+
+        assert commits.links['next']['url'].endswith("page=2")
+        assert commits.headers['ETag']
+        assert empty.status_code == 409
+        assert empty.reason == "Conflict"
+
+    def test_unrecorded_request(self, tmp_path):
+        """A request missing from the cassette fails like a network error"""
+        path = str(tmp_path / "github.cassette")
+        server, _ = _record(path, "norepos")
+
+        cassette = CassetteAdapter(path, mode="replay")
+        with GitHubClient(base_url=server.url, adapter=cassette) as client:
+            with pytest.raises(requests.exceptions.RequestException):
+                get_user_repos_with_commits("octocat", client=client)
+            with pytest.raises(CassetteMiss):
+                client.get(f"{server.url}/users/ghost/repos")
+
+        assert cassette.misses == 2
+
+    def test_repeated_requests_replay_in_order(self, tmp_path):
+        """Several recordings of one request are replayed in turn"""
+        path = str(tmp_path / "github.cassette")
+        with FakeGitHubServer({'alice': {'a': 1}}) as server:
+            url = f"{server.url}/repos/alice/a/commits"
+            with GitHubClient(adapter=CassetteAdapter(path, mode="record"),
+                              coalesce=False) as client:
+                client.get(url)
+                server.users['alice']['a'] = 2
+                client.get(url)
+
+        with GitHubClient(adapter=CassetteAdapter(path, mode="replay"),
+                          coalesce=False) as client:
+            counts = [len(client.get(url).json()) for _ in range(3)]
+
+        assert counts == [1, 2, 2]
+
+    def test_identical_bodies_are_stored_once(self, tmp_path):
+        """The cassette stays compact for repeated answers"""
+        once = str(tmp_path / "once.cassette")
+        twice = str(tmp_path / "twice.cassette")
+        with FakeGitHubServer({'alice': {f'r{i}': 25 for i in range(20)}}) as server:
+            for path, count in ((once, 1), (twice, 2)):
+                with GitHubClient(base_url=server.url, coalesce=False,
+                                  adapter=CassetteAdapter(path, mode="record")) as client:
+                    for _ in range(count):
+                        get_user_repos_with_commits("alice", client=client)
+
+        with open(once, "rb") as f:
+            size_once = len(f.read())
+        with open(twice, "rb") as f:
+            size_twice = len(f.read())
+        # 21 more index entries, but no additional bodies
+        assert size_twice - size_once < 21 * 20
+
+    def test_simulated_latency(self, tmp_path):
+        """Replays can be delayed by a fixed or the recorded latency"""
+        path = str(tmp_path / "github.cassette")
+        with FakeGitHubServer(USERS, latency=0.05) as server:
+            with GitHubClient(base_url=server.url,
+                              adapter=CassetteAdapter(path, mode="record")) as client:
+                client.get(f"{server.url}/users/norepos/repos")
+
+        url = f"{server.url}/users/norepos/repos"
+        for latency in (0.05, "recorded"):
+            with GitHubClient(adapter=CassetteAdapter(path, mode="replay",
+                                                      latency=latency)) as client:
+                started = time.perf_counter()
+                client.get(url)
+                assert time.perf_counter() - started >= 0.045
+
+    def test_once_mode(self, tmp_path):
+        """Mode "once" records a missing cassette and replays an existing one"""
+        path = str(tmp_path / "github.cassette")
+
+        first = CassetteAdapter(path)
+        first.close()
+        second = CassetteAdapter(path)
+
+        assert (first.mode, second.mode) == ("record", "replay")
+        second.close()
+
+    def test_invalid_arguments(self, tmp_path):
+        """Unknown modes and foreign files are rejected"""
+        with pytest.raises(ValueError):
+            CassetteAdapter(str(tmp_path / "x"), mode="rewind")
+
+        path = tmp_path / "not-a-cassette"
+        path.write_bytes(b"{}" * 20)
+        with pytest.raises(ValueError):
+            CassetteAdapter(str(path), mode="replay")
+
+    def test_command_line_cassette(self, tmp_path, capsys):
+        """--cassette records the first run and replays the second"""
+        path = str(tmp_path / "github.cassette")
+        with FakeGitHubServer(USERS) as server:
+            assert main(["--base-url", server.url, "--cassette", path, "octocat"]) == 0
+            first = capsys.readouterr().out
+            sent = len(server.requests)
+            assert main(["--base-url", server.url, "--cassette", path, "octocat"]) == 0
+
+        assert capsys.readouterr().out == first
+        assert len(server.requests) == sent
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
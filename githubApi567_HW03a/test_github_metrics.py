@@ -0,0 +1,173 @@
+"""
+Test suite for the GitHub API metrics registry.
+
+Client metrics are checked over real HTTP against the local fake GitHub API.
+"""
+import threading
+from unittest.mock import Mock
+
+import pytest
+import requests
+from github_api import GitHubClient, build_retry, get_user_repos_with_commits
+from github_cache import ResultCache, SQLiteResponseCache
+from github_metrics import CONTENT_TYPE, GitHubMetrics, MetricsRegistry
+from github_service import GitHubService
+
+
+class TestMetricsRegistry:
+    """Tests for the Prometheus text rendering"""
+
+    def test_counter_and_gauge(self):
+        """Counters and gauges render one sample per label set"""
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Calls made.", ["kind"])
+        gauge = registry.gauge("level", "Current level.")
+        counter.inc("b")
+        counter.inc("a", amount=2)
+        gauge.set(7)
+
+        assert registry.render() == (
+            "# HELP calls_total Calls made.\n"
+            "# TYPE calls_total counter\n"
+            'calls_total{kind="a"} 2\n'
+            'calls_total{kind="b"} 1\n'
+            "# HELP level Current level.\n"
+            "# TYPE level gauge\n"
+            "level 7\n"
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Bucket counts include every smaller bucket, bounds are inclusive"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("wait_seconds", "Waits.", buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        lines = registry.render().splitlines()[2:]
+        assert lines == [
+            'wait_seconds_bucket{le="0.1"} 2',
+            'wait_seconds_bucket{le="1"} 3',
+            'wait_seconds_bucket{le="+Inf"} 4',
+            "wait_seconds_sum 3.65",
+            "wait_seconds_count 4",
+        ]
+
+    def test_label_values_are_escaped(self):
+        """Quotes, backslashes and newlines cannot break the format"""
+        registry = MetricsRegistry()
+        registry.counter("x_total", "X.", ["v"]).inc('a"b\\c\nd')
+
+        assert 'x_total{v="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+    def test_invalid_use(self):
+        """Wrong label counts and duplicate names are rejected"""
+        registry = MetricsRegistry()
+        counter = registry.counter("x_total", "X.", ["a", "b"])
+
+        with pytest.raises(ValueError):
+            counter.inc("only-one")
+        with pytest.raises(ValueError):
+            registry.gauge("x_total", "Again.")
+
+    def test_concurrent_updates(self):
+        """Updates from many threads are not lost"""
+        counter = MetricsRegistry().counter("x_total", "X.")
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.value() == 8000
+
+
+class TestGitHubMetrics:
+    """Tests for the metrics recorded by GitHubClient"""
+
+    def test_requests_latency_and_repos_per_user(self, fake_github):
+        """Requests are split by endpoint and status"""
+        metrics = GitHubMetrics()
+        with GitHubClient(base_url=fake_github.url, metrics=metrics) as client:
+            get_user_repos_with_commits("octocat", client=client)
+
+        assert metrics.requests.value("repos", 200) == 1
+        assert metrics.requests.value("commits", 200) == 2
+        assert metrics.requests.value("commits", 409) == 1
+        assert metrics.latency.count("commits", 200) == 2
+        assert metrics.repos_per_user.count() == 1
+        assert 'github_repos_per_user_bucket{le="5"} 1' in metrics.registry.render()
+
+    def test_retries_and_errors(self, fake_github):
+        """Retried attempts and failed connections are counted"""
+        metrics = GitHubMetrics()
+        fake_github.add_fault(503, count=2)
+        with GitHubClient(base_url=fake_github.url, metrics=metrics,
+                          retry=build_retry(backoff_factor=0, backoff_jitter=0)) as client:
+            get_user_repos_with_commits("octocat", client=client)
+
+        assert metrics.retries.value("repos") == 2
+        assert metrics.requests.value("repos", 200) == 1
+
+        with GitHubClient(base_url="http://127.0.0.1:9", metrics=metrics) as client:
+            with pytest.raises(requests.exceptions.RequestException):
+                get_user_repos_with_commits("octocat", client=client)
+        assert metrics.requests.value("repos", "error") == 1
+
+    def test_rate_limit_remaining(self):
+        """The last X-RateLimit-Remaining header is exposed as a gauge"""
+        metrics = GitHubMetrics()
+        client = GitHubClient(metrics=metrics)
+        response = Mock(status_code=200, headers={"X-RateLimit-Remaining": "4321"})
+        client.session.get = Mock(return_value=response)
+
+        client.get("https://api.github.com/users/octocat/repos")
+
+        assert metrics.rate_limit_remaining.value() == 4321
+        assert "github_rate_limit_remaining 4321" in metrics.registry.render()
+
+    def test_cache_hits_and_misses(self, fake_github, tmp_path):
+        """Response and result cache lookups are counted per cache"""
+        metrics = GitHubMetrics()
+        response_cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite"))
+        result_cache = ResultCache()
+        with GitHubClient(base_url=fake_github.url, metrics=metrics,
+                          response_cache=response_cache) as client:
+            for _ in range(2):
+                get_user_repos_with_commits("octocat", client=client)
+                result_cache.invalidate()
+            get_user_repos_with_commits("octocat", client=client, result_cache=result_cache)
+            get_user_repos_with_commits("octocat", client=client, result_cache=result_cache)
+        response_cache.close()
+
+        # The 409 answer of the empty repository is never cached
+        assert metrics.cache.value("response", "miss") == 6
+        assert metrics.cache.value("response", "hit") == 6
+        assert metrics.cache.value("result", "miss") == 1
+        assert metrics.cache.value("result", "hit") == 1
+
+    def test_service_serves_metrics(self, fake_github):
+        """GET /metrics on the service returns the scrape body"""
+        metrics = GitHubMetrics()
+        client = GitHubClient(base_url=fake_github.url, metrics=metrics)
+        with GitHubService(client=client) as service:
+            thread = threading.Thread(
+                target=service.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+            )
+            thread.start()
+            requests.get(f"{service.url}/users/octocat/repos-commits")
+            response = requests.get(f"{service.url}/metrics")
+            service.shutdown()
+            thread.join()
+        client.close()
+
+        assert response.headers['Content-Type'] == CONTENT_TYPE
+        assert 'github_requests_total{endpoint="repos",status="200"} 1' in response.text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
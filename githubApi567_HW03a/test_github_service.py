@@ -0,0 +1,166 @@
+"""
+Test suite for the GitHub Repository Analyzer HTTP service.
+
+The service is exercised over real HTTP against the local fake GitHub API.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+import requests
+import github_api
+from github_api import GitHubClient, RepoCommitCount
+from github_service import GitHubService
+
+
+@pytest.fixture
+def service(fake_github):
+    """Serve the analyzer on a background thread"""
+    client = GitHubClient(base_url=fake_github.url)
+    with GitHubService(client=client) as service:
+        thread = threading.Thread(
+            target=service.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        thread.start()
+        yield service
+        service.shutdown()
+        thread.join()
+    client.close()
+
+
+class TestGitHubService:
+    """Tests for GET /users/{id}/repos-commits"""
+
+    def test_user_repos_commits(self, service):
+        """A user's repositories and totals are returned as JSON"""
+        response = requests.get(f"{service.url}/users/octocat/repos-commits")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            'user_id': 'octocat',
+            'repos': [
+                {'repo_name': 'hello-world', 'commit_count': 3},
+                {'repo_name': 'spoon-knife', 'commit_count': 1},
+                {'repo_name': 'empty', 'commit_count': 0},
+            ],
+            'total_repos': 3,
+            'total_commits': 4,
+        }
+
+    def test_keep_alive(self, service):
+        """Several requests reuse one HTTP/1.1 connection"""
+        with requests.Session() as session:
+            first = session.get(f"{service.url}/users/norepos/repos-commits")
+            second = session.get(f"{service.url}/users/norepos/repos-commits")
+
+        assert first.raw.version == 11
+        assert first.headers.get('Connection', '').lower() != 'close'
+        assert second.json()['repos'] == []
+
+    @pytest.mark.parametrize("path, status", [
+        ("/users/ghost/repos-commits", 404),
+        ("/users/%20/repos-commits", 400),
+        ("/users/octocat", 404),
+        ("/unknown", 404),
+    ])
+    def test_error_statuses(self, service, path, status):
+        """Unknown users, invalid names and unknown paths are rejected"""
+        response = requests.get(f"{service.url}{path}")
+
+        assert response.status_code == status
+        assert response.json()['message']
+
+    def test_unexpected_error_is_500(self, service):
+        """Other failures are answered with 500 on the same connection"""
+        error = sqlite3.OperationalError("database is locked")
+        with requests.Session() as session:
+            with patch('github_service.get_user_repos_with_commits', side_effect=error):
+                failed = session.get(f"{service.url}/users/octocat/repos-commits")
+            retried = session.get(f"{service.url}/users/norepos/repos-commits")
+
+        assert failed.status_code == 500
+        assert failed.json() == {'message': 'Internal Server Error: OperationalError'}
+        assert retried.status_code == 200
+
+    def test_rate_limit_is_503_with_retry_after(self, service, fake_github):
+        """An exhausted upstream quota is passed on with Retry-After"""
+        reset = int(time.time()) + 120
+        fake_github.add_fault(403, {
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(reset),
+        })
+
+        response = requests.get(f"{service.url}/users/octocat/repos-commits")
+
+        assert response.status_code == 503
+        assert 100 <= int(response.headers['Retry-After']) <= 121
+
+    def test_concurrent_requests_share_one_analysis(self, service):
+        """A burst of requests for one user runs a single upstream analysis"""
+        release = threading.Event()
+        calls = []
+        shared_before = github_api._user_flights.shared
+
+        def slow_counts(user_id, *args, **kwargs):
+            calls.append(user_id)
+            release.wait(5)
+            return [RepoCommitCount('repo1', 2)]
+
+        with patch('github_api._iter_repo_counts', side_effect=slow_counts):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = [
+                    executor.submit(requests.get, f"{service.url}/users/octocat/repos-commits")
+                    for _ in range(8)
+                ]
+                deadline = time.monotonic() + 5
+                while (github_api._user_flights.shared - shared_before < 7
+                       and time.monotonic() < deadline):
+                    time.sleep(0.01)
+                release.set()
+                responses = [future.result() for future in futures]
+
+        assert calls == ['octocat']
+        assert all(r.status_code == 200 for r in responses)
+        assert all(r.json()['total_commits'] == 2 for r in responses)
+
+    def test_errors_are_shared_by_waiters(self, service):
+        """Every waiting request receives the failure of the shared analysis"""
+        release = threading.Event()
+        calls = []
+        shared_before = github_api._user_flights.shared
+
+        def failing_counts(user_id, *args, **kwargs):
+            calls.append(user_id)
+            release.wait(5)
+            raise requests.exceptions.RequestException("boom")
+
+        with patch('github_api._iter_repo_counts', side_effect=failing_counts):
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [
+                    executor.submit(requests.get, f"{service.url}/users/octocat/repos-commits")
+                    for _ in range(3)
+                ]
+                deadline = time.monotonic() + 5
+                while (github_api._user_flights.shared - shared_before < 2
+                       and time.monotonic() < deadline):
+                    time.sleep(0.01)
+                release.set()
+                responses = [future.result() for future in futures]
+
+        assert [r.status_code for r in responses] == [502] * 3
+        assert calls == ['octocat']
+        assert len(github_api._user_flights) == 0
+
+    def test_later_requests_run_again(self, service, fake_github):
+        """Results are not cached once the shared analysis has finished"""
+        for _ in range(2):
+            requests.get(f"{service.url}/users/norepos/repos-commits")
+
+        assert fake_github.requests.count(("GET", "/users/norepos/repos")) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,142 @@
+"""
+Test suite for the per-request timing trace.
+
+Requests are traced over real HTTP against the local fake GitHub API.
+"""
+import json
+import threading
+
+import pytest
+import requests
+from github_api import GitHubClient, build_retry, get_user_repos_with_commits, main
+from github_trace import PHASES, RequestTrace
+
+
+def _phase_names(record):
+    return [name for name, _, _ in record.phases]
+
+
+class TestRequestTrace:
+    """Tests for the requests recorded by RequestTrace"""
+
+    def test_records_every_request(self, fake_github):
+        """Each request gets its URL, status and phases in order"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            with RequestTrace(client) as trace:
+                get_user_repos_with_commits("octocat", client=client)
+
+        assert [r.url.split(fake_github.url)[1] for r in trace.requests] == [
+            "/users/octocat/repos",
+            "/repos/octocat/hello-world/commits",
+            "/repos/octocat/spoon-knife/commits",
+            "/repos/octocat/empty/commits",
+        ]
+        first, *rest = trace.requests
+        assert first.method == "GET" and first.status == 200
+        assert _phase_names(first) == ["queue", "connect", "ttfb", "download", "json"]
+        # Later requests reuse the keep-alive connection
+        assert _phase_names(rest[0]) == ["queue", "ttfb", "download", "json"]
+        # The 409 body of the empty repository is never decoded
+        assert rest[2].status == 409
+        assert "json" not in _phase_names(rest[2])
+
+    def test_durations_and_totals(self, fake_github):
+        """Phase durations are non-negative and add up across requests"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            with RequestTrace(client) as trace:
+                get_user_repos_with_commits("octocat", client=client)
+
+        for record in trace.requests:
+            durations = record.durations()
+            assert all(durations[name] >= 0 for name in PHASES)
+            assert durations["total"] >= durations["ttfb"] > 0
+
+        totals = trace.totals()
+        assert totals["requests"] == 4
+        assert totals["ttfb"] == pytest.approx(
+            sum(r.durations()["ttfb"] for r in trace.requests)
+        )
+
+    def test_response_exposes_its_record(self, fake_github):
+        """A traced response points at its TracedRequest"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            with RequestTrace(client) as trace:
+                response = client.get(f"{fake_github.url}/users/octocat/repos")
+
+        assert response.trace is trace.requests[0]
+
+    def test_only_requests_inside_the_block(self, fake_github):
+        """Requests sent before or after the trace are not recorded"""
+        url = f"{fake_github.url}/users/octocat/repos"
+        with GitHubClient(base_url=fake_github.url, coalesce=False) as client:
+            client.get(url)
+            with RequestTrace(client) as trace:
+                client.get(url)
+            client.get(url)
+
+        assert client.trace is None
+        assert len(trace.requests) == 1
+
+    def test_retries_and_errors(self, fake_github):
+        """Retried attempts share one record; failures keep their error"""
+        fake_github.add_fault(None)
+        with GitHubClient(base_url=fake_github.url,
+                          retry=build_retry(backoff_factor=0, backoff_jitter=0)) as client:
+            with RequestTrace(client) as trace:
+                client.get(f"{fake_github.url}/users/octocat/repos")
+
+        assert _phase_names(trace.requests[0]).count("connect") == 2
+
+        with GitHubClient(base_url="http://127.0.0.1:9") as client:
+            with RequestTrace(client) as trace:
+                with pytest.raises(requests.exceptions.RequestException):
+                    client.get("http://127.0.0.1:9/users/octocat/repos")
+
+        assert trace.requests[0].status is None
+        assert trace.requests[0].error
+
+    def test_concurrent_requests_keep_their_threads(self, fake_github):
+        """Phases recorded on worker threads stay with their own request"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            with RequestTrace(client) as trace:
+                get_user_repos_with_commits("octocat", client=client, max_workers=3)
+
+        assert len(trace.requests) == 4
+        for record in trace.requests:
+            assert _phase_names(record).count("ttfb") == 1
+        assert threading.get_ident() in {r.thread_id for r in trace.requests}
+
+
+class TestChromeTrace:
+    """Tests for the Chrome trace-event export"""
+
+    def test_events(self, fake_github, tmp_path):
+        """Requests and phases become complete events on their thread"""
+        with GitHubClient(base_url=fake_github.url) as client:
+            with RequestTrace(client) as trace:
+                get_user_repos_with_commits("octocat", client=client)
+        path = tmp_path / "trace.json"
+        trace.dump(str(path))
+
+        events = json.loads(path.read_text())["traceEvents"]
+        requests_events = [e for e in events if e.get("cat") == "request"]
+        assert [e["name"] for e in requests_events][0] == "GET /users/octocat/repos"
+        assert len(requests_events) == 4
+        assert {e["name"] for e in events if e.get("cat") == "phase"} == {
+            "queue", "connect", "ttfb", "download", "json",
+        }
+        assert all(e["ts"] >= 0 and e["dur"] >= 0 for e in events if e["ph"] == "X")
+        names = [e for e in events if e["ph"] == "M"]
+        assert names[0]["args"]["name"] == threading.current_thread().name
+
+    def test_command_line_trace(self, fake_github, tmp_path, capsys):
+        """--trace writes the trace of a command-line run"""
+        path = tmp_path / "trace.json"
+        assert main(["--base-url", fake_github.url, "--trace", str(path), "octocat"]) == 0
+
+        events = json.loads(path.read_text())["traceEvents"]
+        assert len([e for e in events if e.get("cat") == "request"]) == 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])